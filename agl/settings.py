@@ -18,7 +18,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.statiques.StatiquesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -40,6 +42,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.statiques.tailwind",
             ],
         },
     },
@@ -54,6 +57,37 @@ DATABASES = {
     }
 }
 
+# Production profile (AGL_DB_PROFILE=production): SQLite tuned for concurrent teachers and students
+DB_PROFILE = os.environ.get("AGL_DB_PROFILE", "dev")
+
+SQLITE_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",  # fsync at checkpoints only: durable enough in WAL mode, much faster commits
+    "PRAGMA busy_timeout = 20000",  # ms a writer queues for the write lock before "database is locked"
+    "PRAGMA cache_size = -32768",  # 32 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # read up to 256 MB of the file through the OS page cache, no copies
+    "PRAGMA temp_store = MEMORY",
+]
+
+if DB_PROFILE == "production":
+    DATABASES["default"].update({
+        "CONN_MAX_AGE": 600,  # persistent connections: the pragmas run once per connection, not per request
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # WAL: readers and the writer no longer block each other (stored in the file, set by the writer)
+            "init_command": "; ".join(["PRAGMA journal_mode = WAL"] + SQLITE_PRAGMAS),
+            # Take the write lock when the transaction starts: a deferred transaction upgrading from
+            # read to write fails at once when another writer is active, busy_timeout or not
+            "transaction_mode": "IMMEDIATE",
+        },
+    })
+    # Same file, opened read-only, for the views marked core.routeur.lecture_seule
+    DATABASES["lecture"] = {
+        **DATABASES["default"],
+        "OPTIONS": {"init_command": "; ".join(SQLITE_PRAGMAS + ["PRAGMA query_only = ON"])},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.routeur.RouteurLecture"]
+
 AUTH_PASSWORD_VALIDATORS = []
 LANGUAGE_CODE = "fr-fr"
 TIME_ZONE = "UTC"
@@ -62,4 +96,21 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
\ No newline at end of file
+STATIC_ROOT = BASE_DIR / "staticfiles"  # output of 'manage.py construire_statiques'
+# Compiled static files (AGL_STATIQUES_COMPILES=1, the default once DEBUG is off): purged Tailwind build
+# instead of the CDN, content-hashed names and .gz/.br variants, served by core.statiques.StatiquesMiddleware
+STATIQUES_COMPILES = os.environ.get("AGL_STATIQUES_COMPILES", "0" if DEBUG else "1") == "1"
+TAILWIND_CDN = not STATIQUES_COMPILES
+if STATIQUES_COMPILES:
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "core.statiques.StockageStatique"},
+    }
+BULLETINS_DIR = BASE_DIR / "bulletins"  # output of 'manage.py generer_bulletins'
+TACHES_DIR = BASE_DIR / "taches"  # files of the background jobs: uploaded imports, finished exports
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Per-request timings (Server-Timing header + /dashboard/admin/performances/)
+PERFORMANCE_SAMPLE_RATE = 1.0  # fraction of requests measured, lower it in production
+PERFORMANCE_WINDOW = 1000  # measurements kept per URL name for the percentiles
+PERFORMANCE_SLOW_QUERIES = 3  # slowest SQL statements kept per request / per URL name
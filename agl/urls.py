@@ -13,9 +13,33 @@ urlpatterns = [
     
     # Dashboards
     path("dashboard/admin/", views.admin_dashboard, name="admin_dashboard"),
+    path("dashboard/admin/performances/", views.performance_dashboard, name="performance_dashboard"),
     path("dashboard/teacher/", views.teacher_dashboard, name="teacher_dashboard"),
     path("dashboard/student/", views.student_dashboard, name="student_dashboard"),
     
+    # Search API
+    path("api/recherche/utilisateurs/", views.recherche_utilisateurs, name="recherche_utilisateurs"),
+    
+    # Student and teacher JSON API (ETag / If-None-Match)
+    path("api/v1/eleve/notes/", views.api_notes, name="api_notes"),
+    path("api/v1/eleve/presences/", views.api_presences, name="api_presences"),
+    path("api/v1/eleve/cours/", views.api_cours, name="api_cours"),
+    path("api/v1/eleve/emploi-du-temps/", views.api_emploi_du_temps, name="api_emploi_du_temps"),
+    path("api/v1/enseignant/cours/", views.api_enseignant_cours, name="api_enseignant_cours"),
+    path("api/v1/enseignant/notes/", views.api_enseignant_notes, name="api_enseignant_notes"),
+    path("api/v1/enseignant/presences/", views.api_enseignant_presences, name="api_enseignant_presences"),
+    
+    # Admin - Imports / Exports
+    path("manage/export/", views.export_form, name="export_form"),
+    path("manage/export/<str:nom>.csv", views.export_csv, name="export_csv"),
+    path("manage/export/<str:nom>/tache/", views.export_tache, name="export_tache"),
+    path("manage/import/", views.import_csv, name="import_csv"),
+    
+    # Admin - Background jobs
+    path("manage/taches/", views.taches_list, name="taches_list"),
+    path("manage/taches/<int:tache_id>/fichier/", views.tache_fichier, name="tache_fichier"),
+    path("api/taches/<int:tache_id>/", views.tache_statut, name="tache_statut"),
+    
     # Admin - College Management
     path("manage/college/", views.college_list, name="college_list"),
     path("manage/college/create/", views.college_create, name="college_create"),
@@ -27,6 +51,7 @@ urlpatterns = [
     # Admin - Matiere Management
     path("manage/matiere/", views.matiere_list, name="matiere_list"),
     path("manage/matiere/create/", views.matiere_create, name="matiere_create"),
+    path("manage/matiere/<int:matiere_id>/inscriptions/", views.matiere_inscriptions, name="matiere_inscriptions"),
     
     # Admin - Salle Management
     path("manage/salle/", views.salle_list, name="salle_list"),
@@ -35,14 +60,19 @@ urlpatterns = [
     # Teacher - Cours Management
     path("teacher/cours/", views.cours_list, name="cours_list"),
     path("teacher/cours/create/", views.cours_create, name="cours_create"),
+    path("teacher/cours/<int:cours_id>/", views.cours_detail, name="cours_detail"),
+    path("cours/recherche/", views.cours_recherche, name="cours_recherche"),
     
     # Teacher - Notes Management
     path("teacher/notes/", views.notes_list, name="notes_list"),
     path("teacher/notes/create/", views.notes_create, name="notes_create"),
+    path("teacher/notes/matiere/<int:matiere_id>/", views.notes_saisie, name="notes_saisie"),
     
     # Teacher - Presence Management
     path("teacher/presence/", views.presence_list, name="presence_list"),
     path("teacher/presence/create/", views.presence_create, name="presence_create"),
+    path("teacher/presence/matiere/<int:matiere_id>/", views.presence_appel, name="presence_appel"),
+    path("teacher/presence/absences/", views.absences_rapport, name="absences_rapport"),
     
     # Teacher - Department Stats
     path("teacher/departement/<int:dept_id>/stats/", views.departement_stats, name="departement_stats"),
@@ -51,5 +81,6 @@ urlpatterns = [
     path("student/notes/", views.student_notes, name="student_notes"),
     path("student/presences/", views.student_presences, name="student_presences"),
     path("student/cours/", views.student_cours, name="student_cours"),
+    path("student/cours/<int:cours_id>/", views.student_cours_detail, name="student_cours_detail"),
     path("student/schedule/", views.student_schedule, name="student_schedule"),
 ]
\ No newline at end of file
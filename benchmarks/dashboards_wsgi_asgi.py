@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""Dashboard throughput of one worker under WSGI (fixed thread pool) and ASGI (event loop).
+
+Builds a throwaway SQLite database with generer_donnees, logs a student and a teacher in,
+then sends --requests GET requests with --concurrency clients in flight straight to the
+WSGI and ASGI application callables (no HTTP server, so only Django is measured).
+Latencies are seen from the client, queueing included:
+
+- WSGI: one worker with --threads threads, like gunicorn --threads;
+- ASGI: one event loop, like uvicorn; async views wait on the database off the loop.
+
+SQLite answers in microseconds, which hides what async buys. --latency-ms adds a sleep
+to every SQL statement to mimic a database server across the network.
+
+    python benchmarks/dashboards_wsgi_asgi.py --latency-ms 2 --concurrency 64
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agl.settings')
+
+from django.conf import settings  # noqa: E402
+
+VUES = {
+    'student_dashboard': ('eleve', '/dashboard/student/'),
+    'teacher_dashboard': ('enseignant', '/dashboard/teacher/'),
+    'student_notes': ('eleve', '/student/notes/'),
+}
+
+
+def configurer(chemin, latence):
+    settings.DATABASES['default']['NAME'] = chemin
+    settings.PERFORMANCE_SAMPLE_RATE = 0
+    import django
+    django.setup()
+
+    if latence:
+        from django.db.backends.signals import connection_created
+
+        def attendre(execute, sql, params, many, context):
+            time.sleep(latence)
+            return execute(sql, params, many, context)
+
+        def installer(connection, **kwargs):
+            # The wrapper object outlives its connections: install once per thread
+            if attendre not in connection.execute_wrappers:
+                connection.execute_wrappers.append(attendre)
+
+        connection_created.connect(installer, weak=False)
+
+
+def preparer(eleves):
+    from django.core.management import call_command
+    from django.test import Client
+    from core.models import Eleve, Enseignant
+
+    call_command('migrate', verbosity=0)
+    call_command('generer_donnees', students=eleves, days=30, seed=1, stdout=io.StringIO())
+    identifiants = {
+        'eleve': Eleve.objects.select_related('utilisateur').first().utilisateur.identifiant,
+        'enseignant': Enseignant.objects.filter(matieres__isnull=False)
+        .select_related('utilisateur').first().utilisateur.identifiant,
+    }
+    cookies = {}
+    for role, identifiant in identifiants.items():
+        client = Client(HTTP_HOST='localhost')
+        reponse = client.post('/login/', {'identifiant': identifiant, 'user_type': role})
+        assert reponse.status_code == 302, reponse.status_code
+        cookies[role] = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+    return cookies
+
+
+def environ_wsgi(chemin, cookie):
+    return {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': chemin, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def mesurer_wsgi(application, chemin, cookie, nb_requetes, concurrence, threads):
+    # Only --threads requests run at once; the other clients queue, as in front of a WSGI worker
+    worker = threading.Semaphore(threads)
+
+    def requete(_):
+        statut = []
+        debut = time.perf_counter()
+        with worker:
+            reponse = application(environ_wsgi(chemin, cookie), lambda s, h, e=None: statut.append(s))
+            b''.join(reponse)
+            reponse.close()
+        assert statut[0].startswith('200'), statut[0]
+        return time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as clients:
+        durees = list(clients.map(requete, range(nb_requetes)))
+    return time.perf_counter() - debut, durees
+
+
+async def mesurer_asgi(application, chemin, cookie, nb_requetes, concurrence):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': chemin, 'raw_path': chemin.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def requete():
+        async with semaphore:
+            termine = asyncio.Event()
+            corps_envoye = False
+            statut = []
+
+            async def recevoir():
+                nonlocal corps_envoye
+                if not corps_envoye:
+                    corps_envoye = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await termine.wait()
+                return {'type': 'http.disconnect'}
+
+            async def envoyer(message):
+                if message['type'] == 'http.response.start':
+                    statut.append(message['status'])
+                elif not message.get('more_body'):
+                    termine.set()
+
+            debut = time.perf_counter()
+            await application(dict(scope), recevoir, envoyer)
+            assert statut[0] == 200, statut[0]
+            return time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    durees = await asyncio.gather(*(requete() for _ in range(nb_requetes)))
+    return time.perf_counter() - debut, durees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32, help='clients in flight')
+    parser.add_argument('--threads', type=int, default=4, help='threads of the WSGI worker')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated round trip per SQL statement')
+    parser.add_argument('--students', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        configurer(os.path.join(dossier, 'bench.sqlite3'), args.latency_ms / 1000)
+        cookies = preparer(args.students)
+
+        from django.core.asgi import get_asgi_application
+        from django.core.wsgi import get_wsgi_application
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+
+        print(f'{args.requests} requêtes, {args.concurrency} clients, WSGI {args.threads} threads, '
+              f'latence SQL simulée {args.latency_ms} ms\n')
+        print(f'{"vue":20} {"mode":6} {"req/s":>8} {"moy. (ms)":>10} {"p95 (ms)":>10}')
+        for nom, (role, chemin) in VUES.items():
+            resultats = {
+                'WSGI': mesurer_wsgi(wsgi, chemin, cookies[role], args.requests, args.concurrency, args.threads),
+                'ASGI': asyncio.run(mesurer_asgi(asgi, chemin, cookies[role], args.requests, args.concurrency)),
+            }
+            for mode, (total, durees) in resultats.items():
+                durees = sorted(durees)
+                print(f'{nom:20} {mode:6} {len(durees) / total:8.0f} {statistics.mean(durees) * 1000:10.1f} '
+                      f'{durees[int(len(durees) * 0.95)] * 1000:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""Before/after latency of the hot Presence queries around migration 0004 (composite indexes).
+
+Builds a throwaway SQLite database, fills it with --rows attendance rows, times the
+queries at migration 0003 (no composite indexes) then again after 0004.
+
+    python benchmarks/presence_indexes.py --rows 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agl.settings')
+
+from django.conf import settings  # noqa: E402
+
+
+def configurer(chemin):
+    settings.DATABASES['default']['NAME'] = chemin
+    import django
+    django.setup()
+
+
+def remplir(lignes, jours, matieres_par_eleve):
+    from django.db import connection, transaction
+    from core.models import Academie, College, Departement, Eleve, Enseignant, Matiere, Utilisateur
+
+    nb_eleves = max(1, lignes // (jours * matieres_par_eleve))
+    with transaction.atomic():
+        academie = Academie.objects.create(nom='Académie bench')
+        college = College.objects.create(nom='Collège bench', academie=academie)
+        departement = Departement.objects.create(nom='Bench', code_departement='BENCH', college=college)
+        profs = Utilisateur.objects.bulk_create(
+            Utilisateur(nom=f'Prof{i}', prenom='Bench', mail=f'prof{i}@bench.fr', identifiant=f'bprof{i}')
+            for i in range(20))
+        enseignants = Enseignant.objects.bulk_create(
+            Enseignant(utilisateur=u, indice=400, departement=departement) for u in profs)
+        matieres = Matiere.objects.bulk_create(
+            Matiere(libelle=f'Matière {i}', departement=departement, enseignant=enseignants[i % 20])
+            for i in range(40))
+        users = Utilisateur.objects.bulk_create(
+            (Utilisateur(nom=f'Eleve{i}', prenom='Bench', mail=f'eleve{i}@bench.fr', identifiant=f'beleve{i}')
+             for i in range(nb_eleves)), batch_size=2000)
+        eleves = Eleve.objects.bulk_create((Eleve(utilisateur=u, anneeEntree=2024) for u in users), batch_size=2000)
+
+    rng = random.Random(42)
+    debut = date(2025, 9, 1)
+
+    def rangees():
+        for eleve in eleves:
+            for k in range(matieres_par_eleve):
+                matiere = matieres[(eleve.id + k * 7) % 40]
+                for j in range(jours):
+                    yield (eleve.id, matiere.id, (debut + timedelta(days=j)).isoformat(),
+                           rng.random() > 0.05, matiere.enseignant_id)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO core_presence (eleve_id, matiere_id, date, present, enseignant_id) VALUES (%s, %s, %s, %s, %s)',
+            rangees())
+    return [e.id for e in eleves], [m.id for m in matieres], [e.id for e in enseignants], debut, jours
+
+
+def requetes(eleve_ids, matiere_ids, enseignant_ids, debut, jours):
+    from core.models import Presence
+    rng = random.Random(7)
+    return {
+        'heures d\'absence (count)': lambda: Presence.objects.filter(
+            eleve_id=rng.choice(eleve_ids), present=False).count(),
+        'absences récentes [:5]': lambda: list(Presence.objects.filter(
+            eleve_id=rng.choice(eleve_ids), present=False)[:5]),
+        'historique élève (page 1)': lambda: list(Presence.objects.filter(
+            eleve_id=rng.choice(eleve_ids)).order_by('-date', '-id')[:51]),
+        'présences enseignant (page 1)': lambda: list(Presence.objects.filter(
+            enseignant_id=rng.choice(enseignant_ids)).order_by('-date', '-id')[:51]),
+        'appel matière/jour': lambda: list(Presence.objects.filter(
+            matiere_id=rng.choice(matiere_ids),
+            date=debut + timedelta(days=rng.randrange(jours))).values_list('eleve_id', 'present')),
+    }
+
+
+def mesurer(fonctions, repetitions):
+    resultats = {}
+    for nom, fonction in fonctions.items():
+        fonction()
+        durees = []
+        for _ in range(repetitions):
+            t0 = time.perf_counter()
+            fonction()
+            durees.append((time.perf_counter() - t0) * 1000)
+        resultats[nom] = statistics.median(durees)
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--subjects-per-student', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        configurer(os.path.join(dossier, 'bench.sqlite3'))
+        from django.core.management import call_command
+        from django.db import connection
+
+        call_command('migrate', 'core', '0003', verbosity=0)
+        call_command('migrate', 'contenttypes', verbosity=0)
+        t0 = time.perf_counter()
+        contexte = remplir(args.rows, args.days, args.subjects_per_student)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM core_presence')
+            total = cursor.fetchone()[0]
+            cursor.execute('ANALYZE')
+        print(f'{total} présences générées en {time.perf_counter() - t0:.1f}s')
+
+        fonctions = requetes(*contexte)
+        avant = mesurer(fonctions, args.repeat)
+
+        t0 = time.perf_counter()
+        call_command('migrate', 'core', '0004', verbosity=0)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        print(f'migration 0004 (création des index) : {time.perf_counter() - t0:.1f}s\n')
+        apres = mesurer(fonctions, args.repeat)
+
+        print(f'{"requête":32} {"avant (ms)":>12} {"après (ms)":>12} {"gain":>8}')
+        for nom in fonctions:
+            print(f'{nom:32} {avant[nom]:12.2f} {apres[nom]:12.2f} {avant[nom] / apres[nom]:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""Students reading while teachers write, on SQLite with the dev and the production database profile.
+
+Builds a throwaway database with generer_donnees for each profile (AGL_DB_PROFILE, see
+agl/settings.py), then for --duration seconds --readers threads load the student pages
+while --writers threads post roll calls (Presence upsert + attendance rollups refresh),
+all through the WSGI application of one process, like one gunicorn worker with threads.
+Each profile runs in its own process since the profile is read when settings load.
+
+Failed requests are almost always "database is locked": with the rollback journal readers
+block the committing writer, and deferred transactions that upgrade to write fail at once.
+
+    python benchmarks/sqlite_concurrence.py --readers 8 --writers 4 --duration 10
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agl.settings')
+
+PROFILS = ['dev', 'production']
+PAGES_ELEVE = ['/dashboard/student/', '/student/notes/', '/student/presences/', '/student/schedule/']
+
+
+def configurer(chemin):
+    from django.conf import settings
+    for base in settings.DATABASES.values():
+        base['NAME'] = chemin
+    settings.PERFORMANCE_SAMPLE_RATE = 0
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['localhost']
+    # Pages only: no collectstatic for the hashed static names of the production profile
+    settings.STORAGES = {**settings.STORAGES,
+                         'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+    import django
+    django.setup()
+    # The failures are counted, not logged one traceback at a time
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+
+def preparer(eleves, nb_enseignants):
+    from django.core.management import call_command
+    from django.db import connections
+    from django.test import Client
+    from core.models import Eleve, Enseignant
+
+    call_command('migrate', verbosity=0)
+    call_command('generer_donnees', students=eleves, days=20, seed=1, stdout=io.StringIO())
+    lecteurs = []
+    for eleve in Eleve.objects.select_related('utilisateur').order_by('?')[:20]:
+        client = Client(HTTP_HOST='localhost')
+        client.post('/login/', {'identifiant': eleve.utilisateur.identifiant, 'user_type': 'eleve'})
+        lecteurs.append(f"sessionid={client.cookies['sessionid'].value}")
+    ecrivains = []
+    enseignants = Enseignant.objects.filter(matieres__inscriptions__isnull=False).distinct()
+    for enseignant in enseignants.select_related('utilisateur')[:nb_enseignants]:
+        client = Client(HTTP_HOST='localhost')
+        client.post('/login/', {'identifiant': enseignant.utilisateur.identifiant, 'user_type': 'enseignant'})
+        matieres = [(matiere.id, list(matiere.inscriptions.values_list('eleve_id', flat=True)))
+                    for matiere in enseignant.matieres.filter(inscriptions__isnull=False).distinct()]
+        client.get(f'/teacher/presence/matiere/{matieres[0][0]}/')  # sets the CSRF cookie
+        jeton = client.cookies['csrftoken'].value
+        ecrivains.append((f"sessionid={client.cookies['sessionid'].value}; csrftoken={jeton}", jeton, matieres))
+    connections.close_all()
+    return lecteurs, ecrivains
+
+
+def environ(methode, chemin, cookie, corps=b''):
+    return {
+        'REQUEST_METHOD': methode, 'SCRIPT_NAME': '', 'PATH_INFO': chemin, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded', 'CONTENT_LENGTH': str(len(corps)),
+        'wsgi.input': io.BytesIO(corps), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def envoyer(application, env):
+    """Status code and duration of one request"""
+    statut = []
+    debut = time.perf_counter()
+    reponse = application(env, lambda s, h, e=None: statut.append(s))
+    b''.join(reponse)
+    reponse.close()
+    return int(statut[0][:3]), time.perf_counter() - debut
+
+
+def mesurer(profil, args):
+    with tempfile.TemporaryDirectory() as dossier:
+        configurer(os.path.join(dossier, 'bench.sqlite3'))
+        lecteurs, ecrivains = preparer(args.students, args.writers)
+
+        from django.core.wsgi import get_wsgi_application
+        from django.utils import timezone
+        application = get_wsgi_application()
+        jours = [timezone.localdate() - timezone.timedelta(days=i) for i in range(1, 29)]
+        resultats = {'lecture': [], 'ecriture': []}
+        echecs = {'lecture': 0, 'ecriture': 0}
+        verrou = threading.Lock()
+        fin = time.perf_counter() + args.duration
+
+        def noter(genre, reussi, duree):
+            with verrou:
+                if reussi:
+                    resultats[genre].append(duree)
+                else:
+                    echecs[genre] += 1
+
+        def lire(numero):
+            rng = random.Random(numero)
+            while time.perf_counter() < fin:
+                statut, duree = envoyer(application, environ('GET', rng.choice(PAGES_ELEVE), rng.choice(lecteurs)))
+                noter('lecture', statut == 200, duree)
+
+        def ecrire(numero):
+            rng = random.Random(1000 + numero)
+            cookie, jeton, matieres = ecrivains[numero % len(ecrivains)]
+            while time.perf_counter() < fin:
+                matiere_id, eleve_ids = rng.choice(matieres)
+                corps = urlencode([('csrfmiddlewaretoken', jeton), ('date', rng.choice(jours).isoformat())]
+                                  + [('eleves', i) for i in eleve_ids]
+                                  + [(f'present_{i}', 'on') for i in eleve_ids if rng.random() > 0.1]).encode()
+                statut, duree = envoyer(application, environ('POST', f'/teacher/presence/matiere/{matiere_id}/',
+                                                             cookie, corps))
+                noter('ecriture', statut == 302, duree)
+
+        threads = ([threading.Thread(target=lire, args=(i,)) for i in range(args.readers)]
+                   + [threading.Thread(target=ecrire, args=(i,)) for i in range(args.writers)])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for genre, durees in resultats.items():
+            durees.sort()
+            p95 = durees[int(len(durees) * 0.95)] * 1000 if durees else float('nan')
+            moyenne = statistics.mean(durees) * 1000 if durees else float('nan')
+            print(f'{profil:11} {genre:9} {len(durees) / args.duration:8.1f} {moyenne:10.1f} {p95:10.1f} '
+                  f'{echecs[genre]:8}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per profile')
+    parser.add_argument('--readers', type=int, default=8, help='threads loading student pages')
+    parser.add_argument('--writers', type=int, default=4, help='threads posting roll calls (one teacher each)')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--profil', choices=PROFILS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profil:
+        mesurer(args.profil, args)
+        return
+
+    print(f'{args.readers} lecteurs, {args.writers} enseignants qui font l\'appel, {args.duration:.0f} s par profil\n')
+    print(f'{"profil":11} {"requêtes":9} {"ok/s":>8} {"moy. (ms)":>10} {"p95 (ms)":>10} {"échecs":>8}')
+    for profil in PROFILS:
+        subprocess.run([sys.executable, __file__, '--profil', profil] + sys.argv[1:], check=True,
+                       env={**os.environ, 'AGL_DB_PROFILE': profil})
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,45 @@
+from django.conf import settings
 from django.contrib import admin
+from django.urls import reverse
+from django.utils import timezone
+
 from .models import (
     Utilisateur, Administrateur, Academie, College, Departement,
-    Enseignant, Salle, Matiere, Eleve, Notes, Cours, Presence
+    Enseignant, Salle, Matiere, Eleve, Inscription, Notes, Cours, Presence, StatistiqueNotes, Compteur, ImportCsv,
+    CumulPresence, ActualisationPresences, Tache,
 )
+from .taches import en_file, enfiler
 
 admin.site.register(Utilisateur)
 admin.site.register(Administrateur)
 admin.site.register(Academie)
-admin.site.register(College)
 admin.site.register(Departement)
 admin.site.register(Enseignant)
 admin.site.register(Salle)
 admin.site.register(Matiere)
 admin.site.register(Eleve)
+admin.site.register(Inscription)
 admin.site.register(Notes)
 admin.site.register(Cours)
-admin.site.register(Presence)
\ No newline at end of file
+admin.site.register(Presence)
+admin.site.register(StatistiqueNotes)
+admin.site.register(Compteur)
+admin.site.register(ImportCsv)
+admin.site.register(CumulPresence)
+admin.site.register(ActualisationPresences)
+admin.site.register(Tache)
+
+
+@admin.register(College)
+class CollegeAdmin(admin.ModelAdmin):
+    actions = ['generer_bulletins']
+
+    @admin.action(description="Générer les bulletins des élèves")
+    def generer_bulletins(self, request, queryset):
+        # Minutes of work for a large college: queued for 'manage.py executer_taches', not run in the request
+        periode = timezone.localdate().isoformat()
+        for college in queryset:
+            if en_file('generer_bulletins', college=college.pk, periode=periode) is None:
+                enfiler('generer_bulletins', college=college.pk, periode=periode)
+        self.message_user(request, f"Génération mise en file pour {queryset.count()} collège(s), "
+                                   f"bulletins écrits dans {settings.BULLETINS_DIR}. Avancement : {reverse('taches_list')}")
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from pathlib import Path
+
+import django
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Eleve, Matiere, Notes, Presence, StatistiqueNotes
+
+TAILLE_LOT = 500
+
+
+def dossier_bulletins(racine, college, periode):
+    return Path(racine) / f"college-{college.pk}" / slugify(periode)
+
+
+def nom_fichier(eleve_id, identifiant):
+    """File name of a bulletin: identifiant is free text (slashes, dots), the id keeps names unique"""
+    return f"{slugify(identifiant) or 'eleve'}-{eleve_id}.html"
+
+
+def eleves_du_college(college):
+    """(eleve_id, identifiant) of the students enrolled in at least one subject of the college"""
+    return list(Eleve.objects.filter(inscriptions__matiere__departement__college=college).distinct()
+                .order_by('id').values_list('id', 'utilisateur__identifiant'))
+
+
+def _matieres(college):
+    """Subjects of the college with their teacher and class average, loaded once per run"""
+    matieres = {
+        m.id: {'libelle': m.libelle, 'departement': m.departement.nom,
+               'enseignant': str(m.enseignant.utilisateur) if m.enseignant else ''}
+        for m in (Matiere.objects.filter(departement__college=college)
+                  .select_related('departement', 'enseignant__utilisateur'))
+    }
+    for matiere_id, moyenne in StatistiqueNotes.moyennes_de('matiere', matieres).items():
+        matieres[matiere_id]['moyenne_classe'] = moyenne
+    return matieres
+
+
+def donnees_lot(eleve_ids, matieres, du, au):
+    """Everything the bulletins of a batch of students show, in four queries; plain dicts for the workers"""
+    eleves = {
+        e['id']: {**e, 'lignes': {}, 'absences': 0, 'presences': 0}
+        for e in Eleve.objects.filter(id__in=eleve_ids).values(
+            'id', 'anneeEntree', 'utilisateur__identifiant', 'utilisateur__nom', 'utilisateur__prenom')
+    }
+
+    def ligne(eleve_id, matiere_id):
+        return eleves[eleve_id]['lignes'].setdefault(
+            matiere_id, {**matieres[matiere_id], 'note': None, 'absences': 0, 'presences': 0})
+
+    notes = Notes.objects.filter(eleve__in=eleve_ids, matiere__in=list(matieres))
+    for eleve_id, matiere_id, valeur in notes.values_list('eleve_id', 'matiere_id', 'valeur'):
+        ligne(eleve_id, matiere_id)['note'] = valeur
+
+    presences = Presence.objects.filter(eleve__in=eleve_ids, matiere__in=list(matieres))
+    if du is not None:
+        presences = presences.filter(date__gte=du)
+    if au is not None:
+        presences = presences.filter(date__lte=au)
+    comptes = (presences.order_by().values_list('eleve_id', 'matiere_id')
+               .annotate(p=Count('id', filter=Q(present=True)), a=Count('id', filter=Q(present=False))))
+    for eleve_id, matiere_id, nb_presents, nb_absents in comptes:
+        cible = ligne(eleve_id, matiere_id)
+        cible['presences'], cible['absences'] = nb_presents, nb_absents
+        eleves[eleve_id]['presences'] += nb_presents
+        eleves[eleve_id]['absences'] += nb_absents
+
+    # Average over the college's subjects only, computed by the database
+    moyennes = notes.moyennes_par('eleve')
+    for eleve in eleves.values():
+        eleve['lignes'] = sorted(eleve['lignes'].values(), key=lambda l: (l['departement'], l['libelle']))
+        eleve['moyenne'] = moyennes.get(eleve['id'])
+    return list(eleves.values())
+
+
+def rendre_lot(dossier, contexte, eleves):
+    """Worker: render and write the bulletins of a batch; each file appears whole or not at all"""
+    for eleve in eleves:
+        html = render_to_string('bulletin.html', {**contexte, 'eleve': eleve})
+        chemin = Path(dossier) / nom_fichier(eleve['id'], eleve['utilisateur__identifiant'])
+        temporaire = chemin.with_suffix('.tmp')
+        temporaire.write_text(html, encoding='utf-8')
+        os.replace(temporaire, chemin)
+    return len(eleves)
+
+
+def generer(college, periode, racine, du=None, au=None, workers=None, taille_lot=TAILLE_LOT, progression=None):
+    """Bulletins of every student of a college into racine/college-<id>/<periode>/, one HTML file each.
+
+    The parent process reads the database in batches; a process pool renders and writes.
+    Students whose file already exists are skipped, so an interrupted run resumes where it stopped.
+    Returns (written, skipped).
+    """
+    dossier = dossier_bulletins(racine, college, periode)
+    dossier.mkdir(parents=True, exist_ok=True)
+    eleves = eleves_du_college(college)
+    deja_faits = {p.name for p in dossier.glob('*.html')}
+    a_faire = [eleve_id for eleve_id, identifiant in eleves if nom_fichier(eleve_id, identifiant) not in deja_faits]
+    ignores = len(eleves) - len(a_faire)
+
+    matieres = _matieres(college)
+    contexte = {'college': college.nom, 'periode': periode, 'du': du, 'au': au,
+                'date_edition': timezone.localdate()}
+    workers = workers or os.cpu_count() or 1
+
+    ecrits = 0
+    debut = time.perf_counter()
+    # Spawned, not forked: the caller may be a thread of executer_taches, and forking a
+    # multi-threaded process can copy locks held by the other threads into the workers.
+    # A spawned worker starts empty: django.setup() must run before this module (and the models) can load.
+    contexte_mp = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup, mp_context=contexte_mp) as pool:
+        en_cours = set()
+        for i in range(0, len(a_faire), taille_lot):
+            # At most two batches per worker in flight: memory stays bounded whatever the college size
+            while len(en_cours) >= 2 * workers:
+                termines, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+                ecrits += sum(futur.result() for futur in termines)
+                if progression:
+                    progression(ecrits, len(a_faire), time.perf_counter() - debut)
+            lot = donnees_lot(a_faire[i:i + taille_lot], matieres, du, au)
+            en_cours.add(pool.submit(rendre_lot, str(dossier), contexte, lot))
+        for futur in as_completed(en_cours):
+            ecrits += futur.result()
+            if progression:
+                progression(ecrits, len(a_faire), time.perf_counter() - debut)
+
+    ecrire_index(dossier, contexte, eleves)
+    return ecrits, ignores
+
+
+def ecrire_index(dossier, contexte, eleves):
+    lignes = sorted((identifiant, nom_fichier(eleve_id, identifiant)) for eleve_id, identifiant in eleves)
+    (Path(dossier) / 'index.html').write_text(
+        render_to_string('bulletins_index.html', {**contexte, 'eleves': lignes}), encoding='utf-8')
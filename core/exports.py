@@ -0,0 +1,89 @@
+import csv
+
+from asgiref.sync import sync_to_async
+
+from .models import Notes, Presence
+
+TAILLE_LOT = 2000
+
+
+class _Tampon:
+    """File-like object whose write() hands the CSV line back instead of storing it"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _enseignant(prenom, nom):
+    return f"{prenom} {nom}" if nom else ''
+
+
+# Exportable tables: model, columns fetched in the same joined query, CSV header and row formatter
+EXPORTS = {
+    'notes': {
+        'modele': Notes,
+        'colonnes': [
+            'matiere__departement__college__nom', 'matiere__departement__nom', 'matiere__libelle',
+            'matiere__enseignant__utilisateur__prenom', 'matiere__enseignant__utilisateur__nom',
+            'eleve__utilisateur__identifiant', 'eleve__utilisateur__prenom', 'eleve__utilisateur__nom', 'valeur',
+        ],
+        'entetes': ['Collège', 'Département', 'Matière', 'Enseignant', 'Identifiant', 'Prénom', 'Nom', 'Note'],
+        'ligne': lambda c, d, m, ep, en, i, p, n, valeur: [c, d, m, _enseignant(ep, en), i, p, n, valeur],
+        'date': None,
+    },
+    'presences': {
+        'modele': Presence,
+        'colonnes': [
+            'date', 'matiere__departement__college__nom', 'matiere__departement__nom', 'matiere__libelle',
+            'enseignant__utilisateur__prenom', 'enseignant__utilisateur__nom',
+            'eleve__utilisateur__identifiant', 'eleve__utilisateur__prenom', 'eleve__utilisateur__nom', 'present',
+        ],
+        'entetes': ['Date', 'Collège', 'Département', 'Matière', 'Enseignant', 'Identifiant', 'Prénom', 'Nom', 'Statut'],
+        'ligne': lambda date, c, d, m, ep, en, i, p, n, present: [
+            date.isoformat(), c, d, m, _enseignant(ep, en), i, p, n, 'Présent' if present else 'Absent'],
+        'date': 'date',
+    },
+}
+
+
+def requete_export(nom, college=None, departement=None, du=None, au=None):
+    """Rows of one export, filtered"""
+    export = EXPORTS[nom]
+    queryset = export['modele'].objects.all()
+    if college is not None:
+        queryset = queryset.filter(matiere__departement__college_id=college)
+    if departement is not None:
+        queryset = queryset.filter(matiere__departement_id=departement)
+    if export['date'] and du is not None:
+        queryset = queryset.filter(**{f"{export['date']}__gte": du})
+    if export['date'] and au is not None:
+        queryset = queryset.filter(**{f"{export['date']}__lte": au})
+    return queryset
+
+
+def lignes_export(nom, **filtres):
+    """Tuples of one export, read in chunks from a single joined query (server-side cursor where supported)"""
+    return (requete_export(nom, **filtres).order_by('id').values_list(*EXPORTS[nom]['colonnes'])
+            .iterator(chunk_size=TAILLE_LOT))
+
+
+def blocs_csv(nom, **filtres):
+    """CSV text of an export, one string per TAILLE_LOT rows: memory stays flat whatever the row count"""
+    export = EXPORTS[nom]
+    ecrivain = csv.writer(_Tampon())
+    # BOM so spreadsheet software reads the accents as UTF-8
+    bloc = ['\ufeff' + ecrivain.writerow(export['entetes'])]
+    for ligne in lignes_export(nom, **filtres):
+        bloc.append(ecrivain.writerow(export['ligne'](*ligne)))
+        if len(bloc) >= TAILLE_LOT:
+            yield ''.join(bloc)
+            bloc = []
+    if bloc:
+        yield ''.join(bloc)
+
+
+async def blocs_async(blocs):
+    """Async view of a streamed body (blocs_csv(), list pages) for ASGI, which would otherwise load a sync iterator fully in memory"""
+    iterateur = iter(blocs)
+    while (bloc := await sync_to_async(next)(iterateur, None)) is not None:
+        yield bloc
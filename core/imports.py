@@ -0,0 +1,335 @@
+import csv
+import hashlib
+import io
+import time
+from collections import Counter
+from datetime import date
+from itertools import chain, islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    College, Compteur, Departement, Eleve, Enseignant, ImportCsv, Inscription, Matiere, Notes,
+    StatistiqueNotes, Utilisateur,
+)
+
+TAILLE_LOT = 1000
+
+
+class LigneInvalide(Exception):
+    pass
+
+
+def _texte(ligne, colonne, obligatoire=True):
+    valeur = (ligne.get(colonne) or '').strip()
+    if obligatoire and not valeur:
+        raise LigneInvalide(f"colonne '{colonne}' vide")
+    return valeur
+
+
+def _entier(ligne, colonne):
+    try:
+        return int(_texte(ligne, colonne))
+    except ValueError:
+        raise LigneInvalide(f"colonne '{colonne}' : nombre entier attendu")
+
+
+class Importateur:
+    """Validates and inserts one batch of CSV rows; subclasses describe one kind of file.
+
+    valider() works on a whole batch so uniqueness and foreign keys cost a few IN (...) queries
+    per batch, never one per row.
+    """
+    colonnes = []
+
+    def valider(self, lignes):
+        """[(numero, ligne)] -> ([objects to insert], [(numero, message)])"""
+        raise NotImplementedError
+
+    def inserer(self, valides):
+        raise NotImplementedError
+
+    def terminer(self):
+        """Work deferred to the end of the run (or of its failure)"""
+
+
+class ImportDepartements(Importateur):
+    colonnes = ['code_departement', 'nom', 'college']
+
+    def valider(self, lignes):
+        codes = {_texte(ligne, 'code_departement', False) for _, ligne in lignes}
+        existants = set(Departement.objects.filter(code_departement__in=codes).values_list('code_departement', flat=True))
+        colleges = {str(pk): academie_id for pk, academie_id in College.objects.filter(
+            pk__in=[c for c in (_texte(ligne, 'college', False) for _, ligne in lignes) if c.isdigit()]
+        ).values_list('pk', 'academie_id')}
+
+        valides, erreurs, vus = [], [], set()
+        for numero, ligne in lignes:
+            try:
+                code = _texte(ligne, 'code_departement')
+                if code in existants or code in vus:
+                    raise LigneInvalide(f"code_departement '{code}' déjà utilisé")
+                college = _texte(ligne, 'college')
+                if college not in colleges:
+                    raise LigneInvalide(f"collège {college} inconnu")
+                vus.add(code)
+                departement = Departement(code_departement=code, nom=_texte(ligne, 'nom'), college_id=int(college))
+                departement.academie_id = colleges[college]
+                valides.append(departement)
+            except LigneInvalide as erreur:
+                erreurs.append((numero, str(erreur)))
+        return valides, erreurs
+
+    def inserer(self, valides):
+        Departement.objects.bulk_create(valides)
+        _compter('departement', [(d.college_id, d.academie_id) for d in valides])
+
+
+class ImportUtilisateurs(Importateur):
+    """Common part of the student and teacher files: one Utilisateur per row"""
+    colonnes = ['identifiant', 'nom', 'prenom', 'mail', 'tel']
+
+    def valider(self, lignes):
+        identifiants = {_texte(ligne, 'identifiant', False) for _, ligne in lignes}
+        mails = {_texte(ligne, 'mail', False) for _, ligne in lignes}
+        pris = {
+            'identifiant': set(Utilisateur.objects.filter(identifiant__in=identifiants).values_list('identifiant', flat=True)),
+            'mail': set(Utilisateur.objects.filter(mail__in=mails).values_list('mail', flat=True)),
+        }
+        contexte = self.contexte(lignes)
+
+        valides, erreurs = [], []
+        for numero, ligne in lignes:
+            try:
+                utilisateur = Utilisateur(
+                    identifiant=_texte(ligne, 'identifiant'), nom=_texte(ligne, 'nom'),
+                    prenom=_texte(ligne, 'prenom'), mail=_texte(ligne, 'mail'), tel=_texte(ligne, 'tel', False),
+                )
+                try:
+                    validate_email(utilisateur.mail)
+                except ValidationError:
+                    raise LigneInvalide(f"mail '{utilisateur.mail}' invalide")
+                for champ in ('identifiant', 'mail'):
+                    if getattr(utilisateur, champ) in pris[champ]:
+                        raise LigneInvalide(f"{champ} '{getattr(utilisateur, champ)}' déjà utilisé")
+                profil = self.profil(ligne, contexte)
+            except LigneInvalide as erreur:
+                erreurs.append((numero, str(erreur)))
+                continue
+            # Later rows of the same batch clash with this one
+            pris['identifiant'].add(utilisateur.identifiant)
+            pris['mail'].add(utilisateur.mail)
+            valides.append((utilisateur, profil))
+        return valides, erreurs
+
+    def contexte(self, lignes):
+        return None
+
+    def profil(self, ligne, contexte):
+        raise NotImplementedError
+
+    def inserer(self, valides):
+        utilisateurs = Utilisateur.objects.bulk_create([utilisateur for utilisateur, _ in valides])
+        for utilisateur, (_, profil) in zip(utilisateurs, valides):
+            profil.utilisateur = utilisateur
+        return [profil for _, profil in valides]
+
+
+class ImportEleves(ImportUtilisateurs):
+    colonnes = ImportUtilisateurs.colonnes + ['annee_entree']
+
+    def profil(self, ligne, contexte):
+        return Eleve(anneeEntree=_entier(ligne, 'annee_entree'))
+
+    def inserer(self, valides):
+        Eleve.objects.bulk_create(super().inserer(valides))
+        _compter('eleve', [(None, None)] * len(valides))
+
+
+class ImportEnseignants(ImportUtilisateurs):
+    colonnes = ImportUtilisateurs.colonnes + ['indice', 'date_prise_fonction', 'code_departement']
+
+    def contexte(self, lignes):
+        codes = {_texte(ligne, 'code_departement', False) for _, ligne in lignes}
+        return {code: (pk, college_id, academie_id) for code, pk, college_id, academie_id in Departement.objects.filter(
+            code_departement__in=codes).values_list('code_departement', 'pk', 'college_id', 'college__academie_id')}
+
+    def profil(self, ligne, departements):
+        code = _texte(ligne, 'code_departement')
+        if code not in departements:
+            raise LigneInvalide(f"département '{code}' inconnu")
+        try:
+            prise_fonction = date.fromisoformat(_texte(ligne, 'date_prise_fonction'))
+        except ValueError:
+            raise LigneInvalide("colonne 'date_prise_fonction' : date AAAA-MM-JJ attendue")
+        enseignant = Enseignant(indice=_entier(ligne, 'indice'), datePriseFonction=prise_fonction,
+                                departement_id=departements[code][0])
+        enseignant.portee = departements[code][1:]
+        return enseignant
+
+    def inserer(self, valides):
+        enseignants = Enseignant.objects.bulk_create(super().inserer(valides))
+        _compter('enseignant', [enseignant.portee for enseignant in enseignants])
+
+
+class ImportNotes(Importateur):
+    """Grades by student identifiant and subject id; existing grades are overwritten, students enrolled"""
+    colonnes = ['identifiant', 'matiere', 'valeur']
+
+    def __init__(self):
+        self.matieres = set()
+        self.departements = set()
+
+    def valider(self, lignes):
+        eleves = dict(Eleve.objects.filter(
+            utilisateur__identifiant__in={_texte(ligne, 'identifiant', False) for _, ligne in lignes}
+        ).values_list('utilisateur__identifiant', 'pk'))
+        matieres = dict(Matiere.objects.filter(
+            pk__in=[m for m in (_texte(ligne, 'matiere', False) for _, ligne in lignes) if m.isdigit()]
+        ).values_list('pk', 'departement_id'))
+
+        valides, erreurs, vus = [], [], set()
+        for numero, ligne in lignes:
+            try:
+                identifiant = _texte(ligne, 'identifiant')
+                if identifiant not in eleves:
+                    raise LigneInvalide(f"élève '{identifiant}' inconnu")
+                matiere_id = _entier(ligne, 'matiere')
+                if matiere_id not in matieres:
+                    raise LigneInvalide(f"matière {matiere_id} inconnue")
+                try:
+                    valeur = float(_texte(ligne, 'valeur').replace(',', '.'))
+                except ValueError:
+                    raise LigneInvalide("colonne 'valeur' : nombre attendu")
+                if not 0 <= valeur <= 20:
+                    raise LigneInvalide("la note doit être comprise entre 0 et 20")
+                cle = (eleves[identifiant], matiere_id)
+                if cle in vus:
+                    raise LigneInvalide("note en double pour cet élève et cette matière")
+            except LigneInvalide as erreur:
+                erreurs.append((numero, str(erreur)))
+                continue
+            vus.add(cle)
+            note = Notes(eleve_id=cle[0], matiere_id=matiere_id, valeur=valeur)
+            note.departement_id = matieres[matiere_id]
+            valides.append(note)
+        return valides, erreurs
+
+    def inserer(self, valides):
+        Notes.objects.bulk_create(valides, update_conflicts=True, unique_fields=['eleve', 'matiere'],
+                                  update_fields=['valeur'])
+        Inscription.objects.bulk_create([Inscription(eleve_id=n.eleve_id, matiere_id=n.matiere_id) for n in valides],
+                                        ignore_conflicts=True)
+        # bulk_create doesn't send signals: refresh the affected statistics rows. A student's row is cheap;
+        # subjects and departments span the whole file, so they are recomputed once at the end
+        StatistiqueNotes.recalculer('eleve', {n.eleve_id for n in valides})
+        self.matieres.update(n.matiere_id for n in valides)
+        self.departements.update(n.departement_id for n in valides)
+
+    def terminer(self):
+        with transaction.atomic():
+            StatistiqueNotes.recalculer('matiere', self.matieres)
+            StatistiqueNotes.recalculer('departement', self.departements)
+
+
+IMPORTS = {
+    'departements': ImportDepartements,
+    'eleves': ImportEleves,
+    'enseignants': ImportEnseignants,
+    'notes': ImportNotes,
+}
+
+
+def _compter(modele, portees):
+    """Keep the dashboard counters exact for rows created without signals; portees: [(college_id, academie_id)]"""
+    comptes = Counter({('global', 0): len(portees)})
+    for college_id, academie_id in portees:
+        if college_id is not None:
+            comptes['college', college_id] += 1
+        if academie_id is not None:
+            comptes['academie', academie_id] += 1
+    for portee, nombre in comptes.items():
+        if nombre:
+            Compteur.ajuster(modele, [portee], nombre)
+
+
+def empreinte(fichier_binaire):
+    """sha256 of a binary file object, read in chunks; the file is rewound afterwards"""
+    somme = hashlib.sha256()
+    for morceau in iter(lambda: fichier_binaire.read(1 << 20), b''):
+        somme.update(morceau)
+    fichier_binaire.seek(0)
+    return somme.hexdigest()
+
+
+def demarrer(type_import, nom_fichier, fichier_binaire):
+    """The ImportCsv run for this file: a new one, or the interrupted one to resume"""
+    execution, _ = ImportCsv.objects.get_or_create(
+        type_import=type_import, empreinte=empreinte(fichier_binaire), defaults={'nom_fichier': nom_fichier},
+    )
+    return execution
+
+
+def importer(execution, fichier_binaire, taille_lot=TAILLE_LOT, progression=None):
+    """Stream the CSV into the database batch by batch, each batch committed with its checkpoint.
+
+    Rows already counted in execution.lignes_lues are skipped, so re-running a failed import resumes it.
+    Invalid rows are rejected and reported, not fatal. Returns the throughput in rows per second.
+    """
+    importateur = IMPORTS[execution.type_import]()
+    texte = io.TextIOWrapper(fichier_binaire, encoding='utf-8-sig', newline='')
+    deja_lues = execution.lignes_lues
+    execution.statut = 'en_cours'
+    execution.save(update_fields=['statut'])
+    debut = time.perf_counter()
+    traitees = 0
+    try:
+        entete = texte.readline()
+        delimiteur = ';' if entete.count(';') > entete.count(',') else ','
+        lecteur = csv.DictReader(chain([entete], texte), delimiter=delimiteur)
+        manquantes = [colonne for colonne in importateur.colonnes if colonne not in (lecteur.fieldnames or [])]
+        if manquantes:
+            raise LigneInvalide(f"colonnes manquantes : {', '.join(manquantes)}")
+
+        # Data rows are numbered from 2, the header being line 1
+        lignes = enumerate(lecteur, start=2)
+        for _ in islice(lignes, deja_lues):
+            pass
+
+        while lot := list(islice(lignes, taille_lot)):
+            valides, erreurs = importateur.valider(lot)
+            with transaction.atomic():
+                if valides:
+                    importateur.inserer(valides)
+                execution.lignes_lues += len(lot)
+                execution.lignes_importees += len(valides)
+                execution.rejeter(erreurs)
+                execution.save(update_fields=['lignes_lues', 'lignes_importees', 'lignes_rejetees', 'erreurs'])
+            traitees += len(lot)
+            if progression:
+                progression(execution, traitees / (time.perf_counter() - debut))
+    except Exception as erreur:
+        importateur.terminer()
+        # Faults of the file itself: resuming or retrying can't get past them
+        if isinstance(erreur, UnicodeDecodeError):
+            erreur = LigneInvalide("fichier non UTF-8, enregistrez-le au format « CSV UTF-8 »")
+        elif isinstance(erreur, csv.Error):
+            erreur = LigneInvalide(f"CSV mal formé : {erreur}")
+        execution.statut = 'echec'
+        execution.message = f"Interrompu après {execution.lignes_lues} lignes : {erreur}"
+        execution.save(update_fields=['statut', 'message'])
+        raise erreur
+    finally:
+        texte.detach()
+
+    importateur.terminer()
+    debit = traitees / (time.perf_counter() - debut) if traitees else 0.0
+    execution.statut = 'termine'
+    execution.date_fin = timezone.now()
+    execution.message = (f"{execution.lignes_importees} lignes importées, {execution.lignes_rejetees} rejetées "
+                         f"({debit:.0f} lignes/s" + (f", reprise à la ligne {deja_lues + 2})" if deja_lues else ")"))
+    execution.save(update_fields=['statut', 'date_fin', 'message'])
+    return debit
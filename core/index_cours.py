@@ -0,0 +1,67 @@
+"""Full-text index of Cours for core.recherche (SQLite FTS5), created and maintained by migrations.
+
+core_cours_fts is a plain FTS5 table holding its own copy of titre and contenu (for the snippets)
+and 'portee', the tokens m<matiere_id> and e<enseignant_id>, so a search scoped to some subjects
+or to a teacher is one FTS query. Triggers on core_cours keep it in sync with every write, ORM or not.
+
+A migration that rebuilds core_cours (SQLite remakes the table for most AlterField/AddField/
+RemoveField) drops those triggers along with the old table: wrap its operations in
+autour_de_cours(), which removes the triggers first and recreates and refills the index after.
+"""
+from django.db import migrations
+
+_PORTEE = "'m' || {ligne}.matiere_id || ' e' || {ligne}.enseignant_id"
+
+CREER_TABLE = [
+    """CREATE VIRTUAL TABLE core_cours_fts USING fts5(
+       titre, contenu, portee, tokenize='unicode61 remove_diacritics 2', prefix='3')""",
+]
+
+CREER_TRIGGERS = [
+    f"""CREATE TRIGGER core_cours_fts_insert AFTER INSERT ON core_cours BEGIN
+       INSERT INTO core_cours_fts (rowid, titre, contenu, portee)
+       VALUES (new.id, new.titre, new.contenu, {_PORTEE.format(ligne='new')});
+       END""",
+    """CREATE TRIGGER core_cours_fts_delete AFTER DELETE ON core_cours BEGIN
+       DELETE FROM core_cours_fts WHERE rowid = old.id;
+       END""",
+    f"""CREATE TRIGGER core_cours_fts_update AFTER UPDATE OF titre, contenu, matiere_id, enseignant_id ON core_cours BEGIN
+       DELETE FROM core_cours_fts WHERE rowid = old.id;
+       INSERT INTO core_cours_fts (rowid, titre, contenu, portee)
+       VALUES (new.id, new.titre, new.contenu, {_PORTEE.format(ligne='new')});
+       END""",
+]
+
+REMPLIR = [
+    "DELETE FROM core_cours_fts",
+    f"""INSERT INTO core_cours_fts (rowid, titre, contenu, portee)
+        SELECT id, titre, contenu, {_PORTEE.format(ligne='core_cours')} FROM core_cours""",
+]
+
+SUPPRIMER_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS core_cours_fts_insert",
+    "DROP TRIGGER IF EXISTS core_cours_fts_delete",
+    "DROP TRIGGER IF EXISTS core_cours_fts_update",
+]
+
+SUPPRIMER_TABLE = ["DROP TABLE IF EXISTS core_cours_fts"]
+
+
+def executer(requetes):
+    """RunPython function running these statements, on SQLite only"""
+    def operation(apps, schema_editor):
+        # FTS5 is SQLite only: other databases search with core.recherche's fallback
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for requete in requetes:
+            schema_editor.execute(requete)
+    return operation
+
+
+def autour_de_cours(*operations):
+    """Migration operations that rebuild core_cours, with the index triggers dropped before and restored after"""
+    return [
+        migrations.RunPython(executer(SUPPRIMER_TRIGGERS), executer(CREER_TRIGGERS + REMPLIR)),
+        *operations,
+        migrations.RunPython(executer(CREER_TRIGGERS + REMPLIR), executer(SUPPRIMER_TRIGGERS)),
+    ]
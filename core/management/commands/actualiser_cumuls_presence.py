@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.models import CumulPresence
+
+
+class Command(BaseCommand):
+    help = "Fold recent attendance changes into the daily/weekly absence rollups (--complet: rebuild them)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true',
+                            help="Rebuild every rollup from Presence (after deletions or raw SQL loads)")
+
+    def handle(self, *args, **options):
+        if options['complet']:
+            total = CumulPresence.reconstruire()
+            self.stdout.write(self.style.SUCCESS(f"Cumuls reconstruits sur {total} jour(s)"))
+        else:
+            total = CumulPresence.actualiser()
+            self.stdout.write(self.style.SUCCESS(f"Cumuls actualisés sur {total} jour(s)"))
@@ -0,0 +1,34 @@
+import subprocess
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.statiques import StockageStatique, brotli
+
+
+class Command(BaseCommand):
+    help = ("Build static/css/output.css (Tailwind purged against the templates, minified), then collect "
+            "every asset into STATIC_ROOT with hashed names and .gz/.br variants")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sans-tailwind', action='store_true',
+                            help="Keep the existing static/css/output.css (no Node.js on this machine)")
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, StockageStatique):
+            raise CommandError("Le pipeline statique n'est actif qu'avec AGL_STATIQUES_COMPILES=1 (ou DEBUG désactivé)")
+        if not options['sans_tailwind']:
+            try:
+                # npm run build:css: the content globs of tailwind.config.js select the classes kept
+                subprocess.run(['npm', 'run', 'build:css'], cwd=settings.BASE_DIR, check=True)
+            except (OSError, subprocess.CalledProcessError) as erreur:
+                raise CommandError(f"Échec de la compilation Tailwind ({erreur}) : npm install, ou --sans-tailwind")
+        if not (settings.BASE_DIR / 'static' / 'css' / 'output.css').is_file():
+            raise CommandError("static/css/output.css manquant : lancer 'npm run build:css'")
+
+        call_command('collectstatic', interactive=False, clear=True, verbosity=options['verbosity'])
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("Module brotli absent : variantes .gz seulement (pip install brotli)"))
+        self.stdout.write(self.style.SUCCESS(f"Fichiers statiques prêts dans {settings.STATIC_ROOT}"))
@@ -0,0 +1,49 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from core.taches import INTERVALLE_BATTEMENT, battre, nom_travailleur, relancer_abandonnees, travailler
+
+
+class Command(BaseCommand):
+    help = ("Run the queued background jobs (bulletins, imports, exports, statistics) until stopped. "
+            "SIGTERM/Ctrl-C lets the running jobs finish; a killed worker's jobs are retried by the others.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrence', type=int, default=1, help="Jobs run at the same time, one thread each")
+        parser.add_argument('--intervalle', type=float, default=2.0,
+                            help="Seconds between two looks at an empty queue")
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Exit once no job is due instead of waiting for new ones (cron, tests)")
+
+    def handle(self, *args, **options):
+        arret = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: arret.set())
+
+        travailleurs = [nom_travailleur(numero) for numero in range(max(options['concurrence'], 1))]
+        threads = [threading.Thread(target=travailler, name=travailleur,
+                                    args=(travailleur, arret, options['une_fois'], options['intervalle']))
+                   for travailleur in travailleurs]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"{len(threads)} travailleur(s) démarrés")
+
+        prochain_battement = 0.0
+        while any(thread.is_alive() for thread in threads):
+            if time.monotonic() >= prochain_battement:
+                prochain_battement = time.monotonic() + INTERVALLE_BATTEMENT
+                try:
+                    battre(travailleurs)
+                    relancees = relancer_abandonnees()
+                except DatabaseError as erreur:
+                    self.stderr.write(f"Battement impossible : {erreur}")
+                else:
+                    if relancees:
+                        self.stdout.write(f"{relancees} tâche(s) abandonnée(s) remise(s) en file")
+            time.sleep(0.5)
+        connection.close()
+        self.stdout.write(self.style.SUCCESS("Travailleurs arrêtés"))
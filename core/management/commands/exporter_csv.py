@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.exports import EXPORTS, blocs_csv
+
+
+class Command(BaseCommand):
+    help = "Stream a grades or attendance extract as CSV (same format as the admin export page)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--college', type=int, help="Only this college (id)")
+        parser.add_argument('--departement', type=int, help="Only this department (id)")
+        parser.add_argument('--du', type=date.fromisoformat, help="Attendance from this date (YYYY-MM-DD)")
+        parser.add_argument('--au', type=date.fromisoformat, help="Attendance up to this date (YYYY-MM-DD)")
+        parser.add_argument('--output', '-o', help="Target file (default: standard output)")
+
+    def handle(self, *args, **options):
+        filtres = {cle: options[cle] for cle in ('college', 'departement', 'du', 'au')}
+        blocs = blocs_csv(options['export'], **filtres)
+        if not options['output']:
+            for bloc in blocs:
+                self.stdout.write(bloc, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as fichier:
+            for bloc in blocs:
+                fichier.write(bloc)
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.bulletins import TAILLE_LOT, generer
+from core.models import College
+
+
+class Command(BaseCommand):
+    help = ("Write the HTML report card of every student of a college, rendered by a process pool. "
+            "Running it again with the same period only writes the missing ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('college', type=int, help="College id")
+        parser.add_argument('--periode', help="Label of the term, also the output folder (default: today's date)")
+        parser.add_argument('--du', type=date.fromisoformat, help="Attendance from this date (YYYY-MM-DD)")
+        parser.add_argument('--au', type=date.fromisoformat, help="Attendance up to this date (YYYY-MM-DD)")
+        parser.add_argument('--sortie', default=settings.BULLETINS_DIR, help="Output folder (default: BULLETINS_DIR)")
+        parser.add_argument('--workers', type=int, help="Rendering processes (default: one per CPU)")
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        college = College.objects.filter(pk=options['college']).first()
+        if college is None:
+            raise CommandError(f"Collège {options['college']} introuvable")
+        periode = options['periode'] or timezone.localdate().isoformat()
+
+        ecrits, ignores = generer(
+            college, periode, options['sortie'], du=options['du'], au=options['au'],
+            workers=options['workers'], taille_lot=options['batch_size'], progression=self.progression,
+        )
+        self.stdout.write('')
+        if ignores:
+            self.stdout.write(f"{ignores} bulletin(s) déjà générés conservés")
+        self.stdout.write(self.style.SUCCESS(f"{ecrits} bulletin(s) écrits pour {college.nom} ({periode})"))
+
+    def progression(self, ecrits, total, duree):
+        self.stdout.write(f"\r  bulletins: {ecrits}/{total} ({ecrits / duree if duree else 0:.0f}/s)", ending='')
+        self.stdout.flush()
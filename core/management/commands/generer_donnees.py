@@ -0,0 +1,282 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import (
+    Utilisateur, Administrateur, Academie, College, Departement,
+    Enseignant, Salle, Matiere, Eleve, Inscription, Notes, Cours, Presence, StatistiqueNotes, Compteur,
+    CumulPresence,
+)
+
+PRENOMS = [
+    'Jean', 'Marie', 'Pierre', 'Sophie', 'Lucas', 'Julie', 'Hugo', 'Emma', 'Louis', 'Léa',
+    'Gabriel', 'Chloé', 'Arthur', 'Manon', 'Jules', 'Camille', 'Adam', 'Inès', 'Nathan', 'Sarah',
+]
+NOMS = [
+    'Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy', 'Moreau',
+    'Simon', 'Laurent', 'Lefebvre', 'Michel', 'Garcia', 'David', 'Bertrand', 'Roux', 'Vincent', 'Fournier',
+]
+DEPARTEMENTS = [
+    ('Mathématiques', 'MATH', ['Algèbre', 'Géométrie']),
+    ('Sciences', 'SCI', ['Physique', 'SVT']),
+    ('Lettres', 'LET', ['Français', 'Latin']),
+    ('Langues', 'LANG', ['Anglais', 'Espagnol']),
+    ('Histoire-Géographie', 'HG', ['Histoire', 'Géographie']),
+    ('Arts et Sport', 'ART', ['Arts plastiques', 'EPS']),
+]
+
+
+def par_lots(iterable, taille):
+    iterateur = iter(iterable)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset (bulk inserts, safe to run with several seeds)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academies', type=int, default=1)
+        parser.add_argument('--colleges', type=int, default=2, help="Total number of colleges")
+        parser.add_argument('--students', type=int, default=1000, help="Total number of students")
+        parser.add_argument('--days', type=int, default=30, help="School days of attendance to generate")
+        parser.add_argument('--teachers-per-department', type=int, default=3)
+        parser.add_argument('--subjects-per-student', type=int, default=6)
+        parser.add_argument('--cours-per-subject', type=int, default=3)
+        parser.add_argument('--absence-rate', type=float, default=0.07)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help="Delete the data previously generated with this seed first")
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help="SQLite: drop Presence indexes during the load and rebuild them at the end (much faster "
+                                 "for millions of rows; an interrupted run must be finished with 'migrate' or a rerun)")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.taille_lot = options['batch_size']
+        self.prefixe = f"g{options['seed']}"
+
+        if options['flush']:
+            self.supprimer()
+        elif Academie.objects.filter(nom__startswith=f"Académie {self.prefixe}-").exists():
+            raise CommandError(f"Data for seed {options['seed']} already exists: use --flush or another --seed")
+
+        debut = time.perf_counter()
+        with transaction.atomic():
+            colleges = self.creer_etablissements(options['academies'], options['colleges'])
+            matieres_par_college = self.creer_equipes(colleges, options['teachers_per_department'],
+                                                      options['cours_per_subject'])
+            inscriptions = self.creer_eleves(colleges, matieres_par_college, options['students'],
+                                             options['subjects_per_student'])
+            self.creer_inscriptions(inscriptions)
+            self.creer_notes(inscriptions)
+        self.creer_presences(inscriptions, options['days'], options['absence_rate'], options['defer_indexes'])
+
+        self.etape("Statistiques des notes, compteurs et cumuls de présence")
+        StatistiqueNotes.reconstruire()
+        Compteur.reconcilier()
+        # The raw INSERTs are timestamped so a refresh would see them, but one rebuild is cheaper at this volume
+        CumulPresence.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"Terminé en {time.perf_counter() - debut:.1f}s"))
+
+    def etape(self, libelle):
+        self.stdout.write(f"→ {libelle}")
+        self.stdout.flush()
+
+    def inserer(self, model, objets, libelle):
+        """bulk_create a (lazy) iterable in batches, streaming progress; returns the created objects"""
+        crees = []
+        total = 0
+        debut = time.perf_counter()
+        for lot in par_lots(objets, self.taille_lot):
+            crees.extend(model.objects.bulk_create(lot))
+            total += len(lot)
+            self.stdout.write(f"\r  {libelle}: {total} ({total / (time.perf_counter() - debut):.0f}/s)", ending='')
+            self.stdout.flush()
+        self.stdout.write('')
+        return crees
+
+    def supprimer(self):
+        self.etape(f"Suppression des données {self.prefixe}")
+        with transaction.atomic():
+            # Raw DELETE like the raw INSERTs: the per-row signal would recompute rollups rebuilt just below
+            eleves = Eleve.objects.filter(utilisateur__identifiant__startswith=f"{self.prefixe}-").values('id')
+            sql, params = eleves.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(Presence._meta.db_table)} "
+                               f"WHERE eleve_id IN ({sql})", params)
+            Utilisateur.objects.filter(identifiant__startswith=f"{self.prefixe}-").delete()
+            Salle.objects.filter(numero__startswith=f"{self.prefixe}-").delete()
+            Academie.objects.filter(nom__startswith=f"Académie {self.prefixe}-").delete()
+        StatistiqueNotes.reconstruire()
+        CumulPresence.reconstruire()
+
+    def utilisateur(self, role, numero):
+        prenom = self.rng.choice(PRENOMS)
+        nom = self.rng.choice(NOMS)
+        identifiant = f"{self.prefixe}-{role}{numero}"
+        return Utilisateur(
+            nom=nom, prenom=prenom, tel=f"06{self.rng.randrange(10 ** 8):08d}",
+            mail=f"{identifiant}@agl.fr", identifiant=identifiant,
+        )
+
+    def creer_etablissements(self, nb_academies, nb_colleges):
+        self.etape("Académies et collèges")
+        admin = self.utilisateur('admin', 1)
+        admin.save()
+        Administrateur.objects.create(utilisateur=admin)
+        academies = Academie.objects.bulk_create(
+            Academie(nom=f"Académie {self.prefixe}-{i + 1}") for i in range(nb_academies))
+        return College.objects.bulk_create(
+            College(
+                nom=f"Collège {self.prefixe}-{i + 1}",
+                adresse=f"{self.rng.randrange(1, 200)} rue {self.rng.choice(NOMS)}",
+                telephone=f"01{self.rng.randrange(10 ** 8):08d}",
+                academie=academies[i % nb_academies],
+            )
+            for i in range(nb_colleges)
+        )
+
+    def creer_equipes(self, colleges, profs_par_departement, cours_par_matiere):
+        self.etape("Départements, enseignants, salles et matières")
+        departements = Departement.objects.bulk_create(
+            Departement(nom=nom, code_departement=f"{self.prefixe}-{college.id}-{code}", college=college)
+            for college in colleges for nom, code, _ in DEPARTEMENTS
+        )
+        users = self.inserer(Utilisateur, (
+            self.utilisateur('prof', i + 1) for i in range(len(departements) * profs_par_departement)
+        ), "utilisateurs (enseignants)")
+        enseignants = self.inserer(Enseignant, (
+            Enseignant(
+                utilisateur=user, indice=self.rng.randrange(350, 800),
+                datePriseFonction=date(2000, 9, 1) + timedelta(days=self.rng.randrange(9000)),
+                departement=departements[i // profs_par_departement],
+            )
+            for i, user in enumerate(users)
+        ), "enseignants")
+        for i, departement in enumerate(departements):
+            departement.responsable = enseignants[i * profs_par_departement]
+        Departement.objects.bulk_update(departements, ['responsable'])
+
+        salles = Salle.objects.bulk_create(
+            Salle(numero=f"{self.prefixe}-{college.id}-{n + 101}", capacite=self.rng.choice([25, 30, 35]))
+            for college in colleges for n in range(len(DEPARTEMENTS) * 2)
+        )
+        matieres = []
+        for i, departement in enumerate(departements):
+            equipe = enseignants[i * profs_par_departement:(i + 1) * profs_par_departement]
+            for j, libelle in enumerate(DEPARTEMENTS[i % len(DEPARTEMENTS)][2]):
+                matieres.append(Matiere(
+                    libelle=libelle, departement=departement, enseignant=equipe[j % len(equipe)],
+                    salle=salles[i * 2 + j],
+                ))
+        matieres = Matiere.objects.bulk_create(matieres)
+        self.inserer(Cours, (
+            Cours(
+                titre=f"{matiere.libelle} - {'Chapitre' if k % 2 == 0 else 'Exercices'} {k + 1}",
+                type_contenu='cours' if k % 2 == 0 else 'exercice',
+                contenu=f"Contenu généré pour {matiere.libelle}, séance {k + 1}.",
+                matiere=matiere, enseignant=matiere.enseignant,
+            )
+            for matiere in matieres for k in range(cours_par_matiere)
+        ), "cours")
+
+        par_college = {college.id: [] for college in colleges}
+        for matiere in matieres:
+            par_college[matiere.departement.college_id].append(matiere)
+        return par_college
+
+    def creer_eleves(self, colleges, matieres_par_college, nb_eleves, matieres_par_eleve):
+        """Create students; returns [(eleve_id, [matiere, ...])] so later steps don't re-query"""
+        self.etape("Élèves")
+        users = self.inserer(Utilisateur, (self.utilisateur('eleve', i + 1) for i in range(nb_eleves)), "utilisateurs (élèves)")
+        eleves = self.inserer(Eleve, (
+            Eleve(utilisateur=user, anneeEntree=self.rng.randrange(2020, 2026)) for user in users
+        ), "élèves")
+        inscriptions = []
+        for i, eleve in enumerate(eleves):
+            offre = matieres_par_college[colleges[i % len(colleges)].id]
+            inscriptions.append((eleve.id, self.rng.sample(offre, min(matieres_par_eleve, len(offre)))))
+        return inscriptions
+
+    def creer_inscriptions(self, inscriptions):
+        self.etape("Inscriptions")
+        self.inserer(Inscription, (
+            Inscription(eleve_id=eleve_id, matiere=matiere)
+            for eleve_id, matieres in inscriptions for matiere in matieres
+        ), "inscriptions")
+
+    def creer_notes(self, inscriptions):
+        self.etape("Notes")
+        self.inserer(Notes, (
+            Notes(eleve_id=eleve_id, matiere=matiere,
+                  valeur=round(min(20, max(0, self.rng.gauss(12, 3.5))) * 2) / 2)
+            for eleve_id, matieres in inscriptions for matiere in matieres
+        ), "notes")
+
+    def creer_presences(self, inscriptions, nb_jours, taux_absence, differer_index):
+        self.etape("Présences")
+        jours = []
+        jour = date.today() - timedelta(days=1)
+        while len(jours) < nb_jours:
+            if jour.weekday() < 5:
+                jours.append(jour)
+            jour -= timedelta(days=1)
+        maintenant = timezone.now()
+        lignes = (
+            (eleve_id, matiere.id, jour, self.rng.random() >= taux_absence, matiere.enseignant_id, maintenant)
+            for jour in reversed(jours) for eleve_id, matieres in inscriptions for matiere in matieres
+        )
+        # Model instances cost more than the INSERT itself at this volume: send plain tuples
+        table = connection.ops.quote_name(Presence._meta.db_table)
+        sql = (f"INSERT INTO {table} (eleve_id, matiere_id, date, present, enseignant_id, modifie_le) "
+               f"VALUES (%s, %s, %s, %s, %s, %s)")
+        total = 0
+        debut = time.perf_counter()
+        with self.chargement_rapide(Presence, differer_index):
+            for lot in par_lots(lignes, self.taille_lot):
+                # One transaction per batch: bounded journal, and a crash keeps the batches already written
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.executemany(sql, lot)
+                total += len(lot)
+                self.stdout.write(f"\r  présences: {total} ({total / (time.perf_counter() - debut):.0f}/s)", ending='')
+                self.stdout.flush()
+            self.stdout.write('')
+
+    @contextmanager
+    def chargement_rapide(self, model, differer_index):
+        """SQLite bulk-load settings; optionally drop the table's indexes and rebuild them once at the end"""
+        if connection.vendor != 'sqlite':
+            yield
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            synchronous = cursor.fetchone()[0]
+            cursor.execute("PRAGMA cache_size")
+            cache_size = cursor.fetchone()[0]
+            cursor.execute("PRAGMA synchronous = OFF")
+            cursor.execute("PRAGMA cache_size = -262144")
+            index = []
+            if differer_index:
+                cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                    [model._meta.db_table])
+                index = cursor.fetchall()
+                for nom, _ in index:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(nom)}")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                if index:
+                    self.etape(f"Reconstruction de {len(index)} index")
+                    for _, sql in index:
+                        cursor.execute(sql)
+                cursor.execute(f"PRAGMA synchronous = {synchronous}")
+                cursor.execute(f"PRAGMA cache_size = {cache_size}")
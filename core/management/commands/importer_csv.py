@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import IMPORTS, TAILLE_LOT, LigneInvalide, demarrer, importer
+
+
+class Command(BaseCommand):
+    help = ("Import students, teachers, departments or grades from a CSV file in batches. "
+            "Running it again on the same file resumes an interrupted import.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('type_import', choices=sorted(IMPORTS))
+        parser.add_argument('fichier')
+        parser.add_argument('--batch-size', type=int, default=TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        chemin = Path(options['fichier'])
+        if not chemin.is_file():
+            raise CommandError(f"{chemin} introuvable")
+
+        with chemin.open('rb') as fichier:
+            execution = demarrer(options['type_import'], chemin.name, fichier)
+            if execution.statut == 'termine':
+                self.stdout.write(self.style.WARNING(
+                    f"Fichier déjà importé le {execution.date_fin:%d/%m/%Y %H:%M} : {execution.message}"))
+                return
+            if execution.lignes_lues:
+                self.stdout.write(f"Reprise après {execution.lignes_lues} lignes déjà traitées")
+            try:
+                importer(execution, fichier, options['batch_size'], self.progression)
+            except LigneInvalide as erreur:
+                raise CommandError(str(erreur))
+            finally:
+                self.stdout.write('')
+
+        for ligne, message in execution.erreurs:
+            self.stdout.write(self.style.WARNING(f"  ligne {ligne} : {message}"))
+        if execution.lignes_rejetees > len(execution.erreurs):
+            self.stdout.write(f"  ... et {execution.lignes_rejetees - len(execution.erreurs)} autres lignes rejetées")
+        self.stdout.write(self.style.SUCCESS(execution.message))
+
+    def progression(self, execution, debit):
+        self.stdout.write(f"\r  lignes: {execution.lignes_lues} (importées {execution.lignes_importees}, "
+                          f"rejetées {execution.lignes_rejetees}, {debit:.0f}/s)", ending='')
+        self.stdout.flush()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Compteur
+
+
+class Command(BaseCommand):
+    help = "Recount the admin dashboard counters from the source tables (run periodically, e.g. nightly cron)"
+
+    def handle(self, *args, **options):
+        total = Compteur.reconcilier()
+        self.stdout.write(self.style.SUCCESS(f"{total} compteurs recalculés"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import StatistiqueNotes
+
+
+class Command(BaseCommand):
+    help = "Rebuild the StatistiqueNotes table from scratch using the Notes rows"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = StatistiqueNotes.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"{total} statistiques reconstruites"))
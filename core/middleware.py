@@ -0,0 +1,205 @@
+import heapq
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import base as template_base
+
+# Recorder of the request currently being measured (None when the request isn't sampled)
+_mesure_courante = ContextVar('mesure_courante', default=None)
+
+
+class Mesure:
+    """Timings collected for one request"""
+
+    def __init__(self, nb_lentes):
+        self.debut = time.perf_counter()
+        self.requetes = 0
+        self.duree_sql = 0.0
+        self.duree_templates = 0.0
+        self.duree_sql_templates = 0.0  # lazy querysets evaluated while rendering
+        self.profondeur_template = 0
+        self.lentes = []  # min-heap of (durée, sql), the slowest statements
+        self.nb_lentes = nb_lentes
+
+    def enregistrer(self, duree, sql):
+        self.requetes += 1
+        self.duree_sql += duree
+        if self.profondeur_template:
+            self.duree_sql_templates += duree
+        if len(self.lentes) < self.nb_lentes:
+            heapq.heappush(self.lentes, (duree, sql))
+        elif duree > self.lentes[0][0]:
+            heapq.heapreplace(self.lentes, (duree, sql))
+
+
+def _chronometrer(execute, sql, params, many, context):
+    """Execute wrapper installed once on every connection; it records into the sampled request, if any.
+
+    The recorder is found through a ContextVar rather than installed per request because async views
+    run their queries on other threads (sync_to_async), each with its own connection.
+    """
+    mesure = _mesure_courante.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure.enregistrer(time.perf_counter() - debut, sql)
+
+
+def _installer_chronometre(connection, **kwargs):
+    if _chronometrer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_chronometrer)
+
+
+connection_created.connect(_installer_chronometre)
+
+
+def _instrumenter_templates():
+    """Wrap Template.render once so the outermost render of a sampled request is timed"""
+    if getattr(template_base.Template.render, '_agl_mesure', False):
+        return
+    render_origine = template_base.Template.render
+
+    def render(self, context):
+        mesure = _mesure_courante.get()
+        if mesure is None:
+            return render_origine(self, context)
+        mesure.profondeur_template += 1
+        debut = time.perf_counter()
+        try:
+            return render_origine(self, context)
+        finally:
+            mesure.profondeur_template -= 1
+            if mesure.profondeur_template == 0:
+                mesure.duree_templates += time.perf_counter() - debut
+
+    render._agl_mesure = True
+    template_base.Template.render = render
+
+
+class StatistiquesVue:
+    """Rolling window of the last measurements for one URL name"""
+
+    def __init__(self, taille):
+        self.durees = deque(maxlen=taille)
+        self.durees_sql = deque(maxlen=taille)
+        self.requetes = deque(maxlen=taille)
+        self.total = 0
+        self.lentes = []
+
+    def ajouter(self, duree, mesure):
+        self.durees.append(duree)
+        self.durees_sql.append(mesure.duree_sql)
+        self.requetes.append(mesure.requetes)
+        self.total += 1
+        for lente in mesure.lentes:
+            if len(self.lentes) < mesure.nb_lentes:
+                heapq.heappush(self.lentes, lente)
+            elif lente[0] > self.lentes[0][0]:
+                heapq.heapreplace(self.lentes, lente)
+
+    def centile(self, p):
+        valeurs = sorted(self.durees)
+        if not valeurs:
+            return 0.0
+        return valeurs[min(len(valeurs) - 1, int(p / 100 * len(valeurs)))]
+
+    def resume(self):
+        n = len(self.durees) or 1
+        return {
+            'total': self.total,
+            'p50': self.centile(50) * 1000,
+            'p95': self.centile(95) * 1000,
+            'p99': self.centile(99) * 1000,
+            'sql_moyen': sum(self.durees_sql) / n * 1000,
+            'requetes_moyennes': sum(self.requetes) / n,
+            'lentes': [(duree * 1000, sql) for duree, sql in sorted(self.lentes, reverse=True)],
+        }
+
+
+# Per-process store: each worker reports what it served
+_statistiques = defaultdict(lambda: StatistiquesVue(getattr(settings, 'PERFORMANCE_WINDOW', 1000)))
+_verrou = threading.Lock()
+
+
+def statistiques_performances():
+    """{url_name: résumé} for the performance dashboard"""
+    with _verrou:
+        return {nom: stats.resume() for nom, stats in sorted(_statistiques.items())}
+
+
+class PerformanceMiddleware:
+    """Per-request SQL/template/total timings exposed as a Server-Timing header.
+
+    Only a fraction PERFORMANCE_SAMPLE_RATE of requests is measured, so it can stay on in production.
+    Works under WSGI and ASGI (async views).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.taux = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 1.0)
+        self.nb_lentes = getattr(settings, 'PERFORMANCE_SLOW_QUERIES', 3)
+        self.mode_async = iscoroutinefunction(get_response)
+        if self.mode_async:
+            markcoroutinefunction(self)
+        _instrumenter_templates()
+
+    def echantillonner(self):
+        return self.taux > 0 and random.random() < self.taux
+
+    def __call__(self, request):
+        if self.mode_async:
+            return self.__acall__(request)
+        if not self.echantillonner():
+            return self.get_response(request)
+
+        # Connections opened before the signal was hooked up (e.g. at startup)
+        for alias in connections:
+            _installer_chronometre(connections[alias])
+        mesure = Mesure(self.nb_lentes)
+        jeton = _mesure_courante.set(mesure)
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure)
+
+    async def __acall__(self, request):
+        if not self.echantillonner():
+            return await self.get_response(request)
+
+        mesure = Mesure(self.nb_lentes)
+        jeton = _mesure_courante.set(mesure)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.terminer(request, response, mesure)
+
+    def terminer(self, request, response, mesure):
+        duree = time.perf_counter() - mesure.debut
+
+        duree_templates = mesure.duree_templates - mesure.duree_sql_templates
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={mesure.duree_sql * 1000:.1f};desc="{mesure.requetes} requetes SQL"',
+            f'tpl;dur={duree_templates * 1000:.1f}',
+            f'view;dur={(duree - mesure.duree_sql - duree_templates) * 1000:.1f}',
+            f'total;dur={duree * 1000:.1f}',
+        ])
+        match = getattr(request, 'resolver_match', None)
+        if match and match.url_name:
+            with _verrou:
+                _statistiques[match.url_name].ajouter(duree, mesure)
+        return response
+
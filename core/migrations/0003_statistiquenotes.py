@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:35
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def remplir_statistiques(apps, schema_editor):
+    Notes = apps.get_model('core', 'Notes')
+    StatistiqueNotes = apps.get_model('core', 'StatistiqueNotes')
+    champs = {'eleve': 'eleve', 'matiere': 'matiere', 'departement': 'matiere__departement'}
+    lignes = []
+    for portee, champ in champs.items():
+        agregats = (Notes.objects.order_by().values(champ)
+                    .annotate(somme=Sum('valeur'), nombre=Count('id'),
+                              minimum=Min('valeur'), maximum=Max('valeur')))
+        lignes.extend(
+            StatistiqueNotes(portee=portee, objet_id=a[champ], somme=a['somme'], nombre=a['nombre'],
+                             minimum=a['minimum'], maximum=a['maximum'])
+            for a in agregats if a[champ] is not None
+        )
+    StatistiqueNotes.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_college_adresse_college_telephone_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueNotes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portee', models.CharField(choices=[('eleve', 'Élève'), ('matiere', 'Matière'), ('departement', 'Département')], max_length=20)),
+                ('objet_id', models.BigIntegerField()),
+                ('somme', models.FloatField(default=0)),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Statistiques des notes',
+                'unique_together': {('portee', 'objet_id')},
+            },
+        ),
+        migrations.RunPython(remplir_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_statistiquenotes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['enseignant', '-date_creation', '-id'], name='cours_enseignant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cours',
+            index=models.Index(fields=['matiere', '-date_creation', '-id'], name='cours_matiere_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notes',
+            index=models.Index(fields=['matiere', 'valeur'], name='notes_matiere_valeur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['eleve', '-date', '-id'], name='presence_eleve_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(condition=models.Q(('present', False)), fields=['eleve', '-date'], name='presence_absences_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['enseignant', '-date', '-id'], name='presence_enseignant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['matiere', 'date'], name='presence_matiere_date_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:54
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remplir_compteurs(apps, schema_editor):
+    Compteur = apps.get_model('core', 'Compteur')
+    modeles = {
+        'college': ('College', None, 'academie'),
+        'departement': ('Departement', 'college', 'college__academie'),
+        'enseignant': ('Enseignant', 'departement__college', 'departement__college__academie'),
+        'matiere': ('Matiere', 'departement__college', 'departement__college__academie'),
+        'eleve': ('Eleve', None, None),
+    }
+    lignes = []
+    for modele, (nom, vers_college, vers_academie) in modeles.items():
+        classe = apps.get_model('core', nom)
+        lignes.append(Compteur(modele=modele, portee='global', objet_id=0, valeur=classe.objects.count()))
+        for portee, champ in (('college', vers_college), ('academie', vers_academie)):
+            if not champ:
+                continue
+            comptes = classe.objects.order_by().values(champ).annotate(n=Count('pk')).values_list(champ, 'n')
+            lignes.extend(Compteur(modele=modele, portee=portee, objet_id=objet_id, valeur=n)
+                          for objet_id, n in comptes if objet_id is not None)
+    Compteur.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_index_requetes_frequentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compteur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=20)),
+                ('portee', models.CharField(choices=[('global', 'Global'), ('academie', 'Académie'), ('college', 'Collège')], default='global', max_length=20)),
+                ('objet_id', models.BigIntegerField(default=0)),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('modele', 'portee', 'objet_id')},
+            },
+        ),
+        migrations.RunPython(remplir_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:55
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_compteur'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(django.db.models.functions.text.Lower('nom'), name='utilisateur_nom_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(django.db.models.functions.text.Lower('prenom'), name='utilisateur_prenom_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utilisateur',
+            index=models.Index(django.db.models.functions.text.Lower('identifiant'), name='utilisateur_ident_lower_idx'),
+        ),
+    ]
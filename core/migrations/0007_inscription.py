@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 05:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def inscrire_eleves_existants(apps, schema_editor):
+    """Enroll every student in the subjects they already have grades or attendance in"""
+    Inscription = apps.get_model('core', 'Inscription')
+    couples = set()
+    for nom in ('Notes', 'Presence'):
+        modele = apps.get_model('core', nom)
+        couples.update(modele.objects.order_by().values_list('eleve_id', 'matiere_id').distinct().iterator())
+    Inscription.objects.bulk_create(
+        (Inscription(eleve_id=eleve_id, matiere_id=matiere_id) for eleve_id, matiere_id in sorted(couples)),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_index_recherche_utilisateur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Inscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_inscription', models.DateField(auto_now_add=True)),
+                ('eleve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inscriptions', to='core.eleve')),
+                ('matiere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inscriptions', to='core.matiere')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='eleve',
+            name='matieres',
+            field=models.ManyToManyField(blank=True, related_name='eleves', through='core.Inscription', to='core.matiere'),
+        ),
+        migrations.AddIndex(
+            model_name='inscription',
+            index=models.Index(fields=['matiere', 'eleve'], name='inscription_matiere_eleve_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inscription',
+            constraint=models.UniqueConstraint(fields=('eleve', 'matiere'), name='inscription_unique'),
+        ),
+        migrations.RunPython(inscrire_eleves_existants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_inscription'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCsv',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_import', models.CharField(max_length=20)),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('empreinte', models.CharField(max_length=64)),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_cours', max_length=10)),
+                ('lignes_lues', models.PositiveIntegerField(default=0)),
+                ('lignes_importees', models.PositiveIntegerField(default=0)),
+                ('lignes_rejetees', models.PositiveIntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True)),
+                ('date_debut', models.DateTimeField(auto_now_add=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('type_import', 'empreinte'), name='import_csv_fichier_unique')],
+            },
+        ),
+    ]
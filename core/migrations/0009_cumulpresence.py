@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:16
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+
+def remplir_cumuls(apps, schema_editor):
+    """Daily and weekly attendance rollups of the existing Presence rows"""
+    Presence = apps.get_model('core', 'Presence')
+    CumulPresence = apps.get_model('core', 'CumulPresence')
+    ActualisationPresences = apps.get_model('core', 'ActualisationPresences')
+    maintenant = timezone.now()
+    for portee, champ in (('eleve', 'eleve_id'), ('matiere', 'matiere_id')):
+        for periode, cle in (('jour', F('date')), ('semaine', TruncWeek('date'))):
+            comptes = (Presence.objects.order_by().values(champ, debut=cle)
+                       .annotate(p=Count('id', filter=Q(present=True)), a=Count('id', filter=Q(present=False))))
+            CumulPresence.objects.bulk_create(
+                (CumulPresence(portee=portee, objet_id=c[champ], periode=periode, debut=c['debut'],
+                               presents=c['p'], absences=c['a']) for c in comptes.iterator(chunk_size=2000)),
+                batch_size=500,
+            )
+    ActualisationPresences.objects.create(pk=1, jusqu_a=maintenant)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_importcsv'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActualisationPresences',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jusqu_a', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CumulPresence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('portee', models.CharField(choices=[('eleve', 'Élève'), ('matiere', 'Matière')], max_length=10)),
+                ('objet_id', models.BigIntegerField()),
+                ('periode', models.CharField(choices=[('jour', 'Jour'), ('semaine', 'Semaine')], max_length=10)),
+                ('debut', models.DateField()),
+                ('presents', models.PositiveIntegerField(default=0)),
+                ('absences', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='presence',
+            name='modifie_le',
+            # Existing rows are folded in by remplir_cumuls: date them well before its watermark
+            field=models.DateTimeField(auto_now=True, default=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['modifie_le'], name='presence_modifie_le_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cumulpresence',
+            unique_together={('portee', 'objet_id', 'periode', 'debut')},
+        ),
+        migrations.RunPython(remplir_cumuls, migrations.RunPython.noop),
+    ]
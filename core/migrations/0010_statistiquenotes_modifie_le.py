@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_cumulpresence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistiquenotes',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
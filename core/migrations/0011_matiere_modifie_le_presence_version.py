@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_statistiquenotes_modifie_le'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matiere',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['eleve', 'modifie_le'], name='presence_eleve_modifie_idx'),
+        ),
+    ]
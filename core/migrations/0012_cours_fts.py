@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:05
+
+from django.db import migrations
+
+from core.index_cours import CREER_TABLE, CREER_TRIGGERS, REMPLIR, SUPPRIMER_TABLE, SUPPRIMER_TRIGGERS, executer
+
+# Full-text index of Cours for core.recherche, see core/index_cours.py.
+# Later migrations that rebuild core_cours must wrap their operations in core.index_cours.autour_de_cours().
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_matiere_modifie_le_presence_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(executer(CREER_TABLE + CREER_TRIGGERS + REMPLIR),
+                             executer(SUPPRIMER_TRIGGERS + SUPPRIMER_TABLE)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['enseignant', 'modifie_le'], name='presence_ens_modifie_idx'),
+        ),
+    ]
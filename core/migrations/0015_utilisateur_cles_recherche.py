@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:29
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def cle_recherche(texte):
+    # Frozen copy of core.models.cle_recherche
+    decompose = unicodedata.normalize('NFKD', texte.casefold())
+    return ''.join(c for c in decompose if not unicodedata.combining(c))
+
+def remplir_cles(apps, schema_editor):
+    """Fill the search keys of the existing users"""
+    Utilisateur = apps.get_model('core', 'Utilisateur')
+    lot = []
+    for utilisateur in Utilisateur.objects.only('nom', 'prenom', 'identifiant').iterator(chunk_size=2000):
+        utilisateur.nom_recherche = cle_recherche(utilisateur.nom)
+        utilisateur.prenom_recherche = cle_recherche(utilisateur.prenom)
+        utilisateur.identifiant_recherche = cle_recherche(utilisateur.identifiant)
+        lot.append(utilisateur)
+    Utilisateur.objects.bulk_update(lot, ['nom_recherche', 'prenom_recherche', 'identifiant_recherche'],
+                                    batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_presence_enseignant_modifie_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='utilisateur',
+            name='utilisateur_nom_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='utilisateur',
+            name='utilisateur_prenom_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='utilisateur',
+            name='utilisateur_ident_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='utilisateur',
+            name='identifiant_recherche',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='utilisateur',
+            name='nom_recherche',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='utilisateur',
+            name='prenom_recherche',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(remplir_cles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_utilisateur_cles_recherche'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salle',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='utilisateur',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,12 +1,75 @@
-from django.db import models
+import unicodedata
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncWeek
 from django.utils import timezone
 
+
+def _arrondir(moyenne):
+    return round(moyenne, 2) if moyenne is not None else 0.0
+
+
+def _ids(objets):
+    """Accept model instances, ids or a queryset and return something usable in __in"""
+    if isinstance(objets, models.QuerySet):
+        return objets.values('pk')
+    return [getattr(o, 'pk', o) for o in objets]
+
+def cle_recherche(texte):
+    """Search form of a name: casefolded, accents removed ('Éric' -> 'eric')"""
+    decompose = unicodedata.normalize('NFKD', texte.casefold())
+    return ''.join(c for c in decompose if not unicodedata.combining(c))
+
+class UtilisateurQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(): fill the search keys here (queryset.update() of a name still bypasses them)
+        objs = list(objs)
+        for utilisateur in objs:
+            utilisateur.indexer_recherche()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class Utilisateur(models.Model):
+    CHAMPS_RECHERCHE = {'nom': 'nom_recherche', 'prenom': 'prenom_recherche', 'identifiant': 'identifiant_recherche'}
+
     nom = models.CharField(max_length=100)
     prenom = models.CharField(max_length=100)
     tel = models.CharField(max_length=30, blank=True)
     mail = models.EmailField(unique=True)
     identifiant = models.CharField(max_length=50, unique=True)
+    # cle_recherche() of the fields above, for the prefix search (rechercher)
+    nom_recherche = models.CharField(max_length=100, editable=False, db_index=True, default='')
+    prenom_recherche = models.CharField(max_length=100, editable=False, db_index=True, default='')
+    identifiant_recherche = models.CharField(max_length=50, editable=False, db_index=True, default='')
+    modifie_le = models.DateTimeField(auto_now=True)  # names are part of the JSON API versions
+
+    objects = UtilisateurQuerySet.as_manager()
+
+    def indexer_recherche(self):
+        for champ, cle in self.CHAMPS_RECHERCHE.items():
+            setattr(self, cle, cle_recherche(getattr(self, champ)))
+
+    def save(self, *args, **kwargs):
+        self.indexer_recherche()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'modifie_le'} | {
+                cle for champ, cle in self.CHAMPS_RECHERCHE.items() if champ in kwargs['update_fields']}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def rechercher(cls, terme):
+        """Users whose nom, prenom or identifiant starts with `terme` (ignoring case and accents, index range scans)"""
+        terme = cle_recherche(terme.strip())
+        if not terme:
+            return cls.objects.none()
+        borne = terme + '\U0010ffff'
+        return cls.objects.filter(reduce(or_, (
+            models.Q(**{f'{cle}__gte': terme, f'{cle}__lt': borne}) for cle in cls.CHAMPS_RECHERCHE.values()
+        )))
 
     def imprimerFiche(self):
         return f"{self.prenom} {self.nom} | {self.mail} | {self.tel}"
@@ -50,11 +113,13 @@ class Departement(models.Model):
     
     def calculerMoyenneDepartement(self):
         """Calculate average for all students in department's subjects"""
-        matieres = self.matieres.all()
-        all_notes = []
-        for matiere in matieres:
-            all_notes.extend(matiere.notes_set.values_list('valeur', flat=True))
-        return round(sum(all_notes) / len(all_notes), 2) if all_notes else 0.0
+        moyenne = Notes.objects.filter(matiere__departement=self).aggregate(moyenne=Avg('valeur'))['moyenne']
+        return _arrondir(moyenne)
+
+    @staticmethod
+    def calculerMoyennesDepartements(departements):
+        """Map departement_id -> average for several departments in one query"""
+        return Notes.objects.filter(matiere__departement__in=_ids(departements)).moyennes_par('matiere__departement')
 
 class Enseignant(models.Model):
     utilisateur = models.OneToOneField(Utilisateur, on_delete=models.CASCADE, related_name="enseignant")
@@ -68,6 +133,7 @@ class Enseignant(models.Model):
 class Salle(models.Model):
     numero = models.CharField(max_length=50)
     capacite = models.IntegerField()
+    modifie_le = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Salle {self.numero}"
@@ -77,10 +143,15 @@ class Matiere(models.Model):
     departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name="matieres")
     enseignant = models.ForeignKey(Enseignant, on_delete=models.SET_NULL, null=True, blank=True, related_name="matieres")
     salle = models.ForeignKey(Salle, on_delete=models.SET_NULL, null=True, blank=True, related_name="matieres")
+    modifie_le = models.DateTimeField(auto_now=True)
 
     def calculerMoyenne(self):
-        notes = self.notes_set.all()
-        return round(sum(n.valeur for n in notes) / len(notes), 2) if notes else 0.0
+        return _arrondir(self.notes_set.aggregate(moyenne=Avg('valeur'))['moyenne'])
+
+    @staticmethod
+    def calculerMoyennes(matieres):
+        """Map matiere_id -> average for several subjects in one query"""
+        return Notes.objects.filter(matiere__in=_ids(matieres)).moyennes_par('matiere')
 
     def __str__(self):
         return self.libelle
@@ -88,26 +159,84 @@ class Matiere(models.Model):
 class Eleve(models.Model):
     utilisateur = models.OneToOneField(Utilisateur, on_delete=models.CASCADE, related_name="eleve")
     anneeEntree = models.IntegerField()
+    matieres = models.ManyToManyField(Matiere, through='Inscription', related_name="eleves", blank=True)
 
     def calculerMoyenneGenerale(self):
-        notes = self.notes_set.all()
-        return round(sum(n.valeur for n in notes) / len(notes), 2) if notes else 0.0
+        return _arrondir(self.notes_set.aggregate(moyenne=Avg('valeur'))['moyenne'])
+
+    @staticmethod
+    def calculerMoyennesGenerales(eleves):
+        """Map eleve_id -> average for several students (e.g. a class) in one query"""
+        return Notes.objects.filter(eleve__in=_ids(eleves)).moyennes_par('eleve')
     
-    def calculerHeuresAbsence(self):
-        """Calculate total hours of absence"""
-        absences = self.presences.filter(present=False).count()
-        return absences  # Each absence = 1 hour (can be adjusted)
+    def calculerHeuresAbsence(self, du=None, au=None):
+        """Hours of absence, optionally between two dates, read from the attendance rollups"""
+        return CumulPresence.totaux('eleve', self.pk, du, au)[1]  # Each absence = 1 hour (can be adjusted)
 
     def __str__(self):
         return f"Elève: {self.utilisateur}"
 
+class Inscription(models.Model):
+    """A student enrolled in a subject: the class list behind courses, grades and roll calls"""
+    eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name="inscriptions")
+    matiere = models.ForeignKey(Matiere, on_delete=models.CASCADE, related_name="inscriptions")
+    date_inscription = models.DateField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index for "subjects of a student" (leading eleve_id)
+            models.UniqueConstraint(fields=['eleve', 'matiere'], name='inscription_unique'),
+        ]
+        indexes = [
+            # Class list of a subject
+            models.Index(fields=['matiere', 'eleve'], name='inscription_matiere_eleve_idx'),
+        ]
+
+    @classmethod
+    def inscrire(cls, matiere, eleve_ids):
+        """Enroll several students in one subject in a single INSERT; already enrolled ones are skipped"""
+        cls.objects.bulk_create(
+            [cls(matiere=matiere, eleve_id=eleve_id) for eleve_id in eleve_ids], ignore_conflicts=True
+        )
+
+    def __str__(self):
+        return f"{self.eleve.utilisateur} - {self.matiere}"
+
+class NotesQuerySet(models.QuerySet):
+    def moyennes_par(self, champ):
+        """Average grade grouped by `champ` (e.g. 'eleve', 'matiere__departement'), computed in SQL"""
+        lignes = self.order_by().values(champ).annotate(moyenne=Avg('valeur'))
+        return {ligne[champ]: _arrondir(ligne['moyenne']) for ligne in lignes}
+
 class Notes(models.Model):
     valeur = models.FloatField()
     eleve = models.ForeignKey(Eleve, on_delete=models.CASCADE, related_name="notes_set")
     matiere = models.ForeignKey(Matiere, on_delete=models.CASCADE, related_name="notes_set")
 
+    objects = NotesQuerySet.as_manager()
+
+    @staticmethod
+    def enregistrer_lot(matiere, valeurs):
+        """Upsert {eleve_id: valeur} for one subject in a single INSERT ... ON CONFLICT and refresh statistics"""
+        if not valeurs:
+            return 0
+        with transaction.atomic():
+            Notes.objects.bulk_create(
+                [Notes(eleve_id=eleve_id, matiere=matiere, valeur=valeur) for eleve_id, valeur in valeurs.items()],
+                batch_size=500, update_conflicts=True, unique_fields=['eleve', 'matiere'], update_fields=['valeur'],
+            )
+            # bulk_create doesn't send signals: refresh the affected statistics rows here
+            StatistiqueNotes.recalculer('eleve', valeurs.keys())
+            StatistiqueNotes.recalculer('matiere', [matiere.pk])
+            StatistiqueNotes.recalculer('departement', [matiere.departement_id])
+        return len(valeurs)
+
     class Meta:
         unique_together = ("eleve", "matiere")
+        indexes = [
+            # Covers AVG/MIN/MAX per subject (calculerMoyenne, statistics rebuild) without touching the table
+            models.Index(fields=['matiere', 'valeur'], name='notes_matiere_valeur_idx'),
+        ]
 
     def __str__(self):
         return f"{self.eleve} - {self.matiere}: {self.valeur}"
@@ -129,6 +258,12 @@ class Cours(models.Model):
 
     class Meta:
         verbose_name_plural = "Cours"
+        indexes = [
+            # cours_list: a teacher's courses, newest first
+            models.Index(fields=['enseignant', '-date_creation', '-id'], name='cours_enseignant_date_idx'),
+            # student_cours: courses of a set of subjects, newest first
+            models.Index(fields=['matiere', '-date_creation', '-id'], name='cours_matiere_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titre} ({self.matiere})"
@@ -140,11 +275,527 @@ class Presence(models.Model):
     date = models.DateField(default=timezone.now)
     present = models.BooleanField(default=True)
     enseignant = models.ForeignKey(Enseignant, on_delete=models.CASCADE, related_name="presences_marquees")
+    modifie_le = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("eleve", "matiere", "date")
         ordering = ['-date']
+        indexes = [
+            # student_presences: a student's history, newest first
+            models.Index(fields=['eleve', '-date', '-id'], name='presence_eleve_date_idx'),
+            # student_dashboard recent absences: only absences are indexed, a small fraction of rows
+            models.Index(fields=['eleve', '-date'], condition=models.Q(present=False), name='presence_absences_idx'),
+            # presence_list: rows marked by a teacher, newest first
+            models.Index(fields=['enseignant', '-date', '-id'], name='presence_enseignant_date_idx'),
+            # presence_appel: one subject on one day
+            models.Index(fields=['matiere', 'date'], name='presence_matiere_date_idx'),
+            # CumulPresence.actualiser: rows changed since the last refresh
+            models.Index(fields=['modifie_le'], name='presence_modifie_le_idx'),
+            # Student API: version of a student's attendance, read from the index alone
+            models.Index(fields=['eleve', 'modifie_le'], name='presence_eleve_modifie_idx'),
+            # Teacher API: version of the roll calls a teacher marked
+            models.Index(fields=['enseignant', 'modifie_le'], name='presence_ens_modifie_idx'),
+        ]
+
+    @staticmethod
+    def enregistrer_appel(matiere, date, enseignant, presences):
+        """Upsert a whole roll call {eleve_id: present} for one subject and date in a single statement"""
+        if not presences:
+            return 0
+        lignes = [Presence(eleve_id=eleve_id, matiere=matiere, date=date, present=present, enseignant=enseignant)
+                  for eleve_id, present in presences.items()]
+        with transaction.atomic():
+            Presence.objects.bulk_create(
+                lignes, batch_size=500, update_conflicts=True, unique_fields=['eleve', 'matiere', 'date'],
+                update_fields=['present', 'enseignant', 'modifie_le'],
+            )
+            CumulPresence.recalculer((eleve_id, matiere.pk, date) for eleve_id in presences)
+        return len(presences)
 
     def __str__(self):
         status = "Présent" if self.present else "Absent"
-        return f"{self.eleve} - {self.matiere} ({self.date}): {status}"
\ No newline at end of file
+        return f"{self.eleve} - {self.matiere} ({self.date}): {status}"
+
+class ActualisationPresences(models.Model):
+    """Single row: Presence changes up to this time are folded into CumulPresence"""
+    jusqu_a = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Cumuls de présence à jour au {self.jusqu_a}"
+
+class CumulPresence(models.Model):
+    """Attendance totals per student or subject and per day or week (Monday), rolled up from Presence"""
+    PORTEE_CHOICES = [
+        ('eleve', 'Élève'),
+        ('matiere', 'Matière'),
+    ]
+    PERIODE_CHOICES = [
+        ('jour', 'Jour'),
+        ('semaine', 'Semaine'),
+    ]
+    CHAMPS = {'eleve': 'eleve_id', 'matiere': 'matiere_id'}
+    # Changes are read again with this overlap, so rows committed late by a long transaction aren't missed
+    MARGE = timedelta(minutes=5)
+    TAILLE_LOT = 500
+
+    portee = models.CharField(max_length=10, choices=PORTEE_CHOICES)
+    objet_id = models.BigIntegerField()
+    periode = models.CharField(max_length=10, choices=PERIODE_CHOICES)
+    debut = models.DateField()  # the day, or the Monday of the week
+    presents = models.PositiveIntegerField(default=0)
+    absences = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also the index for the date-range reads of one student or subject
+        unique_together = ("portee", "objet_id", "periode", "debut")
+
+    def __str__(self):
+        return f"{self.portee} {self.objet_id} ({self.periode} du {self.debut}): {self.absences} absence(s)"
+
+    @staticmethod
+    def _periodes(du, au):
+        """Q over the rows covering [du, au]: whole weeks from weekly rows, the edges from daily rows"""
+        semaines = Q(periode='semaine')
+        jours = []
+        lundi = fin = None
+        if du is not None:
+            lundi = du + timedelta(days=-du.weekday() % 7)  # first Monday on or after du
+            semaines &= Q(debut__gte=lundi)
+            jours.append(Q(periode='jour', debut__gte=du, debut__lt=lundi))
+        if au is not None:
+            fin = au - timedelta(days=(au.weekday() + 1) % 7)  # last Sunday on or before au
+            semaines &= Q(debut__lte=fin - timedelta(days=6))
+            jours.append(Q(periode='jour', debut__gt=fin, debut__lte=au))
+        if lundi is not None and fin is not None and lundi > fin:
+            # No whole week inside the range
+            return Q(periode='jour', debut__gte=du, debut__lte=au)
+        return reduce(or_, jours, semaines)
+
+    @classmethod
+    def totaux(cls, portee, objet_id, du=None, au=None):
+        """(presents, absences) of one student or subject between two dates (None: unbounded)"""
+        return cls.totaux_par(portee, [objet_id], du, au).get(objet_id, (0, 0))
+
+    @classmethod
+    def totaux_par(cls, portee, objet_ids, du=None, au=None):
+        """{objet_id: (presents, absences)} for several students or subjects in one query"""
+        lignes = (cls.objects.filter(cls._periodes(du, au), portee=portee, objet_id__in=_ids(objet_ids))
+                  .order_by().values('objet_id').annotate(p=Sum('presents'), a=Sum('absences')))
+        return {ligne['objet_id']: (ligne['p'], ligne['a']) for ligne in lignes}
+
+    @classmethod
+    def _enregistrer(cls, lignes):
+        cls.objects.bulk_create(
+            lignes, batch_size=cls.TAILLE_LOT, update_conflicts=True,
+            unique_fields=['portee', 'objet_id', 'periode', 'debut'], update_fields=['presents', 'absences'],
+        )
+
+    @classmethod
+    def _recalculer_jour(cls, portee, jour, objet_ids):
+        """Daily rows of some students/subjects from Presence (index on (eleve|matiere, date))"""
+        champ = cls.CHAMPS[portee]
+        objet_ids = list(objet_ids)
+        for i in range(0, len(objet_ids), cls.TAILLE_LOT):
+            lot = objet_ids[i:i + cls.TAILLE_LOT]
+            comptes = (Presence.objects.filter(date=jour, **{f'{champ}__in': lot}).order_by().values(champ)
+                       .annotate(p=Count('id', filter=Q(present=True)), a=Count('id', filter=Q(present=False))))
+            lignes = [cls(portee=portee, objet_id=c[champ], periode='jour', debut=jour, presents=c['p'], absences=c['a'])
+                      for c in comptes]
+            cls._enregistrer(lignes)
+            vides = set(lot) - {ligne.objet_id for ligne in lignes}
+            if vides:
+                cls.objects.filter(portee=portee, periode='jour', debut=jour, objet_id__in=vides).delete()
+
+    @classmethod
+    def _recalculer_semaine(cls, portee, lundi, objet_ids):
+        """Weekly rows from the (at most 7) daily rows of that week"""
+        objet_ids = list(objet_ids)
+        for i in range(0, len(objet_ids), cls.TAILLE_LOT):
+            lot = objet_ids[i:i + cls.TAILLE_LOT]
+            comptes = (cls.objects.filter(portee=portee, periode='jour', objet_id__in=lot,
+                                          debut__range=(lundi, lundi + timedelta(days=6)))
+                       .order_by().values('objet_id').annotate(p=Sum('presents'), a=Sum('absences')))
+            lignes = [cls(portee=portee, objet_id=c['objet_id'], periode='semaine', debut=lundi,
+                          presents=c['p'], absences=c['a']) for c in comptes]
+            cls._enregistrer(lignes)
+            vides = set(lot) - {ligne.objet_id for ligne in lignes}
+            if vides:
+                cls.objects.filter(portee=portee, periode='semaine', debut=lundi, objet_id__in=vides).delete()
+
+    @classmethod
+    def actualiser(cls):
+        """Fold the Presence rows changed since the last run into the rollups (rows written outside
+        enregistrer_appel and presence_create: imports, admin, SQL); returns the days refreshed"""
+        with transaction.atomic():
+            etat, _ = ActualisationPresences.objects.select_for_update().get_or_create(pk=1)
+            if etat.jusqu_a is None:
+                return cls.reconstruire()
+            maintenant = timezone.now()
+            changees = (Presence.objects.filter(modifie_le__gte=etat.jusqu_a - cls.MARGE).order_by()
+                        .values_list('eleve_id', 'matiere_id', 'date').distinct())
+            jours = cls.recalculer(changees.iterator(chunk_size=2000))
+            etat.jusqu_a = maintenant
+            etat.save(update_fields=['jusqu_a'])
+        return jours
+
+    @classmethod
+    def recalculer(cls, cles):
+        """Recompute the rollups of some (eleve_id, matiere_id, date) triples; returns the number of days"""
+        touches = defaultdict(lambda: defaultdict(set))  # portee -> jour -> objet_ids
+        for eleve_id, matiere_id, jour in cles:
+            touches['eleve'][jour].add(eleve_id)
+            touches['matiere'][jour].add(matiere_id)
+        with transaction.atomic():
+            for portee, par_jour in touches.items():
+                par_semaine = defaultdict(set)
+                for jour, objet_ids in par_jour.items():
+                    cls._recalculer_jour(portee, jour, objet_ids)
+                    par_semaine[jour - timedelta(days=jour.weekday())] |= objet_ids
+                for lundi, objet_ids in par_semaine.items():
+                    cls._recalculer_semaine(portee, lundi, objet_ids)
+        return len(touches['eleve'])
+
+    @classmethod
+    def reconstruire(cls):
+        """Rebuild every rollup from Presence (first run, after raw loads or deletions)"""
+        with transaction.atomic():
+            etat, _ = ActualisationPresences.objects.select_for_update().get_or_create(pk=1)
+            maintenant = timezone.now()
+            cls.objects.all().delete()
+            jours = set()
+            for portee, champ in cls.CHAMPS.items():
+                for periode, cle in (('jour', F('date')), ('semaine', TruncWeek('date'))):
+                    comptes = (Presence.objects.order_by().values(champ, debut=cle)
+                               .annotate(p=Count('id', filter=Q(present=True)), a=Count('id', filter=Q(present=False))))
+                    lot = []
+                    for c in comptes.iterator(chunk_size=2000):
+                        lot.append(cls(portee=portee, objet_id=c[champ], periode=periode, debut=c['debut'],
+                                       presents=c['p'], absences=c['a']))
+                        if periode == 'jour':
+                            jours.add(c['debut'])
+                        if len(lot) >= cls.TAILLE_LOT * 4:
+                            cls.objects.bulk_create(lot, batch_size=cls.TAILLE_LOT)
+                            lot = []
+                    cls.objects.bulk_create(lot, batch_size=cls.TAILLE_LOT)
+            etat.jusqu_a = maintenant
+            etat.save(update_fields=['jusqu_a'])
+        return len(jours)
+
+class StatistiqueNotes(models.Model):
+    """Running grade totals per student, subject or department, kept in sync with Notes"""
+    PORTEE_CHOICES = [
+        ('eleve', 'Élève'),
+        ('matiere', 'Matière'),
+        ('departement', 'Département'),
+    ]
+    # Lookup from a Notes row to the object each scope aggregates on
+    CHAMPS = {
+        'eleve': 'eleve',
+        'matiere': 'matiere',
+        'departement': 'matiere__departement',
+    }
+
+    portee = models.CharField(max_length=20, choices=PORTEE_CHOICES)
+    objet_id = models.BigIntegerField()
+    somme = models.FloatField(default=0)
+    nombre = models.PositiveIntegerField(default=0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    # Changes with every grade of the scope: versions the cached detailed statistics (core.statistiques)
+    modifie_le = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("portee", "objet_id")
+        verbose_name_plural = "Statistiques des notes"
+
+    def __str__(self):
+        return f"{self.get_portee_display()} {self.objet_id}: {self.moyenne} ({self.nombre} notes)"
+
+    @property
+    def moyenne(self):
+        return _arrondir(self.somme / self.nombre) if self.nombre else 0.0
+
+    @classmethod
+    def moyenne_de(cls, portee, objet):
+        """O(1) average read for one student/subject/department"""
+        stat = cls.objects.filter(portee=portee, objet_id=getattr(objet, 'pk', objet)).first()
+        return stat.moyenne if stat else 0.0
+
+    @classmethod
+    def moyennes_de(cls, portee, objets):
+        """Map objet_id -> average for several objects of the same scope"""
+        stats = cls.objects.filter(portee=portee, objet_id__in=_ids(objets))
+        return {stat.objet_id: stat.moyenne for stat in stats}
+
+    @staticmethod
+    def _cibles(eleve_id, matiere_id):
+        departement_id = Matiere.objects.filter(pk=matiere_id).values_list('departement_id', flat=True).first()
+        cibles = [('eleve', eleve_id), ('matiere', matiere_id)]
+        if departement_id is not None:
+            cibles.append(('departement', departement_id))
+        return cibles
+
+    @classmethod
+    def ajouter(cls, eleve_id, matiere_id, valeur):
+        """Account for a new grade"""
+        for portee, objet_id in cls._cibles(eleve_id, matiere_id):
+            modifies = cls.objects.filter(portee=portee, objet_id=objet_id).update(
+                somme=F('somme') + valeur,
+                nombre=F('nombre') + 1,
+                minimum=Least('minimum', Value(valeur)),
+                maximum=Greatest('maximum', Value(valeur)),
+                modifie_le=timezone.now(),
+            )
+            if not modifies:
+                cls.objects.create(portee=portee, objet_id=objet_id, somme=valeur, nombre=1,
+                                   minimum=valeur, maximum=valeur)
+
+    @classmethod
+    def modifier(cls, eleve_id, matiere_id, ancienne, nouvelle):
+        """Account for a grade changing from `ancienne` to `nouvelle`"""
+        if ancienne == nouvelle:
+            return
+        for portee, objet_id in cls._cibles(eleve_id, matiere_id):
+            stats = cls.objects.filter(portee=portee, objet_id=objet_id)
+            stats.update(
+                somme=F('somme') + (nouvelle - ancienne),
+                minimum=Least('minimum', Value(nouvelle)),
+                maximum=Greatest('maximum', Value(nouvelle)),
+                modifie_le=timezone.now(),
+            )
+            cls._recalculer_bornes(portee, objet_id, ancienne)
+
+    @classmethod
+    def retirer(cls, eleve_id, matiere_id, valeur):
+        """Account for a deleted grade"""
+        for portee, objet_id in cls._cibles(eleve_id, matiere_id):
+            stats = cls.objects.filter(portee=portee, objet_id=objet_id)
+            stats.update(somme=F('somme') - valeur, nombre=F('nombre') - 1, modifie_le=timezone.now())
+            stats.filter(nombre=0).delete()
+            cls._recalculer_bornes(portee, objet_id, valeur)
+
+    @classmethod
+    def _recalculer_bornes(cls, portee, objet_id, valeur_retiree):
+        """min/max can't be decremented: rescan the scope only if the removed value was a bound"""
+        stats = cls.objects.filter(portee=portee, objet_id=objet_id)
+        if not stats.filter(models.Q(minimum=valeur_retiree) | models.Q(maximum=valeur_retiree)).exists():
+            return
+        bornes = Notes.objects.filter(**{cls.CHAMPS[portee]: objet_id}).aggregate(
+            minimum=Min('valeur'), maximum=Max('valeur'))
+        stats.update(**bornes)
+
+    @classmethod
+    def recalculer(cls, portee, objet_ids):
+        """Recompute the rows of a few objects from Notes, e.g. after a bulk write that skipped signals"""
+        objet_ids = set(objet_ids)
+        champ = cls.CHAMPS[portee]
+        agregats = (Notes.objects.filter(**{f'{champ}__in': objet_ids}).order_by().values(champ)
+                    .annotate(somme=Sum('valeur'), nombre=Count('id'),
+                              minimum=Min('valeur'), maximum=Max('valeur')))
+        lignes = [
+            cls(portee=portee, objet_id=a[champ], somme=a['somme'], nombre=a['nombre'],
+                minimum=a['minimum'], maximum=a['maximum'])
+            for a in agregats
+        ]
+        cls.objects.bulk_create(
+            lignes, batch_size=1000, update_conflicts=True, unique_fields=['portee', 'objet_id'],
+            update_fields=['somme', 'nombre', 'minimum', 'maximum', 'modifie_le'],
+        )
+        vides = objet_ids - {ligne.objet_id for ligne in lignes}
+        if vides:
+            cls.objects.filter(portee=portee, objet_id__in=vides).delete()
+
+    @classmethod
+    def reconstruire(cls):
+        """Rebuild the whole table from Notes"""
+        lignes = []
+        for portee, champ in cls.CHAMPS.items():
+            agregats = (Notes.objects.order_by().values(champ)
+                        .annotate(somme=Sum('valeur'), nombre=Count('id'),
+                                  minimum=Min('valeur'), maximum=Max('valeur')))
+            lignes.extend(
+                cls(portee=portee, objet_id=a[champ], somme=a['somme'], nombre=a['nombre'],
+                    minimum=a['minimum'], maximum=a['maximum'])
+                for a in agregats if a[champ] is not None
+            )
+        # Readers never see an empty table between the delete and the insert
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(lignes, batch_size=1000)
+        return len(lignes)
+
+
+class Compteur(models.Model):
+    """Row counts for the admin dashboard, kept exact by signals and reconciled periodically"""
+    PORTEE_CHOICES = [
+        ('global', 'Global'),
+        ('academie', 'Académie'),
+        ('college', 'Collège'),
+    ]
+    # Counted model -> lookups from that model to its college and academy (None: not tied to one)
+    MODELES = {
+        'college': (College, None, 'academie'),
+        'departement': (Departement, 'college', 'college__academie'),
+        'enseignant': (Enseignant, 'departement__college', 'departement__college__academie'),
+        'matiere': (Matiere, 'departement__college', 'departement__college__academie'),
+        'eleve': (Eleve, None, None),
+    }
+
+    modele = models.CharField(max_length=20)
+    portee = models.CharField(max_length=20, choices=PORTEE_CHOICES, default='global')
+    objet_id = models.BigIntegerField(default=0)
+    valeur = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("modele", "portee", "objet_id")
+
+    def __str__(self):
+        return f"{self.modele} ({self.portee} {self.objet_id}): {self.valeur}"
+
+    @classmethod
+    def nom_modele(cls, model):
+        for nom, (classe, _, _) in cls.MODELES.items():
+            if model is classe:
+                return nom
+        return None
+
+    @staticmethod
+    def portees(instance):
+        """[(portee, objet_id)] counting this instance, resolved from its foreign keys"""
+        portees = [('global', 0)]
+        if isinstance(instance, Eleve):
+            return portees
+        if isinstance(instance, College):
+            college_id, academie_id = None, instance.academie_id
+        elif isinstance(instance, Departement):
+            college_id = instance.college_id
+            academie_id = College.objects.filter(pk=college_id).values_list('academie_id', flat=True).first()
+        else:  # Enseignant, Matiere
+            college_id, academie_id = (
+                Departement.objects.filter(pk=instance.departement_id)
+                .values_list('college_id', 'college__academie_id').first() or (None, None)
+            )
+        if college_id is not None:
+            portees.append(('college', college_id))
+        if academie_id is not None:
+            portees.append(('academie', academie_id))
+        return portees
+
+    @classmethod
+    def ajuster(cls, modele, portees, delta):
+        for portee, objet_id in portees:
+            if not cls.objects.filter(modele=modele, portee=portee, objet_id=objet_id).update(valeur=F('valeur') + delta):
+                cls.objects.create(modele=modele, portee=portee, objet_id=objet_id, valeur=max(delta, 0))
+
+    @classmethod
+    def globaux(cls):
+        """{'colleges': n, 'departements': n, ...} in one query on a tiny table"""
+        valeurs = dict(cls.objects.filter(portee='global').values_list('modele', 'valeur'))
+        return {f'{modele}s': valeurs.get(modele, 0) for modele in cls.MODELES}
+
+    @classmethod
+    def par_portee(cls, portee):
+        """{objet_id: {'departements': n, ...}} for every academy or college"""
+        resultat = defaultdict(lambda: {f'{modele}s': 0 for modele in cls.MODELES})
+        for modele, objet_id, valeur in cls.objects.filter(portee=portee).values_list('modele', 'objet_id', 'valeur'):
+            resultat[objet_id][f'{modele}s'] = valeur
+        return resultat
+
+    @classmethod
+    def reconcilier(cls):
+        """Recount everything from the source tables (after bulk loads, or periodically from cron)"""
+        lignes = []
+        for modele, (classe, vers_college, vers_academie) in cls.MODELES.items():
+            lignes.append(cls(modele=modele, portee='global', objet_id=0, valeur=classe.objects.count()))
+            for portee, champ in (('college', vers_college), ('academie', vers_academie)):
+                if not champ:
+                    continue
+                comptes = classe.objects.order_by().values(champ).annotate(n=Count('pk')).values_list(champ, 'n')
+                lignes.extend(cls(modele=modele, portee=portee, objet_id=objet_id, valeur=n)
+                              for objet_id, n in comptes if objet_id is not None)
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(lignes, batch_size=1000)
+        return len(lignes)
+
+
+class ImportCsv(models.Model):
+    """One CSV import run; lignes_lues is the resume point, committed together with each batch"""
+    STATUT_CHOICES = [
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+    MAX_ERREURS = 100
+
+    type_import = models.CharField(max_length=20)
+    nom_fichier = models.CharField(max_length=255)
+    empreinte = models.CharField(max_length=64)  # sha256 of the file: the same file resumes the same run
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='en_cours')
+    lignes_lues = models.PositiveIntegerField(default=0)
+    lignes_importees = models.PositiveIntegerField(default=0)
+    lignes_rejetees = models.PositiveIntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True)  # first MAX_ERREURS [ligne, message]
+    message = models.TextField(blank=True)
+    date_debut = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type_import', 'empreinte'], name='import_csv_fichier_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_import} {self.nom_fichier} ({self.get_statut_display()})"
+
+    def rejeter(self, erreurs):
+        self.lignes_rejetees += len(erreurs)
+        place = self.MAX_ERREURS - len(self.erreurs)
+        if place > 0:
+            self.erreurs.extend([ligne, message] for ligne, message in erreurs[:place])
+
+
+class Tache(models.Model):
+    """Background job stored in the database and run by 'manage.py executer_taches' (see core/taches.py)"""
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('terminee', 'Terminée'),
+        ('echec', 'Échec'),
+    ]
+
+    nom = models.CharField(max_length=50)  # key of core.taches.TACHES
+    parametres = models.JSONField(default=dict, blank=True)
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    max_tentatives = models.PositiveSmallIntegerField(default=3)
+    executer_apres = models.DateTimeField(default=timezone.now)  # pushed back after each failed attempt
+    travailleur = models.CharField(max_length=100, blank=True)  # worker thread holding the job
+    battement = models.DateTimeField(null=True, blank=True)  # last sign of life of that worker
+    fait = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+    resultat = models.JSONField(null=True, blank=True)
+    erreur = models.TextField(blank=True)
+    cree_le = models.DateTimeField(auto_now_add=True)
+    debut = models.DateTimeField(null=True, blank=True)
+    fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Next job to claim: WHERE statut = 'en_attente' AND executer_apres <= now ORDER BY executer_apres, id
+            models.Index(fields=['statut', 'executer_apres', 'id'], name='tache_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} #{self.pk} ({self.get_statut_display()})"
+
+    def pourcentage(self):
+        if self.statut == 'terminee':
+            return 100
+        if not self.total:
+            return None
+        return min(100, round(100 * self.fait / self.total))
+
+    def active(self):
+        return self.statut in ('en_attente', 'en_cours')
@@ -0,0 +1,103 @@
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAILLE_PAGE = 50
+
+
+def _encoder(valeurs):
+    return base64.urlsafe_b64encode(json.dumps(valeurs).encode()).decode()
+
+
+def _decoder(curseur, champs, model):
+    try:
+        valeurs = json.loads(base64.urlsafe_b64decode(curseur.encode()))
+    except ValueError:
+        return None
+    if not isinstance(valeurs, list) or len(valeurs) != len(champs):
+        return None
+    try:
+        return [model._meta.get_field(champ).to_python(v) for champ, v in zip(champs, valeurs)]
+    except ValidationError:
+        return None
+
+
+def _apres(ordre, valeurs):
+    """Rows strictly after `valeurs` in the given ordering (row-value comparison spelled out for the ORM)"""
+    condition = Q()
+    egalites = Q()
+    for champ, valeur in zip(ordre, valeurs):
+        nom = champ.lstrip('-')
+        operateur = 'lt' if champ.startswith('-') else 'gt'
+        condition |= egalites & Q(**{f'{nom}__{operateur}': valeur})
+        egalites &= Q(**{nom: valeur})
+    return condition
+
+
+def _inverser(ordre):
+    return [champ[1:] if champ.startswith('-') else f'-{champ}' for champ in ordre]
+
+
+class PageKeyset:
+    """One page of a keyset-paginated queryset with links to its neighbours"""
+
+    def __init__(self, objets, url_precedente, url_suivante):
+        self.objets = objets
+        self.url_precedente = url_precedente
+        self.url_suivante = url_suivante
+
+    def __iter__(self):
+        return iter(self.objets)
+
+
+def paginer(request, queryset, ordre, taille=TAILLE_PAGE):
+    """Keyset pagination: ?apres=<curseur> / ?avant=<curseur> instead of OFFSET.
+
+    `ordre` must be a unique ordering on indexed columns of the model (end it with
+    'id' or '-id'), so every page costs one index range scan whatever its depth.
+    """
+    champs = [champ.lstrip('-') for champ in ordre]
+    model = queryset.model
+    apres = request.GET.get('apres')
+    avant = request.GET.get('avant')
+
+    curseur = _decoder(avant or apres, champs, model) if (avant or apres) else None
+    if curseur is not None and avant:
+        lignes = list(queryset.filter(_apres(_inverser(ordre), curseur)).order_by(*_inverser(ordre))[:taille + 1])
+        a_precedent = len(lignes) > taille
+        lignes = lignes[:taille][::-1]
+        a_suivant = True
+    else:
+        if curseur is not None:
+            queryset = queryset.filter(_apres(ordre, curseur))
+        lignes = list(queryset.order_by(*ordre)[:taille + 1])
+        a_suivant = len(lignes) > taille
+        lignes = lignes[:taille]
+        a_precedent = curseur is not None
+
+    def lien(parametre, objet):
+        params = request.GET.copy()
+        params.pop('apres', None)
+        params.pop('avant', None)
+        params[parametre] = _encoder([_valeur_json(getattr(objet, champ)) for champ in champs])
+        return f'?{params.urlencode()}'
+
+    return PageKeyset(
+        lignes,
+        lien('avant', lignes[0]) if lignes and a_precedent else None,
+        lien('apres', lignes[-1]) if lignes and a_suivant else None,
+    )
+
+
+async def apaginer(request, queryset, ordre, taille=TAILLE_PAGE):
+    """paginer() for async views: the same single query, run off the event loop"""
+    return await sync_to_async(paginer)(request, queryset, ordre, taille)
+
+
+def _valeur_json(valeur):
+    if hasattr(valeur, 'isoformat'):
+        return valeur.isoformat()
+    return valeur
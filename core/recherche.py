@@ -0,0 +1,99 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Cours, Inscription
+
+LIMITE_RESULTATS = 20
+PREFIXE_MIN = 3  # shorter last words match whole words only: a 1-2 letter prefix expands to too many terms
+LONGUEUR_EXTRAIT = 16  # words around the matches
+
+# Words found in nearly every course: ranking their matches would cost a full scan of the scope
+MOTS_VIDES = frozenset("""
+    a au aux avec ce ces cette dans de des du elle en est et il ils je la le les leur mais
+    ne nous on ou par pas pour qu que qui sa se ses son sont sur un une vous y
+""".split())
+
+# Highlight markers in FTS snippets, turned into <mark> once the text is escaped
+_DEBUT, _FIN = '\x02', '\x03'
+
+_RECHERCHE_FTS = f"""
+    SELECT rowid, snippet(core_cours_fts, -1, '{_DEBUT}', '{_FIN}', '…', {LONGUEUR_EXTRAIT})
+    FROM core_cours_fts
+    WHERE core_cours_fts MATCH %s
+    ORDER BY bm25(core_cours_fts, 10.0, 1.0, 0.0)
+    LIMIT %s
+"""
+
+
+def requete_fts(terme, portee):
+    """FTS5 query for the words of `terme` in titre/contenu, limited to the portee tokens (m<id>, e<id>).
+
+    Words are quoted, so operators typed by the user are plain text; the last word is a prefix
+    (search as you type). Stop words are left out unless the query has nothing else.
+    """
+    mots = re.findall(r'\w+', terme)
+    mots = [mot for mot in mots if mot.lower() not in MOTS_VIDES] or mots
+    if not mots or not portee:
+        return None
+    phrases = [f'"{mot}"' for mot in mots]
+    if len(mots[-1]) >= PREFIXE_MIN:
+        phrases[-1] += '*'
+    return f"{{titre contenu}} : ({' '.join(phrases)}) AND portee : ({' OR '.join(portee)})"
+
+
+def _portee(eleve, enseignant):
+    if enseignant is not None:
+        return [f'e{enseignant.pk}']
+    matieres = Inscription.objects.filter(eleve=eleve).values_list('matiere_id', flat=True)
+    return [f'm{matiere_id}' for matiere_id in matieres]
+
+
+def _extrait(snippet):
+    return mark_safe(escape(snippet).replace(_DEBUT, '<mark>').replace(_FIN, '</mark>'))
+
+
+def rechercher_cours(terme, eleve=None, enseignant=None, limite=LIMITE_RESULTATS):
+    """Courses of a student's subjects (or created by a teacher) matching `terme`, best first.
+
+    Each Cours gets an `extrait`: the passage around the matches, HTML-safe, matches in <mark>.
+    """
+    alias = router.db_for_read(Cours)
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return _rechercher_sans_fts(terme, eleve, enseignant, limite)
+
+    requete = requete_fts(terme, _portee(eleve, enseignant))
+    if requete is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(_RECHERCHE_FTS, [requete, limite])
+        extraits = dict(cursor.fetchall())
+    cours = Cours.objects.using(alias).select_related('matiere').in_bulk(extraits)
+    resultats = []
+    for cours_id, snippet in extraits.items():
+        if cours_id in cours:
+            cours[cours_id].extrait = _extrait(snippet)
+            resultats.append(cours[cours_id])
+    return resultats
+
+
+def _rechercher_sans_fts(terme, eleve, enseignant, limite):
+    """Other databases: every word in titre or contenu (full scan), newest first"""
+    mots = re.findall(r'\w+', terme)
+    if not mots:
+        return []
+    if enseignant is not None:
+        cours = Cours.objects.filter(enseignant=enseignant)
+    else:
+        cours = Cours.objects.filter(matiere__inscriptions__eleve=eleve)
+    for mot in mots:
+        cours = cours.filter(Q(titre__icontains=mot) | Q(contenu__icontains=mot))
+    resultats = list(cours.select_related('matiere').order_by('-date_creation', '-id')[:limite])
+    for c in resultats:
+        c.extrait = Truncator(c.contenu).words(LONGUEUR_EXTRAIT * 2)
+    return resultats
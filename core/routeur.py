@@ -0,0 +1,63 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read-only connection of the production profile (see DATABASES in agl/settings.py)
+ALIAS_LECTURE = 'lecture'
+
+# True while a view marked lecture_seule handles a GET: its reads may go to ALIAS_LECTURE
+_lecture_seule = ContextVar('lecture_seule', default=False)
+
+
+def lecture_seule(view_func):
+    """Send the queries of a GET/HEAD request to the read-only connection, when one is configured.
+
+    Reads of other views stay on 'default', so they see the rows written earlier in their own transaction.
+    """
+    def marquer(request):
+        return _lecture_seule.set(request.method in ('GET', 'HEAD'))
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # sync_to_async copies the context, so the ORM threads of the view see the flag too
+            jeton = marquer(request)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _lecture_seule.reset(jeton)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        jeton = marquer(request)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _lecture_seule.reset(jeton)
+    return wrapper
+
+
+class RouteurLecture:
+    """Reads of lecture_seule views go to the read-only connection; every write goes to 'default'.
+
+    Both aliases open the same SQLite file: in WAL mode readers never wait for the writer, and
+    writers queue on the write lock (BEGIN IMMEDIATE + busy_timeout) instead of failing.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _lecture_seule.get() and ALIAS_LECTURE in connections.settings:
+            return ALIAS_LECTURE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same database behind both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
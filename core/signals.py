@@ -0,0 +1,94 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import College, Compteur, CumulPresence, Departement, Matiere, Notes, Presence, StatistiqueNotes
+
+
+# Grade statistics: these run inside the transaction opened by
+# save()/update_or_create(), so StatistiqueNotes never drifts from Notes.
+@receiver(pre_save, sender=Notes)
+def memoriser_ancienne_note(sender, instance, **kwargs):
+    instance._ancienne = None
+    if instance.pk:
+        instance._ancienne = (
+            Notes.objects.filter(pk=instance.pk).values_list('eleve_id', 'matiere_id', 'valeur').first()
+        )
+
+@receiver(post_save, sender=Notes)
+def maj_statistiques_note(sender, instance, created, **kwargs):
+    valeur = float(instance.valeur)
+    ancienne = getattr(instance, '_ancienne', None)
+    if created or ancienne is None:
+        StatistiqueNotes.ajouter(instance.eleve_id, instance.matiere_id, valeur)
+    elif ancienne[:2] == (instance.eleve_id, instance.matiere_id):
+        StatistiqueNotes.modifier(instance.eleve_id, instance.matiere_id, ancienne[2], valeur)
+    else:
+        StatistiqueNotes.retirer(*ancienne)
+        StatistiqueNotes.ajouter(instance.eleve_id, instance.matiere_id, valeur)
+
+@receiver(post_delete, sender=Notes)
+def retirer_statistiques_note(sender, instance, **kwargs):
+    StatistiqueNotes.retirer(instance.eleve_id, instance.matiere_id, float(instance.valeur))
+
+# A subject moving to another department takes its grades along: recompute both departments
+@receiver(pre_save, sender=Matiere)
+def memoriser_departement(sender, instance, **kwargs):
+    instance._ancien_departement = None
+    if instance.pk and not instance._state.adding:
+        instance._ancien_departement = (
+            Matiere.objects.filter(pk=instance.pk).values_list('departement_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Matiere)
+def deplacer_statistiques_matiere(sender, instance, created, **kwargs):
+    ancien = getattr(instance, '_ancien_departement', None)
+    if created or ancien == instance.departement_id:
+        return
+    StatistiqueNotes.recalculer('departement', {d for d in (ancien, instance.departement_id) if d is not None})
+
+
+# Attendance rollups: actualiser() only sees rows still there, so deletions (cascades from a student
+# or a subject, admin) recompute their day and week here
+@receiver(post_delete, sender=Presence)
+def retirer_cumul_presence(sender, instance, **kwargs):
+    CumulPresence.recalculer([(instance.eleve_id, instance.matiere_id, instance.date)])
+
+
+# Admin dashboard counters: +1/-1 on create/delete, and move between colleges/academies on update.
+# bulk_create/queryset.update() bypass this, 'manage.py reconcilier_compteurs' fixes any drift.
+DEPENDANTS = {
+    Departement: [('enseignant', 'departement'), ('matiere', 'departement')],
+    College: [('departement', 'college'), ('enseignant', 'departement__college'), ('matiere', 'departement__college')],
+}
+
+def memoriser_portees(sender, instance, **kwargs):
+    instance._anciennes_portees = None
+    if instance.pk and not instance._state.adding:
+        ancien = sender.objects.filter(pk=instance.pk).first()
+        instance._anciennes_portees = Compteur.portees(ancien) if ancien else None
+
+def compter_creation(sender, instance, created, **kwargs):
+    modele = Compteur.nom_modele(sender)
+    portees = Compteur.portees(instance)
+    anciennes = getattr(instance, '_anciennes_portees', None)
+    if created or anciennes is None:
+        Compteur.ajuster(modele, portees, 1)
+    elif anciennes != portees:
+        retirees = [p for p in anciennes if p not in portees]
+        ajoutees = [p for p in portees if p not in anciennes]
+        Compteur.ajuster(modele, retirees, -1)
+        Compteur.ajuster(modele, ajoutees, 1)
+        # Moving a department/college moves everything counted below it
+        for dependant, lien in DEPENDANTS.get(sender, []):
+            n = Compteur.MODELES[dependant][0].objects.filter(**{lien: instance}).count()
+            if n:
+                Compteur.ajuster(dependant, retirees, -n)
+                Compteur.ajuster(dependant, ajoutees, n)
+
+def compter_suppression(sender, instance, **kwargs):
+    Compteur.ajuster(Compteur.nom_modele(sender), Compteur.portees(instance), -1)
+
+for _modele, _, _ in Compteur.MODELES.values():
+    pre_save.connect(memoriser_portees, sender=_modele, dispatch_uid=f'compteur_pre_{_modele.__name__}')
+    post_save.connect(compter_creation, sender=_modele, dispatch_uid=f'compteur_save_{_modele.__name__}')
+    post_delete.connect(compter_suppression, sender=_modele, dispatch_uid=f'compteur_delete_{_modele.__name__}')
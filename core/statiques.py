@@ -0,0 +1,158 @@
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # optional: without it only the .gz variants are written
+    brotli = None
+
+EXTENSIONS_COMPRESSIBLES = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+TAILLE_MIN = 256  # bytes: smaller files gain nothing from compression
+GAIN_MIN = 0.95  # a variant is kept only if at most 95% of the original size
+# Content negotiation order: the best ratio first
+ENCODAGES = [('br', '.br'), ('gzip', '.gz')]
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'  # hashed name: the content never changes
+CACHE_REVALIDER = 'public, no-cache'  # original name: revalidated with If-Modified-Since
+
+
+def tailwind(request):
+    """Context processor: CDN Tailwind (dev) or the purged build of 'manage.py construire_statiques'"""
+    return {'tailwind_cdn': settings.TAILWIND_CDN}
+
+
+class StockageStatique(ManifestStaticFilesStorage):
+    """collectstatic with content-hashed copies and a manifest, plus .gz/.br next to every text file"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nom in paths:
+            self.compresser(nom)
+            nom_hache = self.hashed_files.get(self.hash_key(self.clean_name(nom)))
+            if nom_hache:
+                self.compresser(nom_hache)
+
+    def compresser(self, nom):
+        chemin = Path(self.path(nom))
+        if chemin.suffix not in EXTENSIONS_COMPRESSIBLES:
+            return
+        contenu = chemin.read_bytes()
+        variantes = {'.gz': lambda: gzip.compress(contenu, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = lambda: brotli.compress(contenu, quality=11)
+        for suffixe, compresser in variantes.items():
+            cible = Path(f'{chemin}{suffixe}')
+            compresse = compresser() if len(contenu) >= TAILLE_MIN else None
+            if compresse is not None and len(compresse) <= len(contenu) * GAIN_MIN:
+                cible.write_bytes(compresse)
+            else:
+                # Left over from an earlier collectstatic, when the file compressed better
+                cible.unlink(missing_ok=True)
+
+
+class FichierStatique:
+    def __init__(self, chemin, immuable):
+        self.chemin = chemin
+        self.immuable = immuable
+        self.type = mimetypes.guess_type(chemin.name)[0] or 'application/octet-stream'
+        self.modifie_le = chemin.stat().st_mtime
+        self.variantes = [(encodage, Path(f'{chemin}{suffixe}')) for encodage, suffixe in ENCODAGES
+                          if Path(f'{chemin}{suffixe}').is_file()]
+
+
+def _encodages_acceptes(entete):
+    """Codings of an Accept-Encoding header, except those refused with q=0"""
+    acceptes = set()
+    for partie in entete.split(','):
+        nom, _, parametres = partie.partition(';')
+        try:
+            qualite = float(parametres.strip().removeprefix('q=')) if parametres.strip() else 1.0
+        except ValueError:
+            qualite = 1.0
+        if qualite > 0:
+            acceptes.add(nom.strip().lower())
+    return acceptes
+
+
+class StatiquesMiddleware:
+    """Serve STATIC_ROOT from the application once collectstatic has run with StockageStatique.
+
+    Picks the precompressed variant the client accepts, and lets browsers keep hashed names
+    forever. The file list is read once at startup: restart after collectstatic.
+    Only with settings.STATIQUES_COMPILES; runserver serves the source files itself unless started with --nostatic.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.STATIQUES_COMPILES or not isinstance(staticfiles_storage, StockageStatique):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefixe = urlparse(settings.STATIC_URL).path
+        self.fichiers = self.indexer(Path(settings.STATIC_ROOT))
+        self.mode_async = iscoroutinefunction(get_response)
+        if self.mode_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def indexer(racine):
+        """{url path below STATIC_URL: FichierStatique} of the collected files, variants excluded"""
+        haches = set(staticfiles_storage.hashed_files.values())
+        fichiers = {}
+        for dossier, _, noms in os.walk(racine):
+            for nom in noms:
+                chemin = Path(dossier) / nom
+                if chemin.suffix in ('.gz', '.br') and chemin.with_suffix('').is_file():
+                    continue
+                relatif = chemin.relative_to(racine).as_posix()
+                fichiers[relatif] = FichierStatique(chemin, relatif in haches)
+        return fichiers
+
+    def trouver(self, request):
+        if request.path.startswith(self.prefixe):
+            return self.fichiers.get(request.path[len(self.prefixe):])
+        return None
+
+    def __call__(self, request):
+        if self.mode_async:
+            return self.__acall__(request)
+        fichier = self.trouver(request)
+        if fichier is None:
+            return self.get_response(request)
+        return self.servir(request, fichier)
+
+    async def __acall__(self, request):
+        fichier = self.trouver(request)
+        if fichier is None:
+            return await self.get_response(request)
+        return self.servir(request, fichier)
+
+    def servir(self, request, fichier):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        if not fichier.immuable and not was_modified_since(request.headers.get('If-Modified-Since'),
+                                                           fichier.modifie_le):
+            response = HttpResponseNotModified()
+        else:
+            acceptes = _encodages_acceptes(request.headers.get('Accept-Encoding', ''))
+            encodage, chemin = next(((e, c) for e, c in fichier.variantes if e in acceptes), (None, fichier.chemin))
+            response = FileResponse(chemin.open('rb'), content_type=fichier.type, filename=fichier.chemin.name)
+            if encodage:
+                response['Content-Encoding'] = encodage
+        response['Last-Modified'] = http_date(fichier.modifie_le)
+        response['Cache-Control'] = CACHE_IMMUABLE if fichier.immuable else CACHE_REVALIDER
+        if fichier.variantes:
+            response['Vary'] = 'Accept-Encoding'
+        return response
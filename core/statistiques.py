@@ -0,0 +1,113 @@
+import math
+from bisect import bisect_right
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Notes, StatistiqueNotes
+
+SEUIL_REUSSITE = 10  # a grade >= this passes
+LARGEUR_CLASSE = 2  # histogram bins of 2 points: [0, 2[, [2, 4[, ... [18, 20]
+NOTE_MAX = 20
+DUREE_CACHE = 24 * 3600  # entries are versioned, the timeout only bounds memory
+
+
+def _quantile(valeurs, cumuls, nombre, p):
+    """p-quantile with linear interpolation between order statistics (as numpy's default), on a frequency table.
+
+    valeurs are sorted and cumuls[i] counts the grades <= valeurs[i], so the k-th smallest grade
+    (0-based) is valeurs[bisect_right(cumuls, k)]: O(log distinct values) per quantile.
+    """
+    position = (nombre - 1) * p
+    rang = math.floor(position)
+    bas = valeurs[bisect_right(cumuls, rang)]
+    haut = valeurs[bisect_right(cumuls, min(rang + 1, nombre - 1))]
+    return bas + (position - rang) * (haut - bas)
+
+
+def distribution(frequences):
+    """Mean, median, standard deviation, quartiles, pass rate and histogram of {valeur: effectif}"""
+    valeurs = sorted(frequences)
+    effectifs = [frequences[valeur] for valeur in valeurs]
+    nombre = sum(effectifs)
+    classes = [0] * (NOTE_MAX // LARGEUR_CLASSE)
+    if not nombre:
+        return {'nombre': 0, 'moyenne': None, 'mediane': None, 'ecart_type': None, 'q1': None, 'q3': None,
+                'minimum': None, 'maximum': None, 'taux_reussite': None,
+                'histogramme': [{'effectif': 0, 'hauteur': 0} for _ in classes]}
+
+    cumuls = []
+    total = 0
+    for effectif in effectifs:
+        total += effectif
+        cumuls.append(total)
+    moyenne = math.fsum(v * n for v, n in zip(valeurs, effectifs)) / nombre
+    variance = math.fsum(n * (v - moyenne) ** 2 for v, n in zip(valeurs, effectifs)) / nombre
+    for valeur, effectif in zip(valeurs, effectifs):
+        classes[min(max(int(valeur // LARGEUR_CLASSE), 0), len(classes) - 1)] += effectif
+    reussites = sum(n for v, n in zip(valeurs, effectifs) if v >= SEUIL_REUSSITE)
+    plus_grande = max(classes)
+
+    return {
+        'nombre': nombre,
+        'moyenne': round(moyenne, 2),
+        'mediane': round(_quantile(valeurs, cumuls, nombre, 0.5), 2),
+        'ecart_type': round(math.sqrt(variance), 2),
+        'q1': round(_quantile(valeurs, cumuls, nombre, 0.25), 2),
+        'q3': round(_quantile(valeurs, cumuls, nombre, 0.75), 2),
+        'minimum': valeurs[0],
+        'maximum': valeurs[-1],
+        'taux_reussite': round(100 * reussites / nombre, 1),
+        # hauteur: bar size relative to the largest bin, for the template
+        'histogramme': [{'effectif': n, 'hauteur': round(100 * n / plus_grande)} for n in classes],
+    }
+
+
+def frequences_par_matiere(matiere_ids):
+    """{matiere_id: Counter({valeur: effectif})} in one GROUP BY, read from the (matiere, valeur) index"""
+    frequences = {matiere_id: Counter() for matiere_id in matiere_ids}
+    lignes = (Notes.objects.filter(matiere__in=matiere_ids).order_by()
+              .values_list('matiere_id', 'valeur').annotate(effectif=Count('id')))
+    for matiere_id, valeur, effectif in lignes:
+        frequences[matiere_id][valeur] = effectif
+    return frequences
+
+
+def _frequences_en_cache(departement, matiere_ids):
+    """frequences_par_matiere() of a department, cached until one of its grades changes"""
+    version = (StatistiqueNotes.objects.filter(portee='departement', objet_id=departement.pk)
+               .values_list('modifie_le', flat=True).first())
+    if version is None:
+        return {matiere_id: Counter() for matiere_id in matiere_ids}
+    # The subject list is part of the key: subjects move between departments without touching grades
+    cle = f"statistiques:departement:{departement.pk}:{version.timestamp()}:{hash(tuple(matiere_ids))}"
+    frequences = cache.get(cle)
+    if frequences is None:
+        frequences = frequences_par_matiere(matiere_ids)
+        cache.set(cle, frequences, DUREE_CACHE)
+    return frequences
+
+
+def statistiques_departement(departement):
+    """Detailed grade statistics of a department, per subject and per teacher, from one grouped query"""
+    matieres = list(departement.matieres.select_related('enseignant__utilisateur').order_by('libelle', 'id'))
+    frequences = _frequences_en_cache(departement, [matiere.id for matiere in matieres])
+
+    global_ = Counter()
+    par_enseignant = {}  # enseignant_id -> (nom, Counter)
+    lignes_matieres = []
+    for matiere in matieres:
+        freq = frequences.get(matiere.id, Counter())
+        global_.update(freq)
+        nom = str(matiere.enseignant.utilisateur) if matiere.enseignant else 'Sans enseignant'
+        par_enseignant.setdefault(matiere.enseignant_id, (nom, Counter()))[1].update(freq)
+        lignes_matieres.append({'nom': matiere.libelle, 'enseignant': nom, **distribution(freq)})
+
+    return {
+        'departement': distribution(global_),
+        'matieres': lignes_matieres,
+        'enseignants': sorted(({'nom': nom, **distribution(freq)} for nom, freq in par_enseignant.values()),
+                              key=lambda ligne: ligne['nom']),
+        'classes': [(borne, borne + LARGEUR_CLASSE) for borne in range(0, NOTE_MAX, LARGEUR_CLASSE)],
+    }
@@ -0,0 +1,66 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from .exports import blocs_async
+from .pagination import paginer
+
+TAILLE_BLOC = 200  # table rows rendered and flushed together
+TAILLE_LOT = 2000  # rows fetched per database round trip in ?tout=1 mode
+
+# Stands for the table rows while the page around them is rendered; never produced by escaped values
+_MARQUEUR = mark_safe('<!--lignes-->')
+
+
+def tableau_en_flux(request, contexte, lignes, gabarit='list_generic.html'):
+    """Stream a list page: the page around the table once, then the rows TAILLE_BLOC at a time.
+
+    `lignes` is any iterable of {'values', 'edit_url', 'delete_url'} dicts, consumed lazily,
+    so memory stays bounded by one block and the browser paints the header at once.
+    """
+    lignes = iter(lignes)
+    # Running the query before the first byte keeps database errors on a regular error page
+    premiere = next(lignes, None)
+    if premiere is None:
+        return render(request, gabarit, {**contexte, 'items': []})
+    tete, pied = render_to_string(gabarit, {**contexte, 'lignes': _MARQUEUR}, request).split(_MARQUEUR)
+    fragment = get_template('list_lignes.html')
+
+    def blocs():
+        yield tete
+        bloc = [premiere]
+        for ligne in lignes:
+            bloc.append(ligne)
+            if len(bloc) >= TAILLE_BLOC:
+                yield fragment.render({'items': bloc})
+                bloc = []
+        yield fragment.render({'items': bloc})
+        yield pied
+
+    contenu = blocs()
+    if isinstance(request, ASGIRequest):
+        contenu = blocs_async(contenu)
+    return StreamingHttpResponse(contenu, content_type='text/html; charset=utf-8')
+
+
+def lister(request, queryset, ordre, ligne, contexte):
+    """list_generic.html of a queryset: one keyset page (see paginer), or every row with ?tout=1.
+
+    ligne(objet) builds the row dict of one object; rows are built as the response is sent.
+    """
+    params = request.GET.copy()
+    for parametre in ('apres', 'avant', 'tout'):
+        params.pop(parametre, None)
+    if request.GET.get('tout'):
+        page = None
+        objets = queryset.order_by(*ordre).iterator(chunk_size=TAILLE_LOT)
+        url_pages = f'?{params.urlencode()}'
+    else:
+        page = objets = paginer(request, queryset, ordre)
+        params['tout'] = '1'
+        url_pages = None
+    url_tout = f'?{params.urlencode()}' if page and (page.url_precedente or page.url_suivante) else None
+    return tableau_en_flux(request, {**contexte, 'page': page, 'url_tout': url_tout, 'url_pages': url_pages},
+                           map(ligne, objets))
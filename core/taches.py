@@ -0,0 +1,262 @@
+import os
+import socket
+import sys
+import time
+import traceback
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import bulletins
+from .exports import blocs_csv, requete_export
+from .imports import LigneInvalide, importer
+from .models import College, CumulPresence, ImportCsv, StatistiqueNotes, Tache
+
+DELAI_REESSAI = 30  # seconds before the first retry, doubled at each failed attempt
+DELAI_REESSAI_MAX = 3600
+INTERVALLE_BATTEMENT = 30  # seconds between two heartbeats of a worker's running jobs
+DELAI_ABANDON = timedelta(minutes=2)  # running job without heartbeat for that long: its worker is gone
+INTERVALLE_PROGRESSION = 1.0  # seconds between two progress writes of one job
+
+# Registered jobs: nom -> _Definition, filled by @tache below
+TACHES = {}
+
+
+class _Definition:
+    def __init__(self, fonction, libelle, max_tentatives, sans_reessai, abandon):
+        self.fonction = fonction
+        self.libelle = libelle
+        self.max_tentatives = max_tentatives
+        self.sans_reessai = sans_reessai
+        self.abandon = abandon
+
+
+def tache(nom, libelle, max_tentatives=3, sans_reessai=(), abandon=None):
+    """Register fonction(execution, **parametres) as the job nom.
+
+    It may return a JSON-serialisable dict, kept as the job's resultat ('message' becomes its message).
+    Exceptions listed in sans_reessai fail the job at once instead of retrying it.
+    abandon(**parametres) runs once the job has failed for good, e.g. to delete its input file.
+    """
+    def decorer(fonction):
+        TACHES[nom] = _Definition(fonction, libelle, max_tentatives, tuple(sans_reessai), abandon)
+        return fonction
+    return decorer
+
+
+def enfiler(nom, **parametres):
+    """Queue a job for the workers; parametres must be JSON-serialisable (dates as ISO strings)"""
+    return Tache.objects.create(nom=nom, parametres=parametres, max_tentatives=TACHES[nom].max_tentatives)
+
+
+def en_file(nom, **parametres):
+    """The pending or running job nom with these parametres, if any: saves queuing the same work twice"""
+    return (Tache.objects.filter(nom=nom, statut__in=('en_attente', 'en_cours'),
+                                 **{f'parametres__{cle}': valeur for cle, valeur in parametres.items()})
+            .order_by('id').first())
+
+
+def libelle(nom):
+    definition = TACHES.get(nom)
+    return definition.libelle if definition else nom
+
+
+def _mettre_a_jour(tache, travailleur, **champs):
+    """Write to a running job only while this worker still holds it (it may have been declared abandoned)"""
+    return Tache.objects.filter(pk=tache.pk, statut='en_cours', travailleur=travailleur).update(**champs)
+
+
+class Execution:
+    """What a running job receives: its Tache and a throttled progress report"""
+
+    def __init__(self, tache, travailleur):
+        self.tache = tache
+        self.travailleur = travailleur
+        self._derniere = 0.0
+
+    def avancer(self, fait, total=None, message=''):
+        maintenant = time.monotonic()
+        if maintenant - self._derniere < INTERVALLE_PROGRESSION and (total is None or fait < total):
+            return
+        self._derniere = maintenant
+        champs = {'fait': fait, 'message': message, 'battement': timezone.now()}
+        if total is not None:
+            champs['total'] = total
+        _mettre_a_jour(self.tache, self.travailleur, **champs)
+
+
+def reclamer(travailleur):
+    """Claim the next due job for this worker, or None.
+
+    The claim is a conditional UPDATE: when two workers pick the same row only one changes it,
+    the other moves on to the next job. No lock is held while the job runs.
+    """
+    while True:
+        maintenant = timezone.now()
+        candidat = (Tache.objects.filter(statut='en_attente', executer_apres__lte=maintenant)
+                    .order_by('executer_apres', 'id').values_list('pk', flat=True).first())
+        if candidat is None:
+            return None
+        if Tache.objects.filter(pk=candidat, statut='en_attente').update(
+                statut='en_cours', travailleur=travailleur, battement=maintenant, debut=maintenant,
+                tentatives=F('tentatives') + 1, fait=0, total=None, message=''):
+            return Tache.objects.get(pk=candidat)
+
+
+def _echouer(tache, filtre, erreur, message, definitif=False):
+    """Record a failed attempt: retried after an exponential backoff, or failed for good"""
+    maintenant = timezone.now()
+    definitif = definitif or tache.tentatives >= tache.max_tentatives
+    if definitif:
+        champs = {'statut': 'echec', 'fin': maintenant, 'message': message}
+    else:
+        delai = min(DELAI_REESSAI * 2 ** (tache.tentatives - 1), DELAI_REESSAI_MAX)
+        champs = {'statut': 'en_attente', 'executer_apres': maintenant + timedelta(seconds=delai),
+                  'message': f"{message} (nouvel essai dans {delai} s)"}
+    modifiee = Tache.objects.filter(pk=tache.pk, statut='en_cours', **filtre).update(
+        erreur=erreur, travailleur='', battement=None, **champs)
+    definition = TACHES.get(tache.nom)
+    if modifiee and definitif and definition is not None and definition.abandon is not None:
+        definition.abandon(**tache.parametres)
+    return modifiee
+
+
+def executer(tache, travailleur):
+    """Run a claimed job and record its outcome; returns True when it succeeded"""
+    definition = TACHES.get(tache.nom)
+    try:
+        if definition is None:
+            raise LookupError(f"tâche inconnue : {tache.nom}")
+        resultat = definition.fonction(Execution(tache, travailleur), **tache.parametres)
+    except Exception as erreur:
+        definitif = definition is None or isinstance(erreur, definition.sans_reessai)
+        _echouer(tache, {'travailleur': travailleur}, traceback.format_exc(), str(erreur) or type(erreur).__name__,
+                 definitif)
+        return False
+    maintenant = timezone.now()
+    champs = {'statut': 'terminee', 'fin': maintenant, 'battement': maintenant, 'resultat': resultat, 'erreur': ''}
+    if isinstance(resultat, dict) and 'message' in resultat:
+        champs['message'] = resultat['message']
+    _mettre_a_jour(tache, travailleur, **champs)
+    return True
+
+
+def battre(travailleurs):
+    """Heartbeat of the jobs these worker threads are running, however long they take"""
+    return Tache.objects.filter(statut='en_cours', travailleur__in=travailleurs).update(battement=timezone.now())
+
+
+def relancer_abandonnees():
+    """Running jobs whose worker stopped beating (killed, host restarted) count as a failed attempt"""
+    limite = timezone.now() - DELAI_ABANDON
+    relancees = 0
+    for tache in Tache.objects.filter(statut='en_cours', battement__lt=limite):
+        relancees += _echouer(tache, {'battement__lt': limite}, '', "Travailleur arrêté pendant la tâche")
+    return relancees
+
+
+def nom_travailleur(numero):
+    return f"{socket.gethostname()}:{os.getpid()}:{numero}"[-100:]
+
+
+def travailler(travailleur, arret, une_fois=False, intervalle=2.0):
+    """Worker thread: claim and run jobs until arret is set, or with une_fois until no job is due"""
+    try:
+        while not arret.is_set():
+            try:
+                tache = reclamer(travailleur)
+                if tache is None:
+                    if une_fois:
+                        return
+                    arret.wait(intervalle)
+                    continue
+                executer(tache, travailleur)
+            except DatabaseError:
+                # Database busy or gone: the job, if any, is picked up again once its heartbeat expires
+                traceback.print_exc(file=sys.stderr)
+                arret.wait(intervalle)
+            finally:
+                close_old_connections()
+    finally:
+        connection.close()
+
+
+def _date(valeur):
+    return date.fromisoformat(valeur) if valeur else None
+
+
+# Jobs
+
+@tache('generer_bulletins', "Génération des bulletins", sans_reessai=(ObjectDoesNotExist,))
+def generer_bulletins(execution, college, periode, du=None, au=None):
+    """Retried runs skip the bulletins already written"""
+    college = College.objects.get(pk=college)
+
+    def progression(ecrits, total, duree):
+        execution.avancer(ecrits, total, f"{ecrits}/{total} bulletins ({ecrits / duree if duree else 0:.0f}/s)")
+
+    ecrits, ignores = bulletins.generer(college, periode, settings.BULLETINS_DIR, du=_date(du), au=_date(au),
+                                        progression=progression)
+    dossier = bulletins.dossier_bulletins(settings.BULLETINS_DIR, college, periode)
+    return {'ecrits': ecrits, 'ignores': ignores, 'dossier': str(dossier),
+            'message': f"{ecrits} bulletin(s) écrits pour {college.nom} ({periode}) dans {dossier}"}
+
+
+def _supprimer_fichier_importe(import_csv, chemin):
+    Path(chemin).unlink(missing_ok=True)
+
+
+@tache('importer_csv', "Import CSV", sans_reessai=(LigneInvalide, ObjectDoesNotExist, FileNotFoundError),
+       abandon=_supprimer_fichier_importe)
+def importer_csv(execution, import_csv, chemin):
+    """chemin: the uploaded file, kept until the import completes or fails for good; retried runs resume"""
+    run = ImportCsv.objects.get(pk=import_csv)
+    with open(chemin, 'rb') as fichier:
+        # Physical lines, for the progress bar only: quoted fields may span several
+        total = max(sum(1 for _ in fichier) - 1, 0)
+        fichier.seek(0)
+
+        def progression(run, debit):
+            execution.avancer(run.lignes_lues, total, f"{run.lignes_lues} lignes lues ({debit:.0f} lignes/s)")
+
+        importer(run, fichier, progression=progression)
+    os.remove(chemin)
+    return {'import': run.pk, 'message': run.message}
+
+
+@tache('exporter_csv', "Export CSV")
+def exporter_csv(execution, export, college=None, departement=None, du=None, au=None):
+    """Same CSV as the streamed download, written to TACHES_DIR/exports/ for the job's download link"""
+    filtres = {'college': college, 'departement': departement, 'du': _date(du), 'au': _date(au)}
+    total = requete_export(export, **filtres).count()
+    dossier = Path(settings.TACHES_DIR) / 'exports'
+    dossier.mkdir(parents=True, exist_ok=True)
+    chemin = dossier / f"{export}-{execution.tache.pk}.csv"
+    temporaire = chemin.with_suffix('.tmp')
+    ecrites = 0
+    with open(temporaire, 'w', encoding='utf-8', newline='') as fichier:
+        for bloc in blocs_csv(export, **filtres):
+            fichier.write(bloc)
+            ecrites = min(ecrites + bloc.count('\n'), total)
+            execution.avancer(ecrites, total, f"{ecrites}/{total} lignes écrites")
+    os.replace(temporaire, chemin)
+    return {'fichier': chemin.name, 'message': f"{total} lignes exportées"}
+
+
+@tache('reconstruire_statistiques', "Recalcul des moyennes et statistiques")
+def reconstruire_statistiques(execution):
+    with transaction.atomic():
+        total = StatistiqueNotes.reconstruire()
+    return {'message': f"{total} statistiques reconstruites"}
+
+
+@tache('actualiser_cumuls_presence', "Actualisation des cumuls de présence")
+def actualiser_cumuls_presence(execution, complet=False):
+    if complet:
+        return {'message': f"Cumuls reconstruits sur {CumulPresence.reconstruire()} jour(s)"}
+    return {'message': f"Cumuls actualisés sur {CumulPresence.actualiser()} jour(s)"}
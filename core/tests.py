@@ -1,3 +1,981 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import shutil
+import statistics
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .bulletins import _matieres, donnees_lot, nom_fichier
+from .exports import EXPORTS, blocs_csv
+from .imports import LigneInvalide, demarrer, importer
+from .middleware import StatistiquesVue, statistiques_performances
+from .models import (
+    Academie, Administrateur, College, Compteur, Cours, CumulPresence, Departement, Eleve, Enseignant, Inscription,
+    Matiere, Notes, Presence, Salle, StatistiqueNotes, Tache, Utilisateur,
+)
+from .pagination import paginer
+from .recherche import rechercher_cours
+from .statiques import CACHE_IMMUABLE, CACHE_REVALIDER, StatiquesMiddleware
+from .statistiques import distribution, statistiques_departement
+from .tableaux import tableau_en_flux
+from .taches import DELAI_REESSAI, enfiler, executer, reclamer, relancer_abandonnees, tache
+
+LUNDI = datetime.date(2026, 3, 2)
+
+
+def creer_utilisateur(identifiant):
+    return Utilisateur.objects.create(nom=identifiant.capitalize(), prenom='Test', identifiant=identifiant,
+                                      mail=f'{identifiant}@example.org')
+
+
+class DonneesTestCase(TestCase):
+    """Two colleges, one teacher with a subject in each of two departments, three students"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.academie = Academie.objects.create(nom='Académie A')
+        cls.autre_academie = Academie.objects.create(nom='Académie B')
+        cls.college = College.objects.create(nom='Collège A', academie=cls.academie)
+        cls.autre_college = College.objects.create(nom='Collège B', academie=cls.autre_academie)
+        cls.sciences = Departement.objects.create(nom='Sciences', code_departement='SCI', college=cls.college)
+        cls.lettres = Departement.objects.create(nom='Lettres', code_departement='LET', college=cls.college)
+        cls.enseignant = Enseignant.objects.create(utilisateur=creer_utilisateur('prof'), indice=400,
+                                                   departement=cls.sciences)
+        cls.autre_enseignant = Enseignant.objects.create(utilisateur=creer_utilisateur('prof2'), indice=400,
+                                                         departement=cls.lettres)
+        Administrateur.objects.create(utilisateur=creer_utilisateur('admin'))
+        salle = Salle.objects.create(numero='101', capacite=30)
+        cls.maths = Matiere.objects.create(libelle='Maths', departement=cls.sciences, enseignant=cls.enseignant,
+                                           salle=salle)
+        cls.francais = Matiere.objects.create(libelle='Français', departement=cls.lettres,
+                                              enseignant=cls.enseignant)
+        cls.eleves = [Eleve.objects.create(utilisateur=creer_utilisateur(f'eleve{i}'), anneeEntree=2025)
+                      for i in range(1, 4)]
+        Inscription.inscrire(cls.maths, [e.pk for e in cls.eleves])
+        Inscription.inscrire(cls.francais, [cls.eleves[0].pk])
+
+    def connecter(self, identifiant, user_type):
+        reponse = self.client.post(reverse('login'), {'identifiant': identifiant, 'user_type': user_type})
+        self.assertEqual(reponse.status_code, 302)
+
+    def statistique(self, portee, objet):
+        return StatistiqueNotes.objects.filter(portee=portee, objet_id=objet.pk).values_list(
+            'nombre', 'somme', 'minimum', 'maximum').first()
+
+
+class ListesTests(DonneesTestCase):
+    """List pages run a fixed number of queries whatever their number of rows"""
+
+    def ajouter_lignes(self, n):
+        for _ in range(n):
+            i = Utilisateur.objects.count()
+            academie = Academie.objects.create(nom=f'Académie {i}')
+            college = College.objects.create(nom=f'Collège {i}', academie=academie)
+            responsable = Enseignant.objects.create(utilisateur=creer_utilisateur(f'resp{i}'), indice=400,
+                                                    departement=self.sciences)
+            departement = Departement.objects.create(nom=f'Dép. {i}', code_departement=f'D{i}', college=college,
+                                                     responsable=responsable)
+            matiere = Matiere.objects.create(libelle=f'Matière {i}', departement=departement,
+                                             enseignant=self.enseignant)
+            eleve = Eleve.objects.create(utilisateur=creer_utilisateur(f'el{i}'), anneeEntree=2025)
+            Notes.objects.create(eleve=eleve, matiere=matiere, valeur=10)
+            Presence.objects.create(eleve=eleve, matiere=matiere, date=LUNDI, enseignant=self.enseignant)
+            Cours.objects.create(titre=f'Cours {i}', contenu='...', matiere=matiere, enseignant=self.enseignant)
+
+    def requetes(self, url):
+        with CaptureQueriesContext(connection) as requetes:
+            self.afficher(url)
+        return len(requetes)
+
+    def afficher(self, url):
+        reponse = self.client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        return b''.join(reponse.streaming_content) if reponse.streaming else reponse.content
+
+    def verifier(self, noms):
+        self.ajouter_lignes(2)
+        attendues = {nom: self.requetes(reverse(nom)) for nom in noms}
+        self.ajouter_lignes(3)
+        for nom in noms:
+            with self.subTest(nom), self.assertNumQueries(attendues[nom]):
+                self.afficher(reverse(nom))
+
+    def test_listes_enseignant(self):
+        self.connecter('prof', 'enseignant')
+        self.verifier(['notes_list', 'presence_list', 'cours_list'])
+
+    def test_listes_admin(self):
+        self.connecter('admin', 'admin')
+        self.verifier(['matiere_list', 'departement_list', 'college_list'])
+
+
+class MoyennesTests(DonneesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        e1, e2, _ = cls.eleves
+        for eleve, matiere, valeur in ((e1, cls.maths, 12), (e1, cls.francais, 15), (e2, cls.maths, 7.5)):
+            Notes.objects.create(eleve=eleve, matiere=matiere, valeur=valeur)
+
+    def test_moyennes_par_lot(self):
+        e1, e2, e3 = self.eleves
+        with self.assertNumQueries(1):
+            self.assertEqual(Eleve.calculerMoyennesGenerales(self.eleves), {e1.pk: 13.5, e2.pk: 7.5})
+        self.assertEqual(Matiere.calculerMoyennes([self.maths, self.francais]),
+                         {self.maths.pk: 9.75, self.francais.pk: 15})
+        self.assertEqual(Departement.calculerMoyennesDepartements(Departement.objects.all()),
+                         {self.sciences.pk: 9.75, self.lettres.pk: 15})
+        self.assertEqual(e3.calculerMoyenneGenerale(), 0.0)
+
+    def test_moyenne_du_bulletin(self):
+        # A subject of another college stays out of this college's bulletin
+        autre = Departement.objects.create(nom='Autre', code_departement='AUT', college=self.autre_college)
+        Notes.objects.create(eleve=self.eleves[0], matiere=Matiere.objects.create(libelle='Latin', departement=autre),
+                             valeur=2)
+        lot = donnees_lot([e.pk for e in self.eleves], _matieres(self.college), None, None)
+        self.assertEqual({e['id']: e['moyenne'] for e in lot},
+                         {self.eleves[0].pk: 13.5, self.eleves[1].pk: 7.5, self.eleves[2].pk: None})
+
+
+class StatistiqueNotesTests(DonneesTestCase):
+    def test_ajout_modification_suppression(self):
+        e1, e2, _ = self.eleves
+        note = Notes.objects.create(eleve=e1, matiere=self.maths, valeur=12)
+        Notes.objects.create(eleve=e2, matiere=self.maths, valeur=8)
+        self.assertEqual(self.statistique('matiere', self.maths), (2, 20, 8, 12))
+        self.assertEqual(self.statistique('eleve', e1), (1, 12, 12, 12))
+
+        note.valeur = 16
+        note.save()
+        self.assertEqual(self.statistique('matiere', self.maths), (2, 24, 8, 16))
+        self.assertEqual(self.statistique('departement', self.sciences), (2, 24, 8, 16))
+
+        note.delete()
+        self.assertEqual(self.statistique('matiere', self.maths), (1, 8, 8, 8))
+        self.assertEqual(StatistiqueNotes.moyenne_de('eleve', e1), 0.0)
+
+    def test_note_changee_de_matiere(self):
+        note = Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=10)
+        note.matiere = self.francais
+        note.save()
+        self.assertIsNone(self.statistique('departement', self.sciences))
+        self.assertEqual(self.statistique('departement', self.lettres), (1, 10, 10, 10))
+
+    def test_matiere_changee_de_departement(self):
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=14)
+        self.maths.departement = self.lettres
+        self.maths.save()
+        self.assertIsNone(self.statistique('departement', self.sciences))
+        self.assertEqual(self.statistique('departement', self.lettres), (1, 14, 14, 14))
+
+    def test_reconstruire_identique(self):
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=9)
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.francais, valeur=17)
+        avant = set(StatistiqueNotes.objects.values_list('portee', 'objet_id', 'nombre', 'somme'))
+        StatistiqueNotes.reconstruire()
+        self.assertEqual(set(StatistiqueNotes.objects.values_list('portee', 'objet_id', 'nombre', 'somme')), avant)
+
+    def test_reconstruire_atomique(self):
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=9)
+        avant = StatistiqueNotes.objects.count()
+        with mock.patch.object(StatistiqueNotes.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                StatistiqueNotes.reconstruire()
+        self.assertEqual(StatistiqueNotes.objects.count(), avant)
+
+    def test_moyenne_du_profil(self):
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=9)
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.francais, valeur=14)
+        self.connecter('eleve1', 'eleve')
+        with mock.patch.object(Eleve, 'calculerMoyenneGenerale', side_effect=AssertionError):
+            reponse = self.client.get(reverse('profile'))
+        self.assertEqual(reponse.context['moyenne'], 11.5)
+        self.assertContains(reponse, '11,5/20')
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Several rows per capacite: the cursor must break ties on id
+        for i in range(7):
+            Salle.objects.create(numero=str(i), capacite=[20, 30][i % 2])
+
+    def page(self, requete):
+        return paginer(requete, Salle.objects.all(), ['capacite', 'id'], taille=3)
+
+    def test_parcours_avant_et_arriere(self):
+        attendu = list(Salle.objects.order_by('capacite', 'id'))
+        usine = RequestFactory()
+        page = self.page(usine.get('/'))
+        self.assertIsNone(page.url_precedente)
+        vues, pages = list(page), [page]
+        while page.url_suivante:
+            page = self.page(usine.get('/' + page.url_suivante))
+            vues.extend(page)
+            pages.append(page)
+        self.assertEqual(vues, attendu)
+        self.assertEqual([len(p.objets) for p in pages], [3, 3, 1])
+
+        precedente = self.page(usine.get('/' + pages[-1].url_precedente))
+        self.assertEqual(precedente.objets, pages[1].objets)
+
+    def test_curseur_invalide(self):
+        requete = RequestFactory().get('/', QueryDict('apres=pas-un-curseur&x=1'))
+        self.assertEqual(self.page(requete).objets, list(Salle.objects.order_by('capacite', 'id')[:3]))
+
+
+class GrilleNotesTests(DonneesTestCase):
+    def setUp(self):
+        self.connecter('prof', 'enseignant')
+
+    def test_grille_de_notes(self):
+        e1, e2, e3 = self.eleves
+        url = reverse('notes_saisie', args=[self.maths.pk])
+        reponse = self.client.post(url, {f'note_{e1.pk}': '12,5', f'note_{e2.pk}': '25', f'note_{e3.pk}': ''})
+        self.assertEqual(reponse.status_code, 200)  # the invalid grade is shown again
+        self.assertEqual(dict(Notes.objects.values_list('eleve_id', 'valeur')), {e1.pk: 12.5})
+        self.assertEqual(self.statistique('matiere', self.maths), (1, 12.5, 12.5, 12.5))
+
+        autre = Eleve.objects.create(utilisateur=creer_utilisateur('inconnu'), anneeEntree=2025)
+        self.client.post(url, {f'note_{autre.pk}': '10'})
+        self.assertFalse(Notes.objects.filter(eleve=autre).exists())
+
+    def test_enregistrer_lot(self):
+        e1, e2, e3 = self.eleves
+        Notes.objects.create(eleve=e1, matiere=self.maths, valeur=5)
+        self.assertEqual(Notes.enregistrer_lot(self.maths, {e1.pk: 15, e2.pk: 11, e3.pk: 7}), 3)
+        self.assertEqual(Notes.objects.get(eleve=e1, matiere=self.maths).valeur, 15)
+        self.assertEqual(self.statistique('matiere', self.maths), (3, 33, 7, 15))
+        self.assertEqual(self.statistique('eleve', e1), (1, 15, 15, 15))
+
+
+class AppelTests(DonneesTestCase):
+    def setUp(self):
+        self.connecter('prof', 'enseignant')
+
+    def test_appel(self):
+        e1, e2, e3 = self.eleves
+        reponse = self.client.post(reverse('presence_appel', args=[self.maths.pk]), {
+            'date': LUNDI.isoformat(), 'eleves': [e1.pk, e2.pk, e3.pk], f'present_{e1.pk}': 'on',
+        })
+        self.assertRedirects(reponse, reverse('presence_list'), fetch_redirect_response=False)
+        self.assertEqual(dict(Presence.objects.values_list('eleve_id', 'present')),
+                         {e1.pk: True, e2.pk: False, e3.pk: False})
+        self.assertEqual(CumulPresence.totaux('matiere', self.maths.pk), (1, 2))
+
+    def test_appel_date_invalide(self):
+        url = reverse('presence_appel', args=[self.maths.pk])
+        for date in ('', '2026-13-01'):
+            reponse = self.client.post(url, {'date': date, 'eleves': [self.eleves[0].pk]})
+            self.assertRedirects(reponse, url, fetch_redirect_response=False)
+        self.assertFalse(Presence.objects.exists())
+        # Only the form defaults to today
+        self.assertEqual(self.client.get(url, {'date': 'x'}).context['date'], timezone.localdate())
+
+    def test_appel_matiere_d_un_autre_enseignant(self):
+        self.francais.enseignant = self.autre_enseignant
+        self.francais.save()
+        reponse = self.client.get(reverse('presence_appel', args=[self.francais.pk]))
+        self.assertEqual(reponse.status_code, 404)
+
+
+class PerformanceTests(DonneesTestCase):
+    def test_server_timing(self):
+        self.connecter('prof', 'enseignant')
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse('teacher_dashboard'))
+        mesures = dict(partie.split(';', 1) for partie in reponse['Server-Timing'].split(', '))
+        self.assertEqual(set(mesures), {'db', 'tpl', 'view', 'total'})
+        self.assertIn(f'desc="{len(requetes)} requetes SQL"', mesures['db'])
+        self.assertGreaterEqual(statistiques_performances()['teacher_dashboard']['total'], 1)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_sans_echantillonnage(self):
+        avant = statistiques_performances().get('login', {}).get('total', 0)
+        reponse = self.client.get(reverse('login'))
+        self.assertNotIn('Server-Timing', reponse)
+        self.assertEqual(statistiques_performances().get('login', {}).get('total', 0), avant)
+
+    def test_centiles(self):
+        stats = StatistiquesVue(taille=100)
+        self.assertEqual(stats.centile(50), 0.0)
+        for i in range(1, 101):
+            stats.durees.append(i / 1000)
+        self.assertEqual(stats.centile(50), 0.051)
+        self.assertEqual(stats.centile(95), 0.096)
+        self.assertEqual(stats.centile(100), 0.1)
+        # Only the last measurements are kept
+        stats.durees.extend([1.0] * 50)
+        self.assertEqual(stats.centile(50), 1.0)
+
+
+class CompteurTests(DonneesTestCase):
+    def valeur(self, modele, portee='global', objet_id=0):
+        return Compteur.objects.filter(modele=modele, portee=portee, objet_id=objet_id).values_list(
+            'valeur', flat=True).first() or 0
+
+    def test_creation_suppression(self):
+        avant = self.valeur('departement', 'college', self.college.pk)
+        departement = Departement.objects.create(nom='Arts', code_departement='ART', college=self.college)
+        self.assertEqual(self.valeur('departement', 'college', self.college.pk), avant + 1)
+        self.assertEqual(self.valeur('departement', 'academie', self.academie.pk), avant + 1)
+        departement.delete()
+        self.assertEqual(self.valeur('departement', 'college', self.college.pk), avant)
+
+    def test_departement_change_de_college(self):
+        self.sciences.college = self.autre_college
+        self.sciences.save()
+        # The department takes its teacher and its subject along
+        self.assertEqual(self.valeur('enseignant', 'college', self.college.pk), 1)
+        self.assertEqual(self.valeur('enseignant', 'college', self.autre_college.pk), 1)
+        self.assertEqual(self.valeur('matiere', 'academie', self.autre_academie.pk), 1)
+        self.assertEqual(self.valeur('matiere', 'academie', self.academie.pk), 1)
+
+    def test_reconcilier_identique(self):
+        avant = set(Compteur.objects.filter(valeur__gt=0).values_list('modele', 'portee', 'objet_id', 'valeur'))
+        Compteur.reconcilier()
+        self.assertEqual(set(Compteur.objects.values_list('modele', 'portee', 'objet_id', 'valeur')), avant)
+        self.assertEqual(Compteur.globaux()['eleves'], 3)
+
+
+class FormulairesTests(DonneesTestCase):
+    def setUp(self):
+        self.connecter('prof', 'enseignant')
+
+    def test_formulaires_sans_eleve(self):
+        for nom, donnees in (
+                ('notes_create', {'matiere': self.maths.pk, 'eleve': '', 'valeur': '12'}),
+                ('presence_create', {'matiere': 'x', 'eleve': self.eleves[0].pk, 'date': '2026-03-02'})):
+            reponse = self.client.post(reverse(nom), donnees)
+            self.assertRedirects(reponse, reverse(nom), fetch_redirect_response=False)
+        self.assertFalse(Notes.objects.exists())
+        self.assertFalse(Presence.objects.exists())
+
+    def test_recherche_sans_accents_ni_casse(self):
+        eric = creer_utilisateur('elefevre')
+        eric.nom, eric.prenom = 'Lefèvre', 'Éric'
+        eric.save(update_fields=['nom', 'prenom'])
+        Utilisateur.objects.bulk_create([Utilisateur(nom='Œuvray', prenom='Zoé', identifiant='zoe', mail='z@example.org')])
+        for terme, attendu in (('éri', ['elefevre']), ('ERIC', ['elefevre']), ('lefe', ['elefevre']),
+                               ('LÈF', ['elefevre']), ('ZOÉ', ['zoe']), ('œuv', ['zoe']), ('ric', [])):
+            with self.subTest(terme=terme):
+                self.assertEqual(list(Utilisateur.rechercher(terme).values_list('identifiant', flat=True)), attendu)
+
+    def test_recherche_utilisateurs_matiere_invalide(self):
+        reponse = self.client.get(reverse('recherche_utilisateurs'), {'q': 'ele', 'matiere': 'abc'})
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('erreur', reponse.json())
+
+
+@skipUnless(shutil.which('node'), 'node est requis pour tester autocomplete.js')
+class AutocompleteTests(SimpleTestCase):
+    """static/js/autocomplete.js run by node against a minimal DOM and a scripted fetch"""
+    SCENARIO = r"""
+const assert = require('assert');
+const fs = require('fs');
+const vm = require('vm');
+
+function element(proprietes) {
+    const ecouteurs = {};
+    return Object.assign({
+        value: '', dataset: {}, enfants: [], validite: '',
+        addEventListener(type, f) { ecouteurs[type] = f; },
+        declencher(type) { ecouteurs[type](); },
+        getAttribute(nom) { return this.attributs[nom]; },
+        setCustomValidity(message) { this.validite = message; },
+        replaceChildren() { this.enfants = []; },
+        appendChild(enfant) { this.enfants.push(enfant); },
+    }, proprietes);
+}
+
+const champ = element({dataset: {autocomplete: '/api/recherche/', cible: 'eleve-valeur'},
+                       attributs: {list: 'eleve-resultats'}});
+const elements = {'eleve-valeur': element({}), 'eleve-resultats': element({})};
+const cible = elements['eleve-valeur'];
+const reponses = {};  // q -> resolve of the pending fetch
+let minuterie = null;
+vm.runInNewContext(fs.readFileSync(process.argv[2], 'utf8'), {
+    URL, AbortController,
+    window: {location: {origin: 'http://test'}},
+    document: {
+        querySelectorAll: () => [champ],
+        getElementById: (id) => elements[id],
+        createElement: () => ({}),
+    },
+    fetch: (url) => new Promise((resolve) => {
+        reponses[url.searchParams.get('q')] = (resultats) => resolve({ok: true, json: () => ({resultats})});
+    }),
+    setTimeout: (f) => { minuterie = f; return 1; },
+    clearTimeout: () => { minuterie = null; },
+});
+
+function saisir(valeur) {
+    champ.value = valeur;
+    champ.declencher('input');
+    if (minuterie) {
+        minuterie();
+        minuterie = null;
+    }
+}
+const attendre = () => new Promise((resolve) => setImmediate(resolve));
+
+(async function () {
+    const label = 'Éric Dupont (edupont)';
+    saisir('Dup');
+    saisir('Dupo');
+    reponses['Dup']([{id: 7, label}]);
+    await attendre();
+    assert.strictEqual(champ.validite, 'Choisissez une proposition de la liste');
+
+    // Picking the suggestion fills the hidden id without a new search
+    saisir(label);
+    assert.strictEqual(cible.value, 7);
+    assert.strictEqual(champ.validite, '');
+    assert.deepStrictEqual(Object.keys(reponses), ['Dup', 'Dupo']);
+
+    // The search still in flight comes back empty: the choice is kept
+    reponses['Dupo']([]);
+    await attendre();
+    assert.strictEqual(cible.value, 7);
+    assert.strictEqual(champ.validite, '');
+})().catch((erreur) => { console.error(erreur); process.exit(1); });
+"""
+
+    def test_choix_d_une_proposition(self):
+        script = Path(settings.BASE_DIR) / 'static' / 'js' / 'autocomplete.js'
+        resultat = subprocess.run(['node', '-', str(script)], input=self.SCENARIO, capture_output=True, text=True)
+        self.assertEqual(resultat.returncode, 0, resultat.stderr)
+
+
+class InscriptionTests(DonneesTestCase):
+    def test_inscrire_ignore_les_inscrits(self):
+        nouveau = Eleve.objects.create(utilisateur=creer_utilisateur('nouveau'), anneeEntree=2026)
+        Inscription.inscrire(self.maths, [self.eleves[0].pk, nouveau.pk])
+        self.assertEqual(self.maths.inscriptions.count(), 4)
+
+    def test_page_d_inscription(self):
+        nouveau = Eleve.objects.create(utilisateur=creer_utilisateur('nouveau'), anneeEntree=2026)
+        self.connecter('admin', 'admin')
+        url = reverse('matiere_inscriptions', args=[self.francais.pk])
+        reponse = self.client.post(url, {'identifiants': 'eleve1, nouveau\npersonne'})
+        self.assertEqual(reponse.status_code, 200)  # the unknown identifiant is reported
+        self.assertContains(reponse, 'personne')
+        self.assertEqual(set(self.francais.inscriptions.values_list('eleve_id', flat=True)),
+                         {self.eleves[0].pk, nouveau.pk})
+        reponse = self.client.post(url, {'identifiants': 'eleve2'})
+        self.assertRedirects(reponse, reverse('matiere_list'), fetch_redirect_response=False)
+
+
+class PagesEleveTests(DonneesTestCase):
+    def test_pages_async_avec_session_admin_django(self):
+        # The auth context processor reads request.user while the async views render
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.org', 'x'))
+        self.connecter('eleve1', 'eleve')
+        for nom in ('student_dashboard', 'student_notes', 'student_presences', 'student_cours', 'student_schedule'):
+            with self.subTest(nom=nom):
+                self.assertEqual(self.client.get(reverse(nom)).status_code, 200)
+
+
+class ExportsTests(DonneesTestCase):
+    def setUp(self):
+        e1, e2, _ = self.eleves
+        arts = Departement.objects.create(nom='Arts', code_departement='ART', college=self.autre_college)
+        self.dessin = Matiere.objects.create(libelle='Dessin', departement=arts)
+        Notes.objects.create(eleve=e1, matiere=self.maths, valeur=12)
+        Notes.objects.create(eleve=e1, matiere=self.francais, valeur=15.5)
+        Notes.objects.create(eleve=e2, matiere=self.dessin, valeur=9)
+        for jour, present in ((0, True), (1, False), (7, True)):
+            Presence.objects.create(eleve=e2, matiere=self.maths, enseignant=self.enseignant,
+                                    date=LUNDI + timedelta(days=jour), present=present)
+
+    def lire(self, nom, **filtres):
+        texte = ''.join(blocs_csv(nom, **filtres))
+        self.assertTrue(texte.startswith('\ufeff'))
+        entetes, *lignes = csv.reader(io.StringIO(texte[1:]))
+        self.assertEqual(entetes, EXPORTS[nom]['entetes'])
+        return lignes
+
+    def test_contenu(self):
+        self.assertEqual(self.lire('notes'), [
+            ['Collège A', 'Sciences', 'Maths', 'Test Prof', 'eleve1', 'Test', 'Eleve1', '12.0'],
+            ['Collège A', 'Lettres', 'Français', 'Test Prof', 'eleve1', 'Test', 'Eleve1', '15.5'],
+            ['Collège B', 'Arts', 'Dessin', '', 'eleve2', 'Test', 'Eleve2', '9.0'],
+        ])
+        self.assertEqual(self.lire('presences')[1],
+                         ['2026-03-03', 'Collège A', 'Sciences', 'Maths', 'Test Prof', 'eleve2', 'Test', 'Eleve2', 'Absent'])
+
+    def test_blocs(self):
+        with mock.patch('core.exports.TAILLE_LOT', 2):
+            blocs = list(blocs_csv('notes'))
+        self.assertEqual(len(blocs), 2)  # header + 1 row, then 2 rows
+        self.assertEqual(''.join(blocs), ''.join(blocs_csv('notes')))
+
+    def colonne(self, nom, index, **filtres):
+        return [ligne[index] for ligne in self.lire(nom, **filtres)]
+
+    def test_filtres(self):
+        self.assertEqual(self.colonne('notes', 2, college=self.college.pk), ['Maths', 'Français'])
+        self.assertEqual(self.colonne('notes', 2, college=self.autre_college.pk), ['Dessin'])
+        self.assertEqual(self.colonne('notes', 2, departement=self.lettres.pk), ['Français'])
+        self.assertEqual(self.colonne('notes', 2, college=self.autre_college.pk, departement=self.lettres.pk), [])
+        # Notes have no date: the range is ignored
+        self.assertEqual(len(self.lire('notes', du=LUNDI, au=LUNDI)), 3)
+        self.assertEqual(self.colonne('presences', 0, du=LUNDI + timedelta(days=1)), ['2026-03-03', '2026-03-09'])
+        self.assertEqual(self.colonne('presences', 0, au=LUNDI + timedelta(days=1)), ['2026-03-02', '2026-03-03'])
+        self.assertEqual(self.colonne('presences', 0, du=LUNDI, au=LUNDI), ['2026-03-02'])
+
+    def test_vue(self):
+        self.connecter('admin', 'admin')
+        reponse = self.client.get(reverse('export_csv', args=['notes']),
+                                  {'college': self.college.pk, 'du': '', 'departement': self.sciences.pk})
+        self.assertEqual(reponse['Content-Disposition'],
+                         f'attachment; filename="notes-college-{self.college.pk}-departement-{self.sciences.pk}.csv"')
+        self.assertEqual(len(b''.join(reponse.streaming_content).decode().splitlines()), 2)
+        reponse = self.client.get(reverse('export_csv', args=['presences']), {'du': '2026-02-30'})
+        self.assertRedirects(reponse, reverse('export_form'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('export_csv', args=['salles'])).status_code, 404)
+
+
+class ImportCsvTests(DonneesTestCase):
+    def fichier(self, texte, encodage='utf-8'):
+        return io.BytesIO(texte.encode(encodage))
+
+    def test_reprise_apres_interruption(self):
+        contenu = (f"identifiant;matiere;valeur\neleve1;{self.maths.pk};12\neleve2;{self.maths.pk};abc\n"
+                   f"eleve3;{self.maths.pk};15\n")
+        run = demarrer('notes', 'notes.csv', self.fichier(contenu))
+
+        def interrompre(run, debit):
+            raise RuntimeError("coupure")
+
+        with self.assertRaises(RuntimeError):
+            importer(run, self.fichier(contenu), taille_lot=1, progression=interrompre)
+        run.refresh_from_db()
+        self.assertEqual((run.statut, run.lignes_lues, run.lignes_importees), ('echec', 1, 1))
+
+        # The same file resumes the same run after the committed batch
+        run = demarrer('notes', 'notes.csv', self.fichier(contenu))
+        importer(run, self.fichier(contenu), taille_lot=1)
+        run.refresh_from_db()
+        self.assertEqual((run.statut, run.lignes_lues, run.lignes_importees, run.lignes_rejetees),
+                         ('termine', 3, 2, 1))
+        self.assertEqual(run.erreurs, [[3, "colonne 'valeur' : nombre attendu"]])
+        self.assertEqual(Notes.objects.count(), 2)
+        self.assertEqual(self.statistique('matiere', self.maths), (2, 27, 12, 15))
+
+    def test_fichier_non_utf8(self):
+        contenu = f"identifiant,matiere,valeur\nélève,{self.maths.pk},12\n"
+        run = demarrer('notes', 'notes.csv', self.fichier(contenu, 'latin-1'))
+        with self.assertRaises(LigneInvalide):
+            importer(run, self.fichier(contenu, 'latin-1'))
+        run.refresh_from_db()
+        self.assertEqual(run.statut, 'echec')
+        self.assertIn('UTF-8', run.message)
+
+    def test_colonnes_manquantes(self):
+        run = demarrer('eleves', 'eleves.csv', self.fichier("identifiant,nom\nx,y\n"))
+        with self.assertRaises(LigneInvalide):
+            importer(run, self.fichier("identifiant,nom\nx,y\n"))
+
+    def test_tache_d_import_supprime_le_fichier_en_echec(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = Path(dossier) / 'notes.csv'
+            chemin.write_bytes("identifiant,matiere,valeur\nélève,1,12\n".encode('latin-1'))
+            with open(chemin, 'rb') as fichier:
+                run = demarrer('notes', chemin.name, fichier)
+            enfiler('importer_csv', import_csv=run.pk, chemin=str(chemin))
+            self.assertFalse(executer(reclamer('test'), 'test'))
+            self.assertEqual(Tache.objects.get().statut, 'echec')  # LigneInvalide: no retry
+            self.assertFalse(chemin.exists())
+
+
+class CumulPresenceTests(DonneesTestCase):
+    def test_enregistrer_appel(self):
+        e1, e2, e3 = self.eleves
+        mercredi = LUNDI + timedelta(days=2)
+        Presence.enregistrer_appel(self.maths, LUNDI, self.enseignant, {e1.pk: True, e2.pk: False, e3.pk: True})
+        Presence.enregistrer_appel(self.maths, mercredi, self.enseignant, {e1.pk: False, e2.pk: False})
+        self.assertEqual(CumulPresence.totaux('matiere', self.maths.pk), (2, 3))
+        self.assertEqual(CumulPresence.totaux('eleve', e2.pk), (0, 2))
+        self.assertEqual(CumulPresence.totaux('matiere', self.maths.pk, du=mercredi), (0, 2))
+        semaine = CumulPresence.objects.get(portee='matiere', objet_id=self.maths.pk, periode='semaine')
+        self.assertEqual((semaine.debut, semaine.presents, semaine.absences), (LUNDI, 2, 3))
+
+        # The same roll call again overwrites it
+        Presence.enregistrer_appel(self.maths, mercredi, self.enseignant, {e1.pk: True, e2.pk: True})
+        self.assertEqual(CumulPresence.totaux('matiere', self.maths.pk), (4, 1))
+        self.assertEqual(Presence.objects.count(), 5)
+
+    def test_actualiser_lignes_ecrites_sans_cumul(self):
+        CumulPresence.actualiser()
+        Presence.objects.create(eleve=self.eleves[0], matiere=self.maths, date=LUNDI, present=False,
+                                enseignant=self.enseignant)
+        self.assertEqual(CumulPresence.totaux('eleve', self.eleves[0].pk), (0, 0))
+        self.assertEqual(CumulPresence.actualiser(), 1)
+        self.assertEqual(CumulPresence.totaux('eleve', self.eleves[0].pk), (0, 1))
+
+    def test_reconstruire_identique(self):
+        Presence.enregistrer_appel(self.maths, LUNDI, self.enseignant, {e.pk: e.pk % 2 == 0 for e in self.eleves})
+        Presence.enregistrer_appel(self.francais, LUNDI + timedelta(days=8), self.enseignant,
+                                   {self.eleves[0].pk: False})
+        champs = ('portee', 'objet_id', 'periode', 'debut', 'presents', 'absences')
+        avant = set(CumulPresence.objects.values_list(*champs))
+        CumulPresence.reconstruire()
+        self.assertEqual(set(CumulPresence.objects.values_list(*champs)), avant)
+
+    def test_presence_create(self):
+        self.connecter('prof', 'enseignant')
+        url = reverse('presence_create')
+        self.client.post(url, {'matiere': self.maths.pk, 'eleve': self.eleves[1].pk, 'date': LUNDI.isoformat(),
+                               'present': 'false'})
+        self.assertEqual(CumulPresence.totaux('eleve', self.eleves[1].pk), (0, 1))
+        reponse = self.client.post(url, {'matiere': self.maths.pk, 'eleve': self.eleves[1].pk, 'date': '2026-13-01',
+                                         'present': 'false'})
+        self.assertRedirects(reponse, url, fetch_redirect_response=False)
+        self.assertEqual(Presence.objects.count(), 1)
+
+    def test_suppressions(self):
+        e1, e2, _ = self.eleves
+        Presence.enregistrer_appel(self.maths, LUNDI, self.enseignant, {e1.pk: False, e2.pk: False})
+        Presence.enregistrer_appel(self.francais, LUNDI, self.enseignant, {e1.pk: False})
+        Presence.objects.get(eleve=e2).delete()
+        self.assertEqual(CumulPresence.totaux('matiere', self.maths.pk), (0, 1))
+        self.assertEqual(e2.calculerHeuresAbsence(), 0)
+        # Cascade from the subject
+        self.maths.delete()
+        self.assertEqual(CumulPresence.totaux('eleve', e1.pk), (0, 1))
+        self.assertFalse(CumulPresence.objects.filter(portee='matiere', objet_id=self.maths.pk).exists())
+
+
+class DistributionTests(DonneesTestCase):
+    def test_distribution(self):
+        stats = distribution(Counter({8: 1, 10: 2, 12: 1, 20: 1}))
+        self.assertEqual({cle: stats[cle] for cle in ('nombre', 'moyenne', 'mediane', 'q1', 'q3', 'minimum', 'maximum')},
+                         {'nombre': 5, 'moyenne': 12, 'mediane': 10, 'q1': 10, 'q3': 12, 'minimum': 8, 'maximum': 20})
+        self.assertEqual(stats['ecart_type'], 4.2)
+        self.assertEqual(stats['taux_reussite'], 80.0)
+        self.assertEqual([classe['effectif'] for classe in stats['histogramme']], [0, 0, 0, 0, 1, 2, 1, 0, 0, 1])
+        self.assertEqual([classe['hauteur'] for classe in stats['histogramme']], [0, 0, 0, 0, 50, 100, 50, 0, 0, 50])
+
+    def test_quantiles_interpoles(self):
+        frequences = Counter({0: 1, 3.5: 3, 9: 2, 11: 1, 14.25: 4, 19: 2})
+        valeurs = sorted(frequences.elements())
+        q1, mediane, q3 = statistics.quantiles(valeurs, n=4, method='inclusive')
+        stats = distribution(frequences)
+        self.assertEqual((stats['q1'], stats['mediane'], stats['q3']), (round(q1, 2), round(mediane, 2), round(q3, 2)))
+        self.assertEqual(stats['ecart_type'], round(statistics.pstdev(valeurs), 2))
+        self.assertEqual(distribution(Counter({0: 1, 10: 1}))['q1'], 2.5)
+
+    def test_vide(self):
+        stats = distribution(Counter())
+        self.assertEqual((stats['nombre'], stats['mediane'], stats['taux_reussite']), (0, None, None))
+        self.assertEqual(len(stats['histogramme']), 10)
+
+    def test_statistiques_departement(self):
+        e1, e2, _ = self.eleves
+        Notes.objects.create(eleve=e1, matiere=self.maths, valeur=6)
+        Notes.objects.create(eleve=e2, matiere=self.maths, valeur=14)
+        stats = statistiques_departement(self.sciences)
+        self.assertEqual((stats['departement']['nombre'], stats['departement']['taux_reussite']), (2, 50.0))
+        self.assertEqual([(m['nom'], m['enseignant'], m['moyenne']) for m in stats['matieres']],
+                         [('Maths', 'Test Prof', 10)])
+        # A new grade changes the version of the cached frequencies
+        Notes.objects.create(eleve=self.eleves[2], matiere=self.maths, valeur=20)
+        self.assertEqual(statistiques_departement(self.sciences)['departement']['maximum'], 20)
+
+
+class BulletinsTests(TestCase):
+    def test_nom_fichier(self):
+        self.assertEqual(nom_fichier(7, 'Jean.Dupont'), 'jeandupont-7.html')
+        self.assertEqual(nom_fichier(8, '../../etc/passwd'), 'etcpasswd-8.html')
+        self.assertEqual(nom_fichier(9, '///'), 'eleve-9.html')
+
+
+class TableauxTests(DonneesTestCase):
+    LIGNE = '<tr class="hover:bg-gray-50">'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Salle.objects.bulk_create(Salle(numero=f'S{i:02d}', capacite=20) for i in range(60))
+
+    def setUp(self):
+        self.connecter('admin', 'admin')
+
+    def test_page(self):
+        reponse = self.client.get(reverse('salle_list'))
+        self.assertTrue(reponse.streaming)
+        corps = b''.join(reponse.streaming_content).decode()
+        self.assertEqual(corps.count(self.LIGNE), 50)
+        self.assertIn('<a href="?tout=1"', corps)
+        self.assertIn('Suivant', corps)
+        self.assertTrue(corps.rstrip().endswith('</html>'))
+
+    def test_tout(self):
+        with mock.patch('core.tableaux.TAILLE_BLOC', 7):
+            reponse = self.client.get(reverse('salle_list'), {'tout': '1', 'apres': 'x', 'tri': 'numero'})
+            blocs = [bloc.decode() for bloc in reponse.streaming_content]
+        # The page head, then the 61 rooms 7 rows at a time, then the page foot
+        self.assertEqual(len(blocs), 1 + 9 + 1)
+        self.assertEqual([bloc.count(self.LIGNE) for bloc in blocs], [0] + [7] * 8 + [5, 0])
+        corps = ''.join(blocs)
+        numeros = list(Salle.objects.order_by('id').values_list('numero', flat=True))
+        positions = [corps.index(f'>\n        {numero}\n') for numero in numeros]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('<a href="?tri=numero"', corps)  # back to pages, other parameters kept
+        self.assertNotIn('Suivant', corps)
+
+    def test_une_seule_page_ou_vide(self):
+        page = tableau_en_flux(RequestFactory().get('/'), {'title': 'Vide', 'headers': []}, iter([]))
+        self.assertFalse(page.streaming)
+        self.assertEqual(page.status_code, 200)
+        Salle.objects.filter(numero__startswith='S').delete()
+        corps = b''.join(self.client.get(reverse('salle_list')).streaming_content).decode()
+        self.assertEqual(corps.count(self.LIGNE), 1)
+        self.assertNotIn('Tout afficher', corps)
+
+
+class ApiTests(DonneesTestCase):
+    def verifier_etag(self, url, modifier):
+        premiere = self.client.get(url)
+        self.assertEqual(premiere.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag']).status_code, 304)
+        modifier()
+        seconde = self.client.get(url, HTTP_IF_NONE_MATCH=premiere['ETag'])
+        self.assertEqual(seconde.status_code, 200)
+        self.assertNotEqual(seconde['ETag'], premiere['ETag'])
+        return seconde.json()
+
+    def test_api_eleve(self):
+        self.connecter('eleve1', 'eleve')
+        donnees = self.verifier_etag(reverse('api_notes'), lambda: Notes.objects.create(
+            eleve=self.eleves[0], matiere=self.maths, valeur=13))
+        self.assertEqual([n['valeur'] for n in donnees['notes']], [13])
+        self.verifier_etag(reverse('api_presences'), lambda: Presence.enregistrer_appel(
+            self.maths, LUNDI, self.enseignant, {self.eleves[0].pk: False}))
+        self.verifier_etag(reverse('api_emploi_du_temps'), lambda: Inscription.objects.filter(
+            eleve=self.eleves[0], matiere=self.francais).delete())
+
+    def renommer(self, utilisateur, nom):
+        utilisateur.nom = nom
+        utilisateur.save(update_fields=['nom'])
+
+    def test_api_eleve_noms(self):
+        Notes.objects.create(eleve=self.eleves[0], matiere=self.maths, valeur=13)
+        self.connecter('eleve1', 'eleve')
+        donnees = self.verifier_etag(reverse('api_notes'), lambda: self.renommer(self.enseignant.utilisateur, 'Durand'))
+        self.assertEqual(donnees['notes'][0]['enseignant_nom'], 'Durand')
+        salle = self.maths.salle
+
+        def renumeroter():
+            salle.numero = '102'
+            salle.save()
+        donnees = self.verifier_etag(reverse('api_emploi_du_temps'), renumeroter)
+        self.assertEqual({m['salle_numero'] for m in donnees['matieres']}, {'102', None})
+
+    def test_api_enseignant(self):
+        self.connecter('prof', 'enseignant')
+        donnees = self.verifier_etag(reverse('api_enseignant_cours'), lambda: Cours.objects.create(
+            titre='Fractions', contenu='...', matiere=self.maths, enseignant=self.enseignant))
+        self.assertEqual([c['titre'] for c in donnees['cours']], ['Fractions'])
+        self.verifier_etag(reverse('api_enseignant_notes'), lambda: Notes.enregistrer_lot(
+            self.maths, {self.eleves[1].pk: 9}))
+        self.verifier_etag(reverse('api_enseignant_presences'), lambda: Presence.enregistrer_appel(
+            self.maths, LUNDI, self.enseignant, {self.eleves[1].pk: True}))
+        donnees = self.verifier_etag(reverse('api_enseignant_presences'),
+                                     lambda: self.renommer(self.eleves[1].utilisateur, 'Martin'))
+        self.assertEqual(donnees['presences'][0]['eleve_nom'], 'Martin')
+
+    def test_roles(self):
+        self.connecter('eleve1', 'eleve')
+        self.assertEqual(self.client.get(reverse('api_enseignant_notes')).status_code, 302)
+
+
+class RechercheCoursTests(DonneesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cours = Cours.objects.create(titre='Théorème de Pythagore', contenu='Le triangle rectangle.',
+                                         matiere=cls.maths, enseignant=cls.enseignant)
+
+    def titres(self, terme, **portee):
+        return [c.titre for c in rechercher_cours(terme, **portee)]
+
+    def test_index_suit_les_modifications(self):
+        eleve = self.eleves[1]
+        self.assertEqual(self.titres('pythagore', eleve=eleve), ['Théorème de Pythagore'])
+        self.assertEqual(self.titres('triang', eleve=eleve), ['Théorème de Pythagore'])
+
+        self.cours.titre = 'Théorème de Thalès'
+        self.cours.save()
+        self.assertEqual(self.titres('pythagore', eleve=eleve), [])
+        self.assertEqual(self.titres('thales', enseignant=self.enseignant), ['Théorème de Thalès'])
+
+        # Moved to a subject the student doesn't take: out of their scope
+        self.cours.matiere = self.francais
+        self.cours.save()
+        self.assertEqual(self.titres('thales', eleve=eleve), [])
+        self.assertEqual(self.titres('thales', eleve=self.eleves[0]), ['Théorème de Thalès'])
+
+        self.cours.delete()
+        self.assertEqual(self.titres('thales', enseignant=self.enseignant), [])
+
+    def test_liens_des_resultats(self):
+        self.connecter('eleve2', 'eleve')
+        reponse = self.client.get(reverse('cours_recherche'), {'q': 'pythagore'})
+        url = reverse('student_cours_detail', args=[self.cours.pk])
+        self.assertContains(reponse, f'href="{url}"')
+        self.assertContains(self.client.get(url), 'Le triangle rectangle.')
+
+    def test_cours_hors_portee(self):
+        autre = Cours.objects.create(titre='Poésie', contenu='...', matiere=self.francais,
+                                     enseignant=self.autre_enseignant)
+        self.connecter('eleve2', 'eleve')
+        self.assertEqual(self.client.get(reverse('student_cours_detail', args=[autre.pk])).status_code, 404)
+        self.connecter('prof', 'enseignant')
+        self.assertEqual(self.client.get(reverse('cours_detail', args=[autre.pk])).status_code, 404)
+
+
+class StatiquesTests(SimpleTestCase):
+    SCRIPT = 'function bonjour() { return "bonjour"; }\n' * 40
+
+    def setUp(self):
+        sources = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.racine = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (sources / 'app.js').write_text(self.SCRIPT)
+        (sources / 'court.txt').write_text('court')
+        self.enterContext(override_settings(
+            STATICFILES_DIRS=[sources], STATIC_ROOT=self.racine, STATIQUES_COMPILES=True,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                      'staticfiles': {'BACKEND': 'core.statiques.StockageStatique'}},
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hache = next(self.racine.glob('app.*.js')).name
+        # brotli is optional: a stand-in .br is enough to check the negotiation
+        for nom in ('app.js', self.hache):
+            (self.racine / f'{nom}.br').write_bytes(b'br')
+        self.middleware = StatiquesMiddleware(lambda request: HttpResponse('vue'))
+
+    def servir(self, nom, methode='get', **entetes):
+        reponse = self.middleware(getattr(RequestFactory(), methode)(f'/static/{nom}', headers=entetes))
+        corps = b''.join(reponse.streaming_content) if reponse.streaming else reponse.content
+        return reponse, corps
+
+    def test_encodage(self):
+        for accept, encodage in (('gzip, deflate, br', 'br'), ('gzip', 'gzip'), ('br;q=0, gzip;q=0.5', 'gzip'),
+                                 ('identity', None), ('', None)):
+            with self.subTest(accept=accept):
+                reponse, corps = self.servir(self.hache, accept_encoding=accept)
+                self.assertEqual(reponse.get('Content-Encoding'), encodage)
+                self.assertEqual(reponse['Vary'], 'Accept-Encoding')
+                self.assertEqual(reponse['Content-Type'], 'text/javascript')
+                if encodage == 'gzip':
+                    corps = gzip.decompress(corps)
+                if encodage != 'br':
+                    self.assertEqual(corps.decode(), self.SCRIPT)
+        # Too small to gain from compression
+        reponse, corps = self.servir('court.txt', accept_encoding='gzip')
+        self.assertEqual((reponse.get('Content-Encoding'), reponse.get('Vary'), corps), (None, None, b'court'))
+
+    def test_cache(self):
+        reponse, _ = self.servir(self.hache)
+        self.assertEqual(reponse['Cache-Control'], CACHE_IMMUABLE)
+        reponse, _ = self.servir('app.js')
+        self.assertEqual(reponse['Cache-Control'], CACHE_REVALIDER)
+        derniere = reponse['Last-Modified']
+        reponse, corps = self.servir('app.js', if_modified_since=derniere)
+        self.assertEqual((reponse.status_code, corps), (304, b''))
+        self.assertEqual(reponse['Cache-Control'], CACHE_REVALIDER)
+        self.assertEqual(self.servir('app.js', if_modified_since='Mon, 02 Mar 2020 00:00:00 GMT')[0].status_code, 200)
+        # Hashed names never change: no revalidation
+        self.assertEqual(self.servir(self.hache, if_modified_since=derniere)[0].status_code, 200)
+
+    def test_autres_requetes(self):
+        self.assertEqual(self.servir('inconnu.js')[1], b'vue')
+        self.assertEqual(self.servir('app.js', methode='post')[0].status_code, 405)
+        with override_settings(STATIQUES_COMPILES=False), self.assertRaises(MiddlewareNotUsed):
+            StatiquesMiddleware(lambda request: HttpResponse('vue'))
+
+
+# Jobs used by TachesTests only
+ABANDONS = []
+
+
+@tache('tests_reussit', "Test : réussit")
+def _reussit(execution, nombre):
+    return {'nombre': nombre, 'message': f"{nombre} traité(s)"}
+
+
+@tache('tests_echoue', "Test : échoue", max_tentatives=2, abandon=lambda **parametres: ABANDONS.append(parametres))
+def _echoue(execution, cle):
+    raise RuntimeError("panne")
+
+
+@tache('tests_invalide', "Test : entrée invalide", sans_reessai=(ValueError,))
+def _invalide(execution):
+    raise ValueError("entrée invalide")
+
+
+class TachesTests(TestCase):
+    def setUp(self):
+        ABANDONS.clear()
+
+    def test_reclamer_puis_terminer(self):
+        premiere = enfiler('tests_reussit', nombre=3)
+        enfiler('tests_reussit', nombre=4)
+        tache = reclamer('w1')
+        self.assertEqual((tache.pk, tache.statut, tache.tentatives, tache.travailleur),
+                         (premiere.pk, 'en_cours', 1, 'w1'))
+        self.assertNotEqual(reclamer('w2').pk, premiere.pk)
+        self.assertIsNone(reclamer('w3'))
+
+        self.assertTrue(executer(tache, 'w1'))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.resultat['nombre'], tache.message), ('terminee', 3, '3 traité(s)'))
+
+    def test_nouvel_essai_puis_abandon(self):
+        enfiler('tests_echoue', cle='a')
+        avant = timezone.now()
+        self.assertFalse(executer(reclamer('w1'), 'w1'))
+        tache = Tache.objects.get()
+        self.assertEqual((tache.statut, tache.tentatives, tache.travailleur), ('en_attente', 1, ''))
+        self.assertGreaterEqual(tache.executer_apres, avant + timedelta(seconds=DELAI_REESSAI))
+        self.assertIsNone(reclamer('w1'))  # not due yet
+        self.assertEqual(ABANDONS, [])
+
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertFalse(executer(reclamer('w1'), 'w1'))
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), ('echec', 2))
+        self.assertIn('panne', tache.erreur)
+        self.assertEqual(ABANDONS, [{'cle': 'a'}])
+
+    def test_sans_reessai(self):
+        enfiler('tests_invalide')
+        executer(reclamer('w1'), 'w1')
+        self.assertEqual(Tache.objects.values_list('statut', 'tentatives').get(), ('echec', 1))
+
+    def test_travailleur_disparu(self):
+        enfiler('tests_reussit', nombre=1)
+        reclamer('w1')
+        Tache.objects.update(battement=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(relancer_abandonnees(), 1)
+        self.assertEqual(Tache.objects.values_list('statut', 'travailleur').get(), ('en_attente', ''))
@@ -1,36 +1,118 @@
+import asyncio
+import datetime
+import hashlib
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from .exports import EXPORTS, blocs_async, blocs_csv
+from .imports import IMPORTS, demarrer
+from .middleware import statistiques_performances
+from .pagination import apaginer
+from .recherche import rechercher_cours
+from .routeur import lecture_seule
+from .statistiques import statistiques_departement
+from .tableaux import lister
+from .taches import TACHES, en_file, enfiler, libelle
 from .models import (
-    Utilisateur, Administrateur, College, Departement, 
-    Enseignant, Eleve, Matiere, Salle, Notes, Cours, Presence
+    Utilisateur, Administrateur, Academie, College, Departement,
+    Enseignant, Eleve, Matiere, Salle, Notes, Cours, Presence, Inscription, StatistiqueNotes, Compteur, ImportCsv,
+    CumulPresence, Tache,
 )
 
+# Role -> Utilisateur reverse relation holding the profile
+PROFILS = {'admin': 'administrateur', 'enseignant': 'enseignant', 'eleve': 'eleve'}
+
+def charger_utilisateur(**filtres):
+    """Utilisateur with every role profile joined in, so role checks and .enseignant/.eleve cost no query"""
+    return (Utilisateur.objects
+            .select_related('administrateur', 'enseignant__departement_dirige', 'eleve')
+            .filter(**filtres).first())
+
+def a_le_role(utilisateur, user_type):
+    return user_type in PROFILS and hasattr(utilisateur, PROFILS[user_type])
+
+def verifier_session(request, user_type):
+    """Redirect to the login page, or None once request.utilisateur is set"""
+    if 'user_id' not in request.session:
+        return redirect('login')
+    if user_type and request.session.get('user_type') != user_type:
+        messages.error(request, 'Accès non autorisé.')
+        return redirect('login')
+    utilisateur = charger_utilisateur(id=request.session['user_id'])
+    if utilisateur is None or not a_le_role(utilisateur, request.session.get('user_type')):
+        request.session.flush()
+        return redirect('login')
+    request.utilisateur = utilisateur
+    return None
+
+# Helper function for login requirement
+def require_login(user_type=None):
+    """Resolve the logged-in user once (request.utilisateur) and enforce the session role"""
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            def verifier(request):
+                refus = verifier_session(request, user_type)
+                if refus is None and hasattr(request, 'user'):
+                    # Load the lazy Django auth user now: the auth context processor reads it while rendering
+                    request.user.is_authenticated
+                return refus
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # Session and user lookups are sync: one thread hop for all of them
+                refus = await sync_to_async(verifier)(request)
+                if refus is not None:
+                    return refus
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            refus = verifier_session(request, user_type)
+            if refus is not None:
+                return refus
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+async def en_liste(queryset):
+    """Evaluate a queryset with the async ORM (templates of async views must not hit the database)"""
+    return [objet async for objet in queryset]
+
 # Authentication Views
+DASHBOARDS = {'admin': 'admin_dashboard', 'enseignant': 'teacher_dashboard', 'eleve': 'student_dashboard'}
+
 def login_view(request):
     if request.method == 'POST':
         identifiant = request.POST.get('identifiant')
         user_type = request.POST.get('user_type')
         
         try:
-            utilisateur = Utilisateur.objects.get(identifiant=identifiant)
-            request.session['user_id'] = utilisateur.id
-            request.session['user_type'] = user_type
+            utilisateur = charger_utilisateur(identifiant=identifiant)
+            if utilisateur is None:
+                raise Utilisateur.DoesNotExist
             
-            # Verify user type matches
-            if user_type == 'admin' and hasattr(utilisateur, 'administrateur'):
+            # Verify user type matches (profiles are already joined in, no extra query)
+            if a_le_role(utilisateur, user_type):
+                request.session['user_id'] = utilisateur.id
+                request.session['user_type'] = user_type
                 messages.success(request, 'Connexion réussie!')
-                return redirect('admin_dashboard')
-            elif user_type == 'enseignant' and hasattr(utilisateur, 'enseignant'):
-                messages.success(request, 'Connexion réussie!')
-                return redirect('teacher_dashboard')
-            elif user_type == 'eleve' and hasattr(utilisateur, 'eleve'):
-                messages.success(request, 'Connexion réussie!')
-                return redirect('student_dashboard')
+                return redirect(DASHBOARDS[user_type])
             else:
                 messages.error(request, 'Type d\'utilisateur incorrect.')
-                del request.session['user_id']
-                del request.session['user_type']
         except Utilisateur.DoesNotExist:
             messages.error(request, 'Identifiant invalide.')
     
@@ -41,11 +123,10 @@ def logout_view(request):
     messages.info(request, 'Vous avez été déconnecté.')
     return redirect('login')
 
+@lecture_seule
+@require_login()
 def profile_view(request):
-    if 'user_id' not in request.session:
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     user_type = request.session.get('user_type')
     
     context = {
@@ -58,49 +139,246 @@ def profile_view(request):
         context['enseignant'] = utilisateur.enseignant
     elif user_type == 'eleve':
         context['eleve'] = utilisateur.eleve
+        context['moyenne'] = StatistiqueNotes.moyenne_de('eleve', utilisateur.eleve)
     
     return render(request, 'profile.html', context)
 
 # Admin Dashboard
+@lecture_seule
+@require_login('admin')
 def admin_dashboard(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
-    
-    stats = {
-        'colleges': College.objects.count(),
-        'departements': Departement.objects.count(),
-        'enseignants': Enseignant.objects.count(),
-        'eleves': Eleve.objects.count(),
-    }
+    utilisateur = request.utilisateur
+    
+    # Counters are maintained on write (see core/signals.py), no COUNT(*) over the big tables here
+    stats = Compteur.globaux()
+    par_academie = Compteur.par_portee('academie')
+    par_college = Compteur.par_portee('college')
+    
+    academies = []
+    colleges_par_academie = defaultdict(list)
+    for college in College.objects.order_by('nom'):
+        colleges_par_academie[college.academie_id].append({'nom': college.nom, 'stats': par_college[college.id]})
+    for academie in Academie.objects.order_by('nom'):
+        academies.append({
+            'nom': academie.nom,
+            'stats': par_academie[academie.id],
+            'colleges': colleges_par_academie[academie.id],
+        })
     
     return render(request, 'admin_dashboard.html', {
         'utilisateur': utilisateur,
         'user_type': 'admin',
-        'stats': stats
+        'stats': stats,
+        'academies': academies,
     })
 
-# Teacher Dashboard
-def teacher_dashboard(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
+@require_login('admin')
+def performance_dashboard(request):
+    """Rolling latency percentiles per URL name, as measured by PerformanceMiddleware in this process"""
+    items = []
+    for nom, stats in statistiques_performances().items():
+        lente = stats['lentes'][0] if stats['lentes'] else None
+        items.append({
+            'values': [
+                nom, stats['total'], f"{stats['p50']:.1f}", f"{stats['p95']:.1f}", f"{stats['p99']:.1f}",
+                f"{stats['sql_moyen']:.1f}", f"{stats['requetes_moyennes']:.1f}",
+                f"{lente[0]:.1f} ms : {lente[1][:120]}" if lente else '-',
+            ],
+            'edit_url': None,
+            'delete_url': None
+        })
     
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    return render(request, 'list_generic.html', {
+        'title': 'Performances par vue',
+        'headers': ['Vue', 'Requêtes', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'SQL moyen (ms)', 'Requêtes SQL', 'Requête SQL la plus lente'],
+        'items': items,
+        'create_url': None,
+        'user_type': 'admin'
+    })
+
+# Exports
+def _parametre(request, nom, conversion):
+    valeur = (request.POST if request.method == 'POST' else request.GET).get(nom)
+    return conversion(valeur) if valeur else None
+
+def _filtres_export(request):
+    """college / departement / du / au of the export form; ValueError when one is malformed"""
+    return {
+        'college': _parametre(request, 'college', int),
+        'departement': _parametre(request, 'departement', int),
+        'du': _parametre(request, 'du', datetime.date.fromisoformat),
+        'au': _parametre(request, 'au', datetime.date.fromisoformat),
+    }
+
+@require_login('admin')
+def export_form(request):
+    return render(request, 'exports.html', {
+        'exports': EXPORTS,
+        'colleges': College.objects.order_by('nom'),
+        'departements': Departement.objects.select_related('college').order_by('college__nom', 'nom'),
+        'user_type': 'admin'
+    })
+
+@require_login('admin')
+def export_csv(request, nom):
+    """Stream a Notes/Presence extract as CSV, optionally limited to a college, a department and a date range"""
+    if nom not in EXPORTS:
+        raise Http404
+    try:
+        filtres = _filtres_export(request)
+    except ValueError:
+        messages.error(request, "Paramètres d'export invalides.")
+        return redirect('export_form')
+    
+    blocs = blocs_csv(nom, **filtres)
+    if isinstance(request, ASGIRequest):
+        blocs = blocs_async(blocs)
+    portee = '-'.join(f'{cle}-{valeur}' for cle, valeur in filtres.items() if valeur is not None)
+    response = StreamingHttpResponse(blocs, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom}{"-" + portee if portee else ""}.csv"'
+    return response
+
+@require_login('admin')
+@require_POST
+def export_tache(request, nom):
+    """Same export written to a file by a background worker, downloaded from the job page once done"""
+    if nom not in EXPORTS:
+        raise Http404
+    try:
+        filtres = _filtres_export(request)
+    except ValueError:
+        messages.error(request, "Paramètres d'export invalides.")
+        return redirect('export_form')
+    tache = enfiler('exporter_csv', export=nom, **{cle: valeur.isoformat() if isinstance(valeur, datetime.date)
+                                                   else valeur for cle, valeur in filtres.items()})
+    messages.success(request, f'Export des {nom} mis en file (tâche n°{tache.pk}).')
+    return redirect('taches_list')
+
+# Imports
+@require_login('admin')
+def import_csv(request):
+    """Upload a CSV of departments, students, teachers or grades; uploading the same file again resumes it"""
+    if request.method == 'POST':
+        type_import = request.POST.get('type_import')
+        fichier = request.FILES.get('fichier')
+        if type_import not in IMPORTS or fichier is None:
+            messages.error(request, 'Choisissez un type d\'import et un fichier CSV.')
+            return redirect('import_csv')
+        
+        execution = demarrer(type_import, fichier.name, fichier.file)
+        if execution.statut == 'termine':
+            messages.warning(request, f'Ce fichier a déjà été importé : {execution.message}')
+            return redirect('import_csv')
+        tache = en_file('importer_csv', import_csv=execution.pk)
+        if tache is not None:
+            messages.warning(request, f'Ce fichier est déjà en cours d\'import (tâche n°{tache.pk}).')
+            return redirect('taches_list')
+        
+        # The worker reads the file from disk; the import itself runs outside the request
+        chemin = Path(settings.TACHES_DIR) / 'imports' / f'{execution.type_import}-{execution.empreinte}.csv'
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        with open(chemin, 'wb') as copie:
+            for morceau in fichier.chunks():
+                copie.write(morceau)
+        tache = enfiler('importer_csv', import_csv=execution.pk, chemin=str(chemin))
+        messages.success(request, f'Import de {fichier.name} mis en file (tâche n°{tache.pk}).')
+        return redirect('taches_list')
+    
+    return render(request, 'import_csv.html', {
+        'imports': {nom: importateur.colonnes for nom, importateur in IMPORTS.items()},
+        'executions': ImportCsv.objects.order_by('-date_debut')[:20],
+        'user_type': 'admin'
+    })
+
+# Background jobs
+# Jobs an administrator may start by hand from the jobs page
+TACHES_MANUELLES = ['reconstruire_statistiques', 'actualiser_cumuls_presence']
+
+def _etat_tache(tache):
+    etat = {
+        'id': tache.pk,
+        'nom': tache.nom,
+        'libelle': libelle(tache.nom),
+        'statut': tache.statut,
+        'statut_libelle': tache.get_statut_display(),
+        'fait': tache.fait,
+        'total': tache.total,
+        'pourcentage': tache.pourcentage(),
+        'message': tache.message,
+        'tentatives': tache.tentatives,
+        'active': tache.active(),
+    }
+    if tache.statut == 'terminee' and (tache.resultat or {}).get('fichier'):
+        etat['fichier'] = reverse('tache_fichier', args=[tache.pk])
+    return etat
+
+@require_login('admin')
+def taches_list(request):
+    """Latest background jobs with their progress; the active ones are refreshed by polling tache_statut"""
+    if request.method == 'POST':
+        nom = request.POST.get('nom')
+        if nom not in TACHES_MANUELLES:
+            raise Http404
+        tache = en_file(nom)
+        if tache is not None:
+            messages.warning(request, f'{libelle(nom)} : déjà en file (tâche n°{tache.pk}).')
+        else:
+            tache = enfiler(nom)
+            messages.success(request, f'{libelle(nom)} : mise en file (tâche n°{tache.pk}).')
+        return redirect('taches_list')
+    
+    return render(request, 'taches.html', {
+        'taches': [_etat_tache(tache) for tache in Tache.objects.order_by('-id')[:50]],
+        'manuelles': [(nom, TACHES[nom].libelle) for nom in TACHES_MANUELLES],
+        'user_type': 'admin'
+    })
+
+@require_login('admin')
+@cache_control(private=True, no_cache=True)
+def tache_statut(request, tache_id):
+    return JsonResponse(_etat_tache(get_object_or_404(Tache, pk=tache_id)))
+
+@require_login('admin')
+def tache_fichier(request, tache_id):
+    tache = get_object_or_404(Tache, pk=tache_id, statut='terminee')
+    nom = (tache.resultat or {}).get('fichier')
+    chemin = Path(settings.TACHES_DIR) / 'exports' / nom if nom else None
+    if chemin is None or not chemin.is_file():
+        raise Http404
+    return FileResponse(open(chemin, 'rb'), as_attachment=True, filename=nom, content_type='text/csv; charset=utf-8')
+
+# Teacher Dashboard
+@lecture_seule
+@require_login('enseignant')
+async def teacher_dashboard(request):
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
     
     is_responsable = hasattr(enseignant, 'departement_dirige') and enseignant.departement_dirige is not None
     
+    # Independent queries, awaited together
+    aujourd_hui = timezone.localdate()
+    matieres, nb_cours, nb_notes, assiduite = await asyncio.gather(
+        en_liste(enseignant.matieres.all()),
+        enseignant.cours_crees.acount(),
+        Notes.objects.filter(matiere__enseignant=enseignant).acount(),
+        sync_to_async(CumulPresence.totaux_par)(
+            'matiere', enseignant.matieres.all(), aujourd_hui - datetime.timedelta(days=29), aujourd_hui),
+    )
+    for matiere in matieres:
+        matiere.taux_absence = taux_absence(*assiduite.get(matiere.id, (0, 0)))
+    
     stats = {
-        'matieres': enseignant.matieres.count(),
-        'cours': enseignant.cours_crees.count(),
-        'notes': Notes.objects.filter(matiere__enseignant=enseignant).count(),
+        'matieres': len(matieres),
+        'cours': nb_cours,
+        'notes': nb_notes,
     }
     
     context = {
         'utilisateur': utilisateur,
         'user_type': 'enseignant',
         'enseignant': enseignant,
+        'matieres': matieres,
         'is_responsable': is_responsable,
         'stats': stats
     }
@@ -111,75 +389,64 @@ def teacher_dashboard(request):
     return render(request, 'teacher_dashboard.html', context)
 
 # Student Dashboard
-def student_dashboard(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'eleve':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+@lecture_seule
+@require_login('eleve')
+async def student_dashboard(request):
+    utilisateur = request.utilisateur
     eleve = utilisateur.eleve
     
-    notes = eleve.notes_set.all()
-    matieres = set(note.matiere for note in notes)
+    notes = eleve.notes_set.select_related('matiere')
+    
+    # Independent queries, awaited together
+    nb_matieres, nb_notes, moyenne_generale, heures_absence, recent_notes, recent_absences = await asyncio.gather(
+        eleve.inscriptions.acount(),
+        notes.acount(),
+        sync_to_async(StatistiqueNotes.moyenne_de)('eleve', eleve),
+        sync_to_async(eleve.calculerHeuresAbsence)(),
+        en_liste(notes.order_by('-id')[:5]),
+        en_liste(eleve.presences.filter(present=False).select_related('matiere')[:5]),
+    )
     
     stats = {
-        'matieres': len(matieres),
-        'notes': notes.count(),
+        'matieres': nb_matieres,
+        'notes': nb_notes,
     }
     
     context = {
         'utilisateur': utilisateur,
         'user_type': 'eleve',
         'eleve': eleve,
-        'moyenne_generale': eleve.calculerMoyenneGenerale(),
-        'heures_absence': eleve.calculerHeuresAbsence(),
+        'moyenne_generale': moyenne_generale,
+        'heures_absence': heures_absence,
         'stats': stats,
-        'recent_notes': notes.order_by('-id')[:5],
-        'recent_absences': eleve.presences.filter(present=False)[:5],
+        'recent_notes': recent_notes,
+        'recent_absences': recent_absences,
     }
     
     return render(request, 'student_dashboard.html', context)
 
-# Helper function for login requirement
-def require_login(user_type=None):
-    def decorator(view_func):
-        def wrapper(request, *args, **kwargs):
-            if 'user_id' not in request.session:
-                return redirect('login')
-            if user_type and request.session.get('user_type') != user_type:
-                messages.error(request, 'Accès non autorisé.')
-                return redirect('login')
-            return view_func(request, *args, **kwargs)
-        return wrapper
-    return decorator
-
 # ============= ADMIN VIEWS =============
 
 # College Management
+@lecture_seule
+@require_login('admin')
 def college_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
-    colleges = College.objects.all()
-    items = []
-    for college in colleges:
-        items.append({
+    def ligne(college):
+        return {
             'values': [college.nom, college.adresse, college.telephone, college.academie.nom],
             'edit_url': f'/manage/college/{college.id}/edit/',
             'delete_url': f'/manage/college/{college.id}/delete/'
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, College.objects.select_related('academie'), ['nom'], ligne, {
         'title': 'Liste des Collèges',
         'headers': ['Nom', 'Adresse', 'Téléphone', 'Académie'],
-        'items': items,
         'create_url': '/manage/college/create/',
         'user_type': 'admin'
     })
 
+@require_login('admin')
 def college_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
     if request.method == 'POST':
         nom = request.POST.get('nom')
         adresse = request.POST.get('adresse')
@@ -212,32 +479,26 @@ def college_create(request):
     })
 
 # Departement Management
+@lecture_seule
+@require_login('admin')
 def departement_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
-    departements = Departement.objects.all()
-    items = []
-    for dept in departements:
+    def ligne(dept):
         responsable_nom = str(dept.responsable.utilisateur) if dept.responsable else 'Non assigné'
-        items.append({
+        return {
             'values': [dept.nom, dept.code_departement, dept.college.nom, responsable_nom],
             'edit_url': f'/manage/departement/{dept.id}/edit/',
             'delete_url': f'/manage/departement/{dept.id}/delete/'
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, Departement.objects.select_related('college', 'responsable__utilisateur'), ['id'], ligne, {
         'title': 'Liste des Départements',
         'headers': ['Nom', 'Code', 'Collège', 'Responsable'],
-        'items': items,
         'create_url': '/manage/departement/create/',
         'user_type': 'admin'
     })
 
+@require_login('admin')
 def departement_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
     if request.method == 'POST':
         nom = request.POST.get('nom')
         code_departement = request.POST.get('code_departement')
@@ -254,15 +515,14 @@ def departement_create(request):
         return redirect('departement_list')
     
     colleges = College.objects.all()
-    enseignants = Enseignant.objects.all()
     
     form_fields = [
         {'name': 'nom', 'label': 'Nom du Département', 'type': 'text', 'required': True},
         {'name': 'code_departement', 'label': 'Code du Département', 'type': 'text', 'required': True},
         {'name': 'college', 'label': 'Collège', 'type': 'select', 'required': True,
          'options': [{'value': c.id, 'label': c.nom} for c in colleges]},
-        {'name': 'responsable', 'label': 'Responsable (optionnel)', 'type': 'select', 'required': False,
-         'options': [{'value': e.id, 'label': str(e.utilisateur)} for e in enseignants]},
+        {'name': 'responsable', 'label': 'Responsable (optionnel)', 'type': 'autocomplete', 'required': False,
+         'source': '/api/recherche/utilisateurs/?role=enseignant'},
     ]
     
     return render(request, 'form_generic.html', {
@@ -273,33 +533,29 @@ def departement_create(request):
     })
 
 # Matiere Management
+@lecture_seule
+@require_login('admin')
 def matiere_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
-    matieres = Matiere.objects.all()
-    items = []
-    for matiere in matieres:
+    def ligne(matiere):
         enseignant_nom = str(matiere.enseignant.utilisateur) if matiere.enseignant else 'Non assigné'
         salle_nom = str(matiere.salle) if matiere.salle else 'Non assignée'
-        items.append({
+        return {
             'values': [matiere.libelle, matiere.departement.nom, enseignant_nom, salle_nom],
             'edit_url': f'/manage/matiere/{matiere.id}/edit/',
-            'delete_url': f'/manage/matiere/{matiere.id}/delete/'
-        })
+            'delete_url': f'/manage/matiere/{matiere.id}/delete/',
+            'lien_url': reverse('matiere_inscriptions', args=[matiere.id]),
+            'lien_label': 'Inscriptions',
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, Matiere.objects.select_related('departement', 'enseignant__utilisateur', 'salle'), ['id'], ligne, {
         'title': 'Liste des Matières',
         'headers': ['Libellé', 'Département', 'Enseignant', 'Salle'],
-        'items': items,
         'create_url': '/manage/matiere/create/',
         'user_type': 'admin'
     })
 
+@require_login('admin')
 def matiere_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
     if request.method == 'POST':
         libelle = request.POST.get('libelle')
         departement_id = request.POST.get('departement')
@@ -316,15 +572,14 @@ def matiere_create(request):
         return redirect('matiere_list')
     
     departements = Departement.objects.all()
-    enseignants = Enseignant.objects.all()
     salles = Salle.objects.all()
     
     form_fields = [
         {'name': 'libelle', 'label': 'Libellé de la Matière', 'type': 'text', 'required': True},
         {'name': 'departement', 'label': 'Département', 'type': 'select', 'required': True,
          'options': [{'value': d.id, 'label': d.nom} for d in departements]},
-        {'name': 'enseignant', 'label': 'Enseignant (optionnel)', 'type': 'select', 'required': False,
-         'options': [{'value': e.id, 'label': str(e.utilisateur)} for e in enseignants]},
+        {'name': 'enseignant', 'label': 'Enseignant (optionnel)', 'type': 'autocomplete', 'required': False,
+         'source': '/api/recherche/utilisateurs/?role=enseignant'},
         {'name': 'salle', 'label': 'Salle (optionnelle)', 'type': 'select', 'required': False,
          'options': [{'value': s.id, 'label': str(s)} for s in salles]},
     ]
@@ -336,32 +591,58 @@ def matiere_create(request):
         'user_type': 'admin'
     })
 
+@require_login('admin')
+def matiere_inscriptions(request, matiere_id):
+    """Enroll a list of students, by identifiant, in one subject"""
+    matiere = get_object_or_404(Matiere, id=matiere_id)
+    if request.method == 'POST':
+        identifiants = set(request.POST.get('identifiants', '').replace(',', ' ').split())
+        eleves = dict(Eleve.objects.filter(utilisateur__identifiant__in=identifiants)
+                      .values_list('utilisateur__identifiant', 'id'))
+        inconnus = sorted(identifiants - eleves.keys())
+        if inconnus:
+            messages.error(request, f"Élève(s) introuvable(s) : {', '.join(inconnus[:20])}")
+        deja = set(matiere.inscriptions.filter(eleve_id__in=eleves.values()).values_list('eleve_id', flat=True))
+        Inscription.inscrire(matiere, eleves.values())
+        nouveaux = len(eleves) - len(deja)
+        if eleves:
+            messages.success(request, f'{nouveaux} élève(s) inscrit(s), {len(deja)} déjà inscrit(s).')
+        if not inconnus:
+            return redirect('matiere_list')
+    
+    form_fields = [
+        {'name': 'identifiants', 'label': "Identifiants des élèves (un par ligne, ou séparés par des virgules)",
+         'type': 'textarea', 'required': True, 'value': request.POST.get('identifiants', '')},
+    ]
+    
+    return render(request, 'form_generic.html', {
+        'title': f'Inscriptions - {matiere.libelle} ({matiere.inscriptions.count()} élève(s) inscrit(s))',
+        'form_fields': form_fields,
+        'submit_text': 'Inscrire',
+        'back_url': '/manage/matiere/',
+        'user_type': 'admin'
+    })
+
 # Salle Management
+@lecture_seule
+@require_login('admin')
 def salle_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
-    salles = Salle.objects.all()
-    items = []
-    for salle in salles:
-        items.append({
+    def ligne(salle):
+        return {
             'values': [salle.numero, salle.capacite],
             'edit_url': f'/manage/salle/{salle.id}/edit/',
             'delete_url': f'/manage/salle/{salle.id}/delete/'
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, Salle.objects.all(), ['id'], ligne, {
         'title': 'Liste des Salles',
         'headers': ['Numéro', 'Capacité'],
-        'items': items,
         'create_url': '/manage/salle/create/',
         'user_type': 'admin'
     })
 
+@require_login('admin')
 def salle_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'admin':
-        return redirect('login')
-    
     if request.method == 'POST':
         numero = request.POST.get('numero')
         capacite = request.POST.get('capacite')
@@ -385,35 +666,41 @@ def salle_create(request):
 # ============= TEACHER VIEWS =============
 
 # Cours Management (for teachers)
+@lecture_seule
+@require_login('enseignant')
 def cours_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
-    cours = enseignant.cours_crees.all()
     
-    items = []
-    for c in cours:
-        items.append({
+    def ligne(c):
+        return {
             'values': [c.titre, c.get_type_contenu_display(), c.matiere.libelle, c.date_creation.strftime('%d/%m/%Y')],
             'edit_url': f'/teacher/cours/{c.id}/edit/',
             'delete_url': f'/teacher/cours/{c.id}/delete/'
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, enseignant.cours_crees.select_related('matiere'), ['-date_creation', '-id'], ligne, {
         'title': 'Mes Cours et Exercices',
         'headers': ['Titre', 'Type', 'Matière', 'Date de création'],
-        'items': items,
         'create_url': '/teacher/cours/create/',
         'user_type': 'enseignant'
     })
 
+@lecture_seule
+@require_login('enseignant')
+def cours_detail(request, cours_id):
+    """One of the teacher's own courses"""
+    cours = get_object_or_404(Cours.objects.select_related('matiere', 'enseignant__utilisateur'),
+                              pk=cours_id, enseignant=request.utilisateur.enseignant)
+    return render(request, 'cours_detail.html', {
+        'cours': cours,
+        'retour_url': 'cours_list',
+        'user_type': 'enseignant'
+    })
+
+@require_login('enseignant')
 def cours_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
     
     if request.method == 'POST':
@@ -451,42 +738,46 @@ def cours_create(request):
     })
 
 # Notes Management (for teachers)
+@lecture_seule
+@require_login('enseignant')
 def notes_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
-    notes = Notes.objects.filter(matiere__enseignant=enseignant)
+    notes = Notes.objects.filter(matiere__enseignant=enseignant).select_related('eleve__utilisateur', 'matiere')
     
-    items = []
-    for note in notes:
-        items.append({
+    def ligne(note):
+        return {
             'values': [str(note.eleve.utilisateur), note.matiere.libelle, note.valeur],
             'edit_url': f'/teacher/notes/{note.id}/edit/',
             'delete_url': None
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, notes, ['-id'], ligne, {
         'title': 'Gestion des Notes',
         'headers': ['Élève', 'Matière', 'Note'],
-        'items': items,
         'create_url': '/teacher/notes/create/',
         'user_type': 'enseignant'
     })
 
+@require_login('enseignant')
 def notes_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
     
     if request.method == 'POST':
-        eleve_id = request.POST.get('eleve')
-        matiere_id = request.POST.get('matiere')
+        try:
+            # The autocomplete posts an empty eleve when no suggestion was picked
+            eleve_id = int(request.POST.get('eleve', ''))
+            matiere_id = int(request.POST.get('matiere', ''))
+        except ValueError:
+            messages.error(request, 'Choisissez une matière et un élève parmi les suggestions.')
+            return redirect('notes_create')
         valeur = request.POST.get('valeur')
         
+        if not Inscription.objects.filter(eleve_id=eleve_id, matiere_id=matiere_id, matiere__enseignant=enseignant).exists():
+            messages.error(request, "Cet élève n'est pas inscrit dans cette matière.")
+            return redirect('notes_create')
+        
         Notes.objects.update_or_create(
             eleve_id=eleve_id,
             matiere_id=matiere_id,
@@ -496,13 +787,12 @@ def notes_create(request):
         return redirect('notes_list')
     
     matieres = enseignant.matieres.all()
-    eleves = Eleve.objects.all()
     
     form_fields = [
-        {'name': 'eleve', 'label': 'Élève', 'type': 'select', 'required': True,
-         'options': [{'value': e.id, 'label': str(e.utilisateur)} for e in eleves]},
         {'name': 'matiere', 'label': 'Matière', 'type': 'select', 'required': True,
          'options': [{'value': m.id, 'label': m.libelle} for m in matieres]},
+        {'name': 'eleve', 'label': 'Élève', 'type': 'autocomplete', 'required': True,
+         'source': '/api/recherche/utilisateurs/?role=eleve', 'filtre': 'matiere'},
         {'name': 'valeur', 'label': 'Note (sur 20)', 'type': 'number', 'required': True},
     ]
     
@@ -513,62 +803,132 @@ def notes_create(request):
         'user_type': 'enseignant'
     })
 
+@require_login('enseignant')
+def notes_saisie(request, matiere_id):
+    """Gradebook grid: every student's grade for one subject, saved in a single bulk upsert"""
+    utilisateur = request.utilisateur
+    enseignant = utilisateur.enseignant
+    matiere = get_object_or_404(Matiere, id=matiere_id, enseignant=enseignant)
+    notes_actuelles = dict(matiere.notes_set.values_list('eleve_id', 'valeur'))
+    
+    saisies = {}
+    erreurs = {}
+    if request.method == 'POST':
+        for cle, brut in request.POST.items():
+            if not cle.startswith('note_') or not brut.strip():
+                continue
+            try:
+                eleve_id = int(cle[len('note_'):])
+            except ValueError:
+                continue
+            saisies[eleve_id] = brut.strip()
+            try:
+                valeur = float(brut.strip().replace(',', '.'))
+            except ValueError:
+                erreurs[eleve_id] = 'Note invalide'
+                continue
+            if not 0 <= valeur <= 20:
+                erreurs[eleve_id] = 'La note doit être comprise entre 0 et 20'
+        
+        valides = {eleve_id: float(brut.replace(',', '.')) for eleve_id, brut in saisies.items() if eleve_id not in erreurs}
+        existants = set(matiere.inscriptions.filter(eleve_id__in=valides.keys()).values_list('eleve_id', flat=True))
+        for eleve_id in valides.keys() - existants:
+            erreurs[eleve_id] = 'Élève non inscrit dans cette matière'
+        a_enregistrer = {
+            eleve_id: valeur for eleve_id, valeur in valides.items()
+            if eleve_id in existants and notes_actuelles.get(eleve_id) != valeur
+        }
+        
+        nombre = Notes.enregistrer_lot(matiere, a_enregistrer)
+        notes_actuelles.update(a_enregistrer)
+        if nombre:
+            messages.success(request, f'{nombre} note(s) enregistrée(s) avec succès!')
+        if not erreurs:
+            return redirect('notes_list')
+        messages.error(request, f'{len(erreurs)} note(s) refusée(s), voir le détail ci-dessous.')
+    
+    eleves = matiere.eleves.select_related('utilisateur').order_by('utilisateur__nom', 'utilisateur__prenom', 'id')
+    lignes = [{
+        'eleve_id': eleve.id,
+        'nom': str(eleve.utilisateur),
+        'actuelle': notes_actuelles.get(eleve.id),
+        'saisie': saisies.get(eleve.id, '') if eleve.id in erreurs else '',
+        'erreur': erreurs.get(eleve.id),
+    } for eleve in eleves]
+    
+    return render(request, 'notes_grille.html', {
+        'title': f'Saisie des notes - {matiere.libelle}',
+        'lignes': lignes,
+        'back_url': '/teacher/notes/',
+        'user_type': 'enseignant'
+    })
+
 # Presence Management (for teachers)
+@lecture_seule
+@require_login('enseignant')
 def presence_list(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
-    presences = enseignant.presences_marquees.all()[:50]
+    presences = enseignant.presences_marquees.select_related('eleve__utilisateur', 'matiere')
     
-    items = []
-    for p in presences:
+    def ligne(p):
         status = 'Présent' if p.present else 'Absent'
-        items.append({
+        return {
             'values': [str(p.eleve.utilisateur), p.matiere.libelle, p.date.strftime('%d/%m/%Y'), status],
             'edit_url': None,
             'delete_url': None
-        })
+        }
     
-    return render(request, 'list_generic.html', {
+    return lister(request, presences, ['-date', '-id'], ligne, {
         'title': 'Gestion des Présences',
         'headers': ['Élève', 'Matière', 'Date', 'Statut'],
-        'items': items,
         'create_url': '/teacher/presence/create/',
         'user_type': 'enseignant'
     })
 
+@require_login('enseignant')
 def presence_create(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
     
     if request.method == 'POST':
-        eleve_id = request.POST.get('eleve')
-        matiere_id = request.POST.get('matiere')
-        date = request.POST.get('date')
+        try:
+            # The autocomplete posts an empty eleve when no suggestion was picked
+            eleve_id = int(request.POST.get('eleve', ''))
+            matiere_id = int(request.POST.get('matiere', ''))
+        except ValueError:
+            messages.error(request, 'Choisissez une matière et un élève parmi les suggestions.')
+            return redirect('presence_create')
+        try:
+            date = datetime.date.fromisoformat(request.POST.get('date', ''))
+        except ValueError:
+            messages.error(request, 'Date invalide.')
+            return redirect('presence_create')
         present = request.POST.get('present') == 'true'
         
-        Presence.objects.update_or_create(
-            eleve_id=eleve_id,
-            matiere_id=matiere_id,
-            date=date,
-            defaults={'present': present, 'enseignant': enseignant}
-        )
+        if not Inscription.objects.filter(eleve_id=eleve_id, matiere_id=matiere_id, matiere__enseignant=enseignant).exists():
+            messages.error(request, "Cet élève n'est pas inscrit dans cette matière.")
+            return redirect('presence_create')
+        
+        # The rollups commit with the row, as in Presence.enregistrer_appel
+        with transaction.atomic():
+            Presence.objects.update_or_create(
+                eleve_id=eleve_id,
+                matiere_id=matiere_id,
+                date=date,
+                defaults={'present': present, 'enseignant': enseignant}
+            )
+            CumulPresence.recalculer([(eleve_id, matiere_id, date)])
         messages.success(request, 'Présence enregistrée avec succès!')
         return redirect('presence_list')
     
     matieres = enseignant.matieres.all()
-    eleves = Eleve.objects.all()
     
     form_fields = [
-        {'name': 'eleve', 'label': 'Élève', 'type': 'select', 'required': True,
-         'options': [{'value': e.id, 'label': str(e.utilisateur)} for e in eleves]},
         {'name': 'matiere', 'label': 'Matière', 'type': 'select', 'required': True,
          'options': [{'value': m.id, 'label': m.libelle} for m in matieres]},
+        {'name': 'eleve', 'label': 'Élève', 'type': 'autocomplete', 'required': True,
+         'source': '/api/recherche/utilisateurs/?role=eleve', 'filtre': 'matiere'},
         {'name': 'date', 'label': 'Date', 'type': 'date', 'required': True},
         {'name': 'present', 'label': 'Présence', 'type': 'select', 'required': True,
          'options': [{'value': 'true', 'label': 'Présent'}, {'value': 'false', 'label': 'Absent'}]},
@@ -581,32 +941,135 @@ def presence_create(request):
         'user_type': 'enseignant'
     })
 
+@require_login('enseignant')
+def presence_appel(request, matiere_id):
+    """Roll call: mark the whole student list for one subject and date (everyone present by default)"""
+    utilisateur = request.utilisateur
+    enseignant = utilisateur.enseignant
+    matiere = get_object_or_404(Matiere, id=matiere_id, enseignant=enseignant)
+    
+    if request.method == 'POST':
+        try:
+            date = datetime.date.fromisoformat(request.POST.get('date', ''))
+        except ValueError:
+            messages.error(request, 'Date invalide.')
+            return redirect('presence_appel', matiere_id=matiere.id)
+        
+        eleve_ids = set()
+        for valeur in request.POST.getlist('eleves'):
+            if valeur.isdigit():
+                eleve_ids.add(int(valeur))
+        eleve_ids = set(matiere.inscriptions.filter(eleve_id__in=eleve_ids).values_list('eleve_id', flat=True))
+        presences = {eleve_id: f'present_{eleve_id}' in request.POST for eleve_id in eleve_ids}
+        
+        nombre = Presence.enregistrer_appel(matiere, date, enseignant, presences)
+        absents = sum(1 for present in presences.values() if not present)
+        messages.success(request, f'Appel enregistré: {nombre} élève(s), {absents} absent(s).')
+        return redirect('presence_list')
+    
+    try:
+        date = datetime.date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        date = timezone.localdate()
+    deja_saisies = dict(matiere.presences.filter(date=date).values_list('eleve_id', 'present'))
+    eleves = matiere.eleves.select_related('utilisateur').order_by('utilisateur__nom', 'utilisateur__prenom', 'id')
+    lignes = [{
+        'eleve_id': eleve.id,
+        'nom': str(eleve.utilisateur),
+        'present': deja_saisies.get(eleve.id, True),
+    } for eleve in eleves]
+    
+    return render(request, 'presence_appel.html', {
+        'title': f'Appel - {matiere.libelle}',
+        'date': date,
+        'deja_fait': bool(deja_saisies),
+        'lignes': lignes,
+        'back_url': '/teacher/presence/',
+        'user_type': 'enseignant'
+    })
+
+def taux_absence(presents, absences):
+    """Share of absences in percent, None when nothing was recorded"""
+    total = presents + absences
+    return round(100 * absences / total, 1) if total else None
+
+@lecture_seule
+@require_login('enseignant')
+def absences_rapport(request):
+    """Weekly presences/absences of the teacher's subjects, read from the attendance rollups"""
+    utilisateur = request.utilisateur
+    enseignant = utilisateur.enseignant
+    
+    aujourd_hui = timezone.localdate()
+    try:
+        du = _parametre(request, 'du', datetime.date.fromisoformat) or aujourd_hui - datetime.timedelta(weeks=7)
+        au = _parametre(request, 'au', datetime.date.fromisoformat) or aujourd_hui
+    except ValueError:
+        messages.error(request, "Dates invalides.")
+        du, au = aujourd_hui - datetime.timedelta(weeks=7), aujourd_hui
+    # Whole weeks only: the report reads the weekly rows as they are
+    du -= datetime.timedelta(days=du.weekday())
+    au += datetime.timedelta(days=6 - au.weekday())
+    
+    matieres = {m.id: m for m in enseignant.matieres.all()}
+    semaines = (CumulPresence.objects
+                .filter(portee='matiere', periode='semaine', objet_id__in=list(matieres), debut__range=(du, au))
+                .order_by('objet_id', 'debut'))
+    totaux = defaultdict(lambda: [0, 0])
+    lignes = []
+    for semaine in semaines:
+        totaux[semaine.objet_id][0] += semaine.presents
+        totaux[semaine.objet_id][1] += semaine.absences
+        lignes.append({
+            'matiere': matieres[semaine.objet_id].libelle,
+            'semaine': semaine.debut,
+            'presents': semaine.presents,
+            'absences': semaine.absences,
+            'taux': taux_absence(semaine.presents, semaine.absences),
+        })
+    synthese = [{
+        'matiere': matiere.libelle,
+        'presents': totaux[matiere.id][0],
+        'absences': totaux[matiere.id][1],
+        'taux': taux_absence(*totaux[matiere.id]),
+    } for matiere in matieres.values()]
+    
+    return render(request, 'absences_rapport.html', {
+        'du': du,
+        'au': au,
+        'synthese': synthese,
+        'lignes': lignes,
+        'user_type': 'enseignant'
+    })
+
 # Department Statistics (for department heads)
+@lecture_seule
+@require_login('enseignant')
 def departement_stats(request, dept_id):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'enseignant':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+    utilisateur = request.utilisateur
     enseignant = utilisateur.enseignant
-    departement = get_object_or_404(Departement, id=dept_id, responsable=enseignant)
+    departement = get_object_or_404(
+        Departement.objects.select_related('college').annotate(nb_enseignants=Count('enseignants')),
+        id=dept_id, responsable=enseignant)
     
-    moyenne = departement.calculerMoyenneDepartement()
+    stats = statistiques_departement(departement)
     
     return render(request, 'departement_stats.html', {
         'departement': departement,
-        'moyenne': moyenne,
+        'stats': stats,
+        'tableaux': [('Par matière', stats['matieres']), ('Par enseignant', stats['enseignants'])],
+        'entetes': ['', 'Notes', 'Moyenne', 'Médiane', 'Écart-type', 'Quartiles', 'Réussite', 'Répartition'],
         'user_type': 'enseignant'
     })
 
 # ============= STUDENT VIEWS =============
 
-def student_notes(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'eleve':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+@lecture_seule
+@require_login('eleve')
+async def student_notes(request):
+    utilisateur = request.utilisateur
     eleve = utilisateur.eleve
-    notes = eleve.notes_set.all()
+    notes = await apaginer(request, eleve.notes_set.select_related('matiere__enseignant__utilisateur'), ['id'])
     
     items = []
     for note in notes:
@@ -620,17 +1083,17 @@ def student_notes(request):
         'title': 'Mes Notes',
         'headers': ['Matière', 'Note', 'Enseignant'],
         'items': items,
+        'page': notes,
         'create_url': None,
         'user_type': 'eleve'
     })
 
-def student_presences(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'eleve':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+@lecture_seule
+@require_login('eleve')
+async def student_presences(request):
+    utilisateur = request.utilisateur
     eleve = utilisateur.eleve
-    presences = eleve.presences.all()[:50]
+    presences = await apaginer(request, eleve.presences.select_related('matiere'), ['-date', '-id'])
     
     items = []
     for p in presences:
@@ -645,24 +1108,19 @@ def student_presences(request):
         'title': 'Mes Présences',
         'headers': ['Matière', 'Date', 'Statut'],
         'items': items,
+        'page': presences,
         'create_url': None,
         'user_type': 'eleve'
     })
 
-def student_cours(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'eleve':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+@lecture_seule
+@require_login('eleve')
+async def student_cours(request):
+    utilisateur = request.utilisateur
     eleve = utilisateur.eleve
     
-    # Get all subjects for this student (subjects where they have notes)
-    matieres = set(note.matiere for note in eleve.notes_set.all())
-    
-    # Get all cours for these subjects
-    cours_list = []
-    for matiere in matieres:
-        cours_list.extend(matiere.cours_set.all())
+    # Get all cours for the subjects this student is enrolled in
+    cours_list = await apaginer(request, Cours.objects.filter(matiere__inscriptions__eleve=eleve).select_related('matiere'), ['-date_creation', '-id'])
     
     items = []
     for c in cours_list:
@@ -676,19 +1134,33 @@ def student_cours(request):
         'title': 'Cours et Exercices',
         'headers': ['Titre', 'Type', 'Matière', 'Date'],
         'items': items,
+        'page': cours_list,
         'create_url': None,
         'user_type': 'eleve'
     })
 
-def student_schedule(request):
-    if 'user_id' not in request.session or request.session.get('user_type') != 'eleve':
-        return redirect('login')
-    
-    utilisateur = get_object_or_404(Utilisateur, id=request.session['user_id'])
+@lecture_seule
+@require_login('eleve')
+async def student_cours_detail(request, cours_id):
+    """A course of one of the subjects the student is enrolled in"""
+    cours = await (Cours.objects.filter(pk=cours_id, matiere__inscriptions__eleve=request.utilisateur.eleve)
+                   .select_related('matiere', 'enseignant__utilisateur').afirst())
+    if cours is None:
+        raise Http404
+    return render(request, 'cours_detail.html', {
+        'cours': cours,
+        'retour_url': 'student_cours',
+        'user_type': 'eleve'
+    })
+
+@lecture_seule
+@require_login('eleve')
+async def student_schedule(request):
+    utilisateur = request.utilisateur
     eleve = utilisateur.eleve
     
     # Get all subjects for this student
-    matieres = set(note.matiere for note in eleve.notes_set.all())
+    matieres = await apaginer(request, eleve.matieres.select_related('enseignant__utilisateur', 'salle'), ['id'])
     
     items = []
     for matiere in matieres:
@@ -704,8 +1176,210 @@ def student_schedule(request):
         'title': 'Mon Emploi du Temps',
         'headers': ['Matière', 'Enseignant', 'Salle'],
         'items': items,
+        'page': matieres,
         'create_url': None,
         'user_type': 'eleve'
     })
 
 
+
+# Course search (students: their subjects, teachers: their courses)
+@lecture_seule
+@require_login()
+def cours_recherche(request):
+    utilisateur = request.utilisateur
+    user_type = request.session.get('user_type')
+    if user_type == 'enseignant':
+        portee = {'enseignant': utilisateur.enseignant}
+    elif user_type == 'eleve':
+        portee = {'eleve': utilisateur.eleve}
+    else:
+        messages.error(request, 'La recherche de cours est réservée aux enseignants et aux élèves.')
+        return redirect(DASHBOARDS[user_type])
+
+    terme = request.GET.get('q', '').strip()
+    resultats = rechercher_cours(terme, **portee) if terme else []
+    for c in resultats:
+        c.url = reverse('cours_detail' if user_type == 'enseignant' else 'student_cours_detail', args=[c.id])
+    return render(request, 'cours_recherche.html', {
+        'terme': terme,
+        'resultats': resultats,
+        'retour_url': 'teacher_dashboard' if user_type == 'enseignant' else 'student_dashboard',
+        'user_type': user_type
+    })
+
+# Search API
+LIMITE_RECHERCHE = 20
+LIMITE_RECHERCHE_MAX = 50
+
+@lecture_seule
+@require_login()
+def recherche_utilisateurs(request):
+    """Type-ahead JSON for the autocomplete fields: prefix search on nom/prenom/identifiant"""
+    utilisateur = request.utilisateur
+    role = request.GET.get('role', 'eleve')
+    try:
+        limite = min(max(int(request.GET.get('limit', LIMITE_RECHERCHE)), 1), LIMITE_RECHERCHE_MAX)
+    except ValueError:
+        limite = LIMITE_RECHERCHE
+
+    # Admins look up teachers and students, teachers only students
+    if role not in ('eleve', 'enseignant') or a_le_role(utilisateur, 'eleve') or (
+            role == 'enseignant' and not a_le_role(utilisateur, 'admin')):
+        return JsonResponse({'erreur': 'Recherche non autorisée'}, status=403)
+
+    profils = (Eleve if role == 'eleve' else Enseignant).objects.filter(
+        utilisateur__in=Utilisateur.rechercher(request.GET.get('q', ''))
+    )
+    matiere_id = request.GET.get('matiere')
+    if matiere_id:
+        try:
+            matiere_id = int(matiere_id)
+        except ValueError:
+            return JsonResponse({'erreur': 'Paramètre matiere invalide'}, status=400)
+    if matiere_id and role == 'eleve':
+        filtres = {'id': matiere_id} if a_le_role(utilisateur, 'admin') else {'id': matiere_id, 'enseignant': utilisateur.enseignant}
+        matiere = get_object_or_404(Matiere, **filtres)
+        profils = profils.filter(inscriptions__matiere=matiere)
+    elif role == 'eleve' and not a_le_role(utilisateur, 'admin'):
+        # Students enrolled in at least one of the teacher's subjects
+        profils = profils.filter(id__in=Inscription.objects.filter(
+            matiere__enseignant=utilisateur.enseignant).values('eleve_id'))
+
+    profils = profils.select_related('utilisateur').order_by('utilisateur__nom', 'utilisateur__prenom', 'id')[:limite]
+    return JsonResponse({'resultats': [
+        {'id': p.id, 'label': f'{p.utilisateur} ({p.utilisateur.identifiant})'} for p in profils
+    ]})
+
+
+# Student JSON API
+API_VERSION = 1
+
+def _version_matieres(eleve_id):
+    """Enrolments and edits of the subjects, their teachers and rooms: part of every resource, which all name them"""
+    return tuple(Inscription.objects.filter(eleve_id=eleve_id).aggregate(
+        n=Count('id'), dernier=Max('id'), modifie_le=Max('matiere__modifie_le'),
+        enseignants=Max('matiere__enseignant__utilisateur__modifie_le'),
+        salles=Max('matiere__salle__modifie_le')).values())
+
+# Version of each resource from aggregates over indexes, without loading its rows.
+VERSIONS_API = {
+    # StatistiqueNotes is touched on every grade added, changed or removed
+    'notes': lambda eleve_id: (StatistiqueNotes.objects.filter(portee='eleve', objet_id=eleve_id)
+                               .values_list('nombre', 'somme', 'modifie_le').first()),
+    'presences': lambda eleve_id: tuple(Presence.objects.filter(eleve_id=eleve_id).aggregate(
+        n=Count('id'), modifie_le=Max('modifie_le')).values()),
+    'cours': lambda eleve_id: tuple(Cours.objects.filter(matiere__inscriptions__eleve_id=eleve_id).aggregate(
+        n=Count('id'), dernier=Max('id'), modifie_le=Max('date_modification')).values()),
+    'emploi_du_temps': lambda eleve_id: None,
+}
+
+def _version_matieres_enseignant(enseignant_id):
+    """The teacher's subjects, their edits and the names of their students: part of every teacher resource"""
+    return (
+        tuple(Matiere.objects.filter(enseignant_id=enseignant_id).aggregate(
+            n=Count('id'), dernier=Max('id'), modifie_le=Max('modifie_le')).values()),
+        tuple(Inscription.objects.filter(matiere__enseignant_id=enseignant_id).aggregate(
+            n=Count('id'), eleves=Max('eleve__utilisateur__modifie_le')).values()),
+    )
+
+# Same scheme for a teacher's resources, keyed by enseignant_id
+VERSIONS_API_ENSEIGNANT = {
+    # One StatistiqueNotes row per subject, touched on every grade of that subject
+    'notes': lambda enseignant_id: tuple(StatistiqueNotes.objects.filter(
+        portee='matiere', objet_id__in=Matiere.objects.filter(enseignant_id=enseignant_id).values('id'))
+        .aggregate(n=Count('id'), nombre=Sum('nombre'), somme=Sum('somme'), modifie_le=Max('modifie_le')).values()),
+    'presences': lambda enseignant_id: tuple(Presence.objects.filter(enseignant_id=enseignant_id).aggregate(
+        n=Count('id'), modifie_le=Max('modifie_le')).values()),
+    'cours': lambda enseignant_id: tuple(Cours.objects.filter(enseignant_id=enseignant_id).aggregate(
+        n=Count('id'), dernier=Max('id'), modifie_le=Max('date_modification')).values()),
+}
+
+# role -> (resource versions, version shared by all its resources)
+_VERSIONS_PAR_ROLE = {
+    'eleve': (VERSIONS_API, _version_matieres),
+    'enseignant': (VERSIONS_API_ENSEIGNANT, _version_matieres_enseignant),
+}
+
+def etag_api(ressource, role='eleve'):
+    """Strong ETag of a user's resource: a changed version changes the tag, an unchanged one answers 304"""
+    versions, version_matieres = _VERSIONS_PAR_ROLE[role]
+    prefixe = ressource if role == 'eleve' else f"{role}-{ressource}"
+
+    def etag(request, *args, **kwargs):
+        objet_id = getattr(request.utilisateur, role).pk
+        version = repr((versions[ressource](objet_id), version_matieres(objet_id)))
+        return f"v{API_VERSION}-{prefixe}-{objet_id}-{hashlib.sha256(version.encode()).hexdigest()[:24]}"
+    return etag
+
+def _api(ressource, role):
+    def decorator(view_func):
+        view_func = condition(etag_func=etag_api(ressource, role))(view_func)
+        view_func = cache_control(private=True, no_cache=True)(view_func)
+        return lecture_seule(require_login(role)(view_func))
+    return decorator
+
+def api_eleve(ressource):
+    """Session-authenticated student endpoint revalidated with If-None-Match on every poll"""
+    return _api(ressource, 'eleve')
+
+def api_enseignant(ressource):
+    """Teacher counterpart of api_eleve"""
+    return _api(ressource, 'enseignant')
+
+@api_eleve('notes')
+def api_notes(request):
+    eleve = request.utilisateur.eleve
+    notes = eleve.notes_set.order_by('matiere__libelle', 'id').values(
+        'id', 'valeur', 'matiere_id', matiere_libelle=F('matiere__libelle'),
+        enseignant_prenom=F('matiere__enseignant__utilisateur__prenom'),
+        enseignant_nom=F('matiere__enseignant__utilisateur__nom'))
+    return JsonResponse({'version': API_VERSION, 'notes': list(notes)})
+
+@api_eleve('presences')
+def api_presences(request):
+    eleve = request.utilisateur.eleve
+    presences = eleve.presences.order_by('-date', '-id').values(
+        'id', 'date', 'present', 'matiere_id', matiere_libelle=F('matiere__libelle'))
+    return JsonResponse({'version': API_VERSION, 'presences': list(presences)})
+
+@api_eleve('cours')
+def api_cours(request):
+    eleve = request.utilisateur.eleve
+    cours = (Cours.objects.filter(matiere__inscriptions__eleve=eleve).order_by('-date_creation', '-id')
+             .values('id', 'titre', 'type_contenu', 'contenu', 'date_creation', 'date_modification',
+                     'matiere_id', matiere_libelle=F('matiere__libelle')))
+    return JsonResponse({'version': API_VERSION, 'cours': list(cours)})
+
+@api_eleve('emploi_du_temps')
+def api_emploi_du_temps(request):
+    eleve = request.utilisateur.eleve
+    matieres = eleve.matieres.order_by('libelle', 'id').values(
+        'id', 'libelle', salle_numero=F('salle__numero'),
+        enseignant_prenom=F('enseignant__utilisateur__prenom'), enseignant_nom=F('enseignant__utilisateur__nom'))
+    return JsonResponse({'version': API_VERSION, 'matieres': list(matieres)})
+
+# Teacher JSON API
+@api_enseignant('cours')
+def api_enseignant_cours(request):
+    enseignant = request.utilisateur.enseignant
+    cours = (enseignant.cours_crees.order_by('-date_creation', '-id')
+             .values('id', 'titre', 'type_contenu', 'contenu', 'date_creation', 'date_modification',
+                     'matiere_id', matiere_libelle=F('matiere__libelle')))
+    return JsonResponse({'version': API_VERSION, 'cours': list(cours)})
+
+@api_enseignant('notes')
+def api_enseignant_notes(request):
+    enseignant = request.utilisateur.enseignant
+    notes = (Notes.objects.filter(matiere__enseignant=enseignant).order_by('matiere__libelle', 'matiere_id', 'id')
+             .values('id', 'valeur', 'matiere_id', 'eleve_id', matiere_libelle=F('matiere__libelle'),
+                     eleve_prenom=F('eleve__utilisateur__prenom'), eleve_nom=F('eleve__utilisateur__nom')))
+    return JsonResponse({'version': API_VERSION, 'notes': list(notes)})
+
+@api_enseignant('presences')
+def api_enseignant_presences(request):
+    enseignant = request.utilisateur.enseignant
+    presences = (enseignant.presences_marquees.order_by('-date', '-id')
+                 .values('id', 'date', 'present', 'matiere_id', 'eleve_id', matiere_libelle=F('matiere__libelle'),
+                         eleve_prenom=F('eleve__utilisateur__prenom'), eleve_nom=F('eleve__utilisateur__nom')))
+    return JsonResponse({'version': API_VERSION, 'presences': list(presences)})
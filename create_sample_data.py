@@ -8,7 +8,7 @@ django.setup()
 
 from core.models import (
     Utilisateur, Administrateur, Academie, College, Departement,
-    Enseignant, Salle, Matiere, Eleve, Notes, Cours, Presence
+    Enseignant, Salle, Matiere, Eleve, Inscription, Notes, Cours, Presence, CumulPresence
 )
 
 def create_sample_data():
@@ -184,6 +184,12 @@ def create_sample_data():
     )
     print(f"✓ Created students")
     
+    # Enroll students in their subjects
+    for student in (student1, student2, student3):
+        for matiere in (matiere1, matiere2, matiere3, matiere4):
+            Inscription.objects.create(eleve=student, matiere=matiere)
+    print(f"✓ Created enrollments")
+    
     # Create Course Content
     cours1 = Cours.objects.create(
         titre="Introduction à l'algèbre",
@@ -258,6 +264,7 @@ def create_sample_data():
             present=(i % 2 == 0),  # Absent every other day
             enseignant=teacher2
         )
+    CumulPresence.actualiser()
     print(f"✓ Created attendance records")
     
     print("\n" + "="*50)
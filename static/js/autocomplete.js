@@ -0,0 +1,78 @@
+// Type-ahead for the 'autocomplete' fields of form_generic.html.
+// The visible input queries data-autocomplete (the search API) and fills its datalist;
+// picking a suggestion copies the profile id into the hidden input that is actually posted.
+// data-filtre names another field (e.g. the subject select) whose value is sent along and
+// resets the choice when it changes.
+(function () {
+    const DELAI = 200;
+    const LONGUEUR_MIN = 2;
+
+    document.querySelectorAll('input[data-autocomplete]').forEach(function (champ) {
+        const cible = document.getElementById(champ.dataset.cible);
+        const liste = document.getElementById(champ.getAttribute('list'));
+        const filtre = champ.dataset.filtre ? document.getElementById(champ.dataset.filtre) : null;
+        const ids = new Map();
+        let minuterie = null;
+        let requete = null;
+
+        function rechercher() {
+            const q = champ.value.trim();
+            if (q.length < LONGUEUR_MIN) {
+                return;
+            }
+            if (requete) {
+                requete.abort();
+            }
+            requete = new AbortController();
+            const url = new URL(champ.dataset.autocomplete, window.location.origin);
+            url.searchParams.set('q', q);
+            if (filtre && filtre.value) {
+                url.searchParams.set(filtre.name, filtre.value);
+            }
+            fetch(url, {signal: requete.signal, headers: {'Accept': 'application/json'}})
+                .then(function (reponse) { return reponse.ok ? reponse.json() : {resultats: []}; })
+                .then(function (donnees) {
+                    // A late response must not drop the suggestion picked meanwhile
+                    const choisi = ids.get(champ.value);
+                    ids.clear();
+                    liste.replaceChildren();
+                    donnees.resultats.forEach(function (resultat) {
+                        ids.set(resultat.label, resultat.id);
+                        const option = document.createElement('option');
+                        option.value = resultat.label;
+                        liste.appendChild(option);
+                    });
+                    if (choisi !== undefined && !ids.has(champ.value)) {
+                        ids.set(champ.value, choisi);
+                    }
+                    selectionner();
+                })
+                .catch(function () {});
+        }
+
+        function selectionner() {
+            const id = ids.get(champ.value);
+            cible.value = id === undefined ? '' : id;
+            champ.setCustomValidity(champ.value && id === undefined ? 'Choisissez une proposition de la liste' : '');
+        }
+
+        champ.addEventListener('input', function () {
+            selectionner();
+            clearTimeout(minuterie);
+            // Picking a suggestion also fires 'input': its label needs no new search
+            if (ids.has(champ.value)) {
+                return;
+            }
+            minuterie = setTimeout(rechercher, DELAI);
+        });
+
+        if (filtre) {
+            filtre.addEventListener('change', function () {
+                champ.value = '';
+                ids.clear();
+                liste.replaceChildren();
+                selectionner();
+            });
+        }
+    });
+})();
@@ -0,0 +1,60 @@
+// Background jobs.
+// Export page: buttons with data-jeton post the (GET) export form to queue a job; the CSRF token
+// is added only then, so it never ends up in the URL of a streamed download.
+// Jobs page: rows with data-statut (the job status API) are polled while the job is pending or
+// running, and the page reloads once they are all finished to show results and download links.
+(function () {
+    const INTERVALLE = 2000;
+
+    document.querySelectorAll('button[data-jeton]').forEach(function (bouton) {
+        bouton.addEventListener('click', function () {
+            const jeton = document.createElement('input');
+            jeton.type = 'hidden';
+            jeton.name = 'csrfmiddlewaretoken';
+            jeton.value = bouton.dataset.jeton;
+            bouton.form.appendChild(jeton);
+        });
+    });
+
+    const lignes = new Set(document.querySelectorAll('tr[data-statut]'));
+    if (!lignes.size) {
+        return;
+    }
+
+    function afficher(ligne, etat) {
+        ligne.querySelector('[data-champ="statut"]').textContent = etat.statut_libelle;
+        ligne.querySelector('[data-champ="message"]').textContent = etat.message || '-';
+        const barre = ligne.querySelector('[data-champ="barre"]');
+        const avancement = ligne.querySelector('[data-champ="avancement"]');
+        if (etat.pourcentage !== null) {
+            barre.style.width = etat.pourcentage + '%';
+            avancement.textContent = etat.pourcentage + ' %';
+        } else if (etat.fait) {
+            avancement.textContent = etat.fait;
+        }
+    }
+
+    function interroger() {
+        Promise.all(Array.from(lignes).map(function (ligne) {
+            return fetch(ligne.dataset.statut, {headers: {'Accept': 'application/json'}})
+                .then(function (reponse) { return reponse.ok ? reponse.json() : null; })
+                .then(function (etat) {
+                    if (etat) {
+                        afficher(ligne, etat);
+                        if (!etat.active) {
+                            lignes.delete(ligne);
+                        }
+                    }
+                })
+                .catch(function () {});
+        })).then(function () {
+            if (lignes.size) {
+                setTimeout(interroger, INTERVALLE);
+            } else {
+                window.location.reload();
+            }
+        });
+    }
+
+    setTimeout(interroger, INTERVALLE);
+})();